@@ -0,0 +1,246 @@
+"""!
+@file aiotask.py
+Runs the tasks of a @c cotask.TaskList under uasyncio instead of the
+cooperative @c pri_sched() loop.
+
+The task functions in @c cotasks.py are unchanged: each @c cotask.Task is
+driven by a coroutine which sleeps until the task's next due time and then
+calls @c Task.run(), so the same run time, lateness, memory and trace
+statistics are kept and @c print(task_list) works the same way for both
+schedulers. Tasks with no period wait for @c Task.go() instead, or, if they
+read a stream, for data to arrive on it:
+@code
+    cam_input = aiotask.StreamInput()
+    cameraTask = cotask.Task(cotasks.camera, period=None,
+                             shares=(cam_input, ...))
+    ...
+    aiotask.run(task_list, streams={cameraTask: (cam_uart, cam_input)})
+@endcode
+
+uasyncio has no priorities; coroutines for higher priority tasks are created
+first, so they run first when several are due at once, and demoting a task
+for overrunning its budget has no effect. Tasks disabled for overrunning do
+stop. Idle garbage collection set up with @c TaskList.set_gc() is not used
+under uasyncio. A watchdog set up with @c TaskList.set_watchdog() is checked
+by a coroutine of its own every @c WATCHDOG_CHECK_MS, with the same rule as
+under @c pri_sched(): it's fed only while every critical task meets its
+deadlines, and not at all if the tasks keep that coroutine from running.
+
+On a PC the module runs under CPython's @c asyncio, which is how a host
+simulation can exercise the same task code.
+"""
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import utime
+
+## Returned by @c StreamInput.fill() when its buffer is full, so nothing was read
+FULL = -1
+## How often the watchdog coroutine checks the critical tasks, in milliseconds
+WATCHDOG_CHECK_MS = 10
+
+
+class StreamInput:
+    """!
+    Stands in for a UART in a task which reads with @c any() and
+    @c readinto(). The scheduler reads the real stream with a uasyncio
+    @c StreamReader, so it can wait for data instead of polling, and puts
+    what it reads here for the task to take.
+    """
+
+    def __init__(self, size=256):
+        """!
+        Creates an empty input buffer.
+        @param size The most bytes read from the stream at once
+        """
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._len = 0
+        self._pos = 0
+
+    def any(self):
+        """!
+        Returns the number of bytes waiting to be read.
+        """
+        return self._len - self._pos
+
+    def readinto(self, buf):
+        """!
+        Moves waiting bytes into a buffer, like @c pyb.UART.readinto().
+        @param buf The buffer to be filled
+        @return The number of bytes copied
+        """
+        n = min(len(buf), self._len - self._pos)
+        buf[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    async def fill(self, reader):
+        """!
+        Waits for data on a stream and reads it straight into the buffer for
+        the task. Bytes the task hasn't read yet are kept ahead of the new ones.
+        @param reader A @c StreamReader for the stream
+        @return The number of bytes read, 0 at the end of the stream, or
+                @c FULL if the task has left no room to read into
+        """
+        # Move anything left over to the front to make room
+        left = self._len - self._pos
+        if left and self._pos:
+            self._view[:left] = self._view[self._pos:self._len]
+        self._len = left
+        self._pos = 0
+        if left >= len(self._buf):
+            return FULL
+
+        # A UART gives None rather than 0 when woken with nothing to read
+        n = None
+        while n is None:
+            n = await reader.readinto(self._view[left:])
+        self._len += n
+        return n
+
+
+try:
+    _Flag = asyncio.ThreadSafeFlag
+except AttributeError:
+    class _Flag(asyncio.Event):
+        """!
+        Stands in for uasyncio's @c ThreadSafeFlag under CPython: an event
+        which clears itself when a waiter wakes.
+        """
+
+        async def wait(self):
+            await super().wait()
+            self.clear()
+
+
+def _run(task, late=None):
+    """!
+    Runs a task once and then disables it if it overran its budget and is
+    meant to be disabled for that.
+    @param task The @c cotask.Task to be run
+    @param late How many microseconds late the run started
+    """
+    task.run(late)
+    if task._list is not None and task._list._penalized:
+        task._list._apply_penalties()
+
+
+async def _periodic(task):
+    """!
+    Runs a task each period, recording how late each run starts.
+    @param task The @c cotask.Task to be run
+    """
+    while task.enabled:
+        wait = utime.ticks_diff(task._next_run, utime.ticks_us())
+        if wait > 0:
+            await asyncio.sleep(wait / 1000000)
+        else:
+            await asyncio.sleep(0)
+        now = utime.ticks_us()
+        late = utime.ticks_diff(now, task._next_run)
+        task._next_run = utime.ticks_add(task._next_run, task.period)
+        _run(task, late)
+
+
+async def _triggered(task):
+    """!
+    Runs a task with no period each time its @c go() method has been called.
+    @param task The @c cotask.Task to be run
+    """
+    # go() sets the flag, which may be from an interrupt, so the coroutine
+    # sleeps until then instead of polling go_flag
+    flag = _Flag()
+    task._wake = flag
+    if task.go_flag:
+        flag.set()
+    while task.enabled:
+        await flag.wait()
+        if task.enabled and task.go_flag:
+            _run(task)
+
+
+def _reader(stream):
+    """!
+    Gets a @c StreamReader for a stream, making one unless it is one already.
+    @param stream A @c StreamReader, or a raw stream such as a UART
+    @return A @c StreamReader for the stream
+    """
+    if isinstance(stream, asyncio.StreamReader):
+        return stream
+    return asyncio.StreamReader(stream)
+
+
+async def _streamed(task, reader, source):
+    """!
+    Runs a task each time data arrives on its stream. At the end of the
+    stream the task is run until it stops taking bytes, so what it had not
+    read yet isn't lost.
+    @param task The @c cotask.Task to be run
+    @param reader A @c StreamReader for the stream
+    @param source The @c StreamInput the task reads from
+    """
+    while task.enabled:
+        n = await source.fill(reader)
+        if n == 0:
+            left = source.any()
+            while left and task.enabled:
+                _run(task)
+                if source.any() == left:
+                    break
+                left = source.any()
+            break
+        # With a full buffer the task runs to make room, after letting the
+        # other coroutines have a turn
+        if n == FULL:
+            await asyncio.sleep(0)
+        _run(task)
+
+
+async def _watchdog(task_list):
+    """!
+    Feeds the task list's watchdog while its critical tasks keep up.
+    @param task_list The @c cotask.TaskList holding the watchdog
+    """
+    while True:
+        await asyncio.sleep(WATCHDOG_CHECK_MS / 1000)
+        task_list._check_watchdog()
+
+
+async def _main(task_list, streams):
+    """!
+    Starts a coroutine for each task in the list, highest priority first,
+    and waits for them forever.
+    @param task_list The @c cotask.TaskList holding the tasks
+    @param streams Dictionary mapping tasks to (stream, @c StreamInput) pairs
+    """
+    coros = []
+    for pri in task_list.pri_list:
+        for task in pri[2:]:
+            if task in streams:
+                stream, source = streams[task]
+                coros.append(asyncio.create_task(_streamed(task,
+                                                           _reader(stream),
+                                                           source)))
+            elif task.period is not None:
+                task._next_run = utime.ticks_add(utime.ticks_us(),
+                                                 task.period + task.phase)
+                coros.append(asyncio.create_task(_periodic(task)))
+            else:
+                coros.append(asyncio.create_task(_triggered(task)))
+    if task_list._wdt is not None:
+        coros.append(asyncio.create_task(_watchdog(task_list)))
+    await asyncio.gather(*coros)
+
+
+def run(task_list, streams=None):
+    """!
+    Runs the tasks under uasyncio. This doesn't return unless a task raises
+    an exception or Ctrl-C is pressed.
+    @param task_list The @c cotask.TaskList holding the tasks
+    @param streams Dictionary mapping tasks which read a stream to a tuple of
+           the stream and the @c StreamInput given to the task in its shares
+    """
+    asyncio.run(_main(task_list, streams or {}))
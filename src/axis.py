@@ -0,0 +1,307 @@
+"""!
+@file axis.py
+Contains the Axis class, which runs one powered axis of the turret: its
+driver, its encoder if it has one, the position and velocity controllers,
+homing and the mode in which the axis is being run.
+
+Each axis is set up from its hardware and a few parameter numbers and is run
+by its own task, so adding an axis doesn't mean copying the control code:
+@code
+    yaw_axis = axis.Axis("Yaw", yaw_motor, yaw_mode, yaw_control,
+                         encoder=yaw_encoder, scale=settings.deg_fac,
+                         gains=(settings.YAW_P, settings.YAW_I, settings.YAW_D),
+                         ...)
+    yawTask = ct.Task(cotasks.run_axis, period=10, shares=(yaw_axis,))
+@endcode
+
+An axis with an encoder drives a motor through its @c set_duty_cycle() method
+and closes a position loop on the encoder. An axis without one drives a
+hobby servo through its @c set_angle() method, which holds the position by
+itself; such an axis is settled once it has had @c settle_ms to get there.
+
+The mode share holds one of the mode constants below and the control share
+holds the mode's input: a position in encoder counts (or degrees for a servo
+axis), a duty cycle in percent for @c RAW_PWM or a homing speed for @c HOME.
+
+Once a motor axis with limits has been homed, its limits are soft stops which
+hold in every mode but homing. Position setpoints are clamped to them, and
+each period the axis works out where it would come to rest if it braked now,
+from its speed and the deceleration its @c brake parameters give. If that is
+past a limit it brakes by driving backwards, whatever the mode asked for, and
+at a limit it won't drive further out.
+"""
+import utime
+from control import Control
+import settings
+import telemetry
+
+## Not driven
+IDLE = 0
+## Homing has finished and the encoder has been zeroed; not driven
+RESET = 1
+## Moving to the position in the control share
+POSITION = 2
+## At the position in the control share
+POSITION_SETTLED = 3
+## Driven with the duty cycle in the control share
+RAW_PWM = 4
+## Moving at the speed in the control share until stopped by the end stop
+HOME = 5
+
+## How long homing must see no movement to have reached the end stop, in ms
+HOME_STALL_MS = 1000
+
+
+class Axis:
+    """!
+    One powered axis of the turret, run by calling @c update() each period.
+    """
+
+    def __init__(self, name, driver, mode, control, encoder=None, scale=1.0,
+                 gains=None, vel_gains=None, limits=None, offset=None,
+                 channels=None, settle_ms=300, brake=None):
+        """!
+        Creates an axis.
+        @param name A name for the axis, used in messages
+        @param driver A @c MotorDriver if the axis has an encoder, otherwise
+               a @c Servo
+        @param mode The share holding the axis's mode
+        @param control The share holding the input for the mode
+        @param encoder The axis's @c EncoderReader, or @c None for a servo axis
+        @param scale Encoder counts per degree of the axis
+        @param gains Parameter numbers of the position loop's P, I and D gains,
+               needed with an encoder
+        @param vel_gains Parameter numbers of the homing speed loop's P, I and D
+               gains, needed with an encoder
+        @param limits Parameter numbers of the lowest and highest positions in
+               degrees, or @c None for no limits
+        @param offset Parameter number of the servo angle at the axis's zero,
+               or @c None for none
+        @param channels Telemetry channels for the position, position error,
+               actuation and homing movement, or @c None to record nothing
+        @param settle_ms How long a servo axis takes to reach a position
+        @param brake Parameter numbers of a motor axis's deceleration in
+               degrees per second squared when braked, and of the duty cycle
+               in percent with which it brakes, or @c None to only stop
+               driving at the limits
+        """
+        if encoder is not None and (gains is None or vel_gains is None):
+            raise ValueError(name + " axis needs gains to use its encoder")
+
+        self.name = name
+        self.driver = driver
+        self.encoder = encoder
+        self.mode = mode
+        self.control = control
+        self.scale = scale
+        self._gains = gains
+        self._vel_gains = vel_gains
+        self._limits = limits
+        self._offset = offset
+        self._channels = channels
+        self._settle_ms = settle_ms
+        self._brake = brake
+
+        fparams = settings.fparams
+        if encoder is not None:
+            self.con = Control(fparams[gains[0]], fparams[gains[1]], fparams[gains[2]],
+                               setpoint=0, initial_output=0,
+                               settled_d_thresh=5, settled_e_thresh=200)
+            self.vel_con = Control(fparams[vel_gains[0]], fparams[vel_gains[1]],
+                                   fparams[vel_gains[2]], setpoint=0, initial_output=0,
+                                   settled_d_thresh=5, settled_e_thresh=200)
+
+        self._params_version = settings.store.version
+        self._home_start = None
+        self._last_t = utime.ticks_ms()
+        ## The servo angle last commanded, in degrees from the axis's zero
+        self.angle = None
+        self._moved_at = 0
+        ## @c True once a motor axis has been homed, so its position is known
+        #  and its limits are enforced
+        self.homed = False
+        # 1 or -1 while held back from the high or low limit, otherwise 0
+        self._held = 0
+        ## The number of periods in which the limits changed the actuation
+        self.limited = 0
+
+    def clamp(self, deg):
+        """!
+        Limits a position to the axis's range of travel.
+        @param deg The position in degrees
+        @return The position within the limits
+        """
+        if self._limits is None:
+            return deg
+        fparams = settings.fparams
+        return min(max(deg, fparams[self._limits[0]]), fparams[self._limits[1]])
+
+    def position(self):
+        """!
+        Returns where the axis is in degrees: the encoder's count, or for a
+        servo axis the angle last commanded.
+        """
+        if self.encoder is None:
+            return self.angle or 0.0
+        return self.encoder.count / self.scale
+
+    def update(self):
+        """!
+        Reads the encoder, runs the loop for the current mode and sets the
+        driver. This is called once per period by the axis's task.
+        """
+        if self.encoder is None:
+            self._update_servo()
+        else:
+            self._update_motor()
+
+    def _sample(self, which, value):
+        """!
+        Records a telemetry sample on one of the axis's channels.
+        @param which 0 to 3 for the position, error, actuation or homing channel
+        @param value The sampled value
+        """
+        if self._channels is not None:
+            telemetry.recorder.sample(self._channels[which], value)
+
+    def _envelope(self, actuation, pos, vel, dt):
+        """!
+        Keeps a motor axis within its limits by braking before it could no
+        longer stop in time. Once it has had to be held back from a limit, it
+        isn't driven towards that limit again until asked to move away.
+        @param actuation The duty cycle asked for, in percent
+        @param pos The position in degrees
+        @param vel The velocity in degrees per second
+        @param dt The period in milliseconds
+        @return The duty cycle to use
+        """
+        fparams = settings.fparams
+        low = fparams[self._limits[0]]
+        high = fparams[self._limits[1]]
+
+        # Asked to move away from the limit it was held at. Coming to rest
+        # doesn't count, or a slow creep would drive it back out again
+        if actuation * self._held < 0:
+            self._held = 0
+
+        # The speed measured is the average over the last period, half a
+        # period old, and the actuation set now lasts a whole period. Work out
+        # where it would stop if braking began after that
+        stop = pos + vel * 1.5 * dt / 1000
+        if self._brake is not None:
+            brake = fparams[self._brake[1]]
+            stop += vel * abs(vel) / (2 * fparams[self._brake[0]])
+            if vel > 0 and stop >= high and actuation > -brake:
+                self._held = 1
+                self.limited += 1
+                return -brake
+            if vel < 0 and stop <= low and actuation < brake:
+                self._held = -1
+                self.limited += 1
+                return brake
+
+        if stop >= high and actuation > 0:
+            self._held = 1
+        elif stop <= low and actuation < 0:
+            self._held = -1
+        if actuation * self._held > 0:
+            self.limited += 1
+            return 0
+        return actuation
+
+    def _update_motor(self):
+        """!
+        Runs a motor axis with its encoder for one period.
+        """
+        fparams = settings.fparams
+        con = self.con
+        vel_con = self.vel_con
+        encoder = self.encoder
+        mode = self.mode
+        control = self.control
+
+        # Pick up gains changed over the command channel
+        if self._params_version != settings.store.version:
+            self._params_version = settings.store.version
+            g = self._gains
+            con.set_gains(fparams[g[0]], fparams[g[1]], fparams[g[2]])
+            g = self._vel_gains
+            vel_con.set_gains(fparams[g[0]], fparams[g[1]], fparams[g[2]])
+
+        measured_output = encoder.read()
+        t = utime.ticks_ms()
+        delta_t = t - self._last_t
+        motor_actuation = 0
+        m = mode.get()
+        limited = self.homed and self._limits is not None
+
+        if m == RESET:
+            encoder.zero()
+
+        elif m == POSITION or m == POSITION_SETTLED:
+            setpoint = control.get()
+            if limited:
+                setpoint = self.clamp(setpoint / self.scale) * self.scale
+            con.set_setpoint(setpoint)
+            motor_actuation = con.run(measured_output)
+            self._sample(1, con.error)
+            if con.is_settled():
+                mode.put(POSITION_SETTLED)
+            else:
+                mode.put(POSITION)
+
+        elif m == RAW_PWM:
+            motor_actuation = control.get()
+
+        elif m == HOME:
+            self._home_start = self._home_start or t
+            vel_con.set_setpoint(control.get())
+            motor_actuation = vel_con.run(encoder.delta() / delta_t)
+
+            self._sample(3, encoder.delta())
+
+            if encoder.delta() == 0 and t - self._home_start > HOME_STALL_MS:
+                self._home_start = None
+                encoder.zero()
+                mode.put(RESET)
+                self.homed = True
+                telemetry.recorder.event(telemetry.EV_HOME_DONE)
+
+        if limited and m != HOME:
+            motor_actuation = self._envelope(
+                motor_actuation, measured_output / self.scale,
+                encoder.delta() / self.scale * 1000 / max(delta_t, 1), delta_t)
+
+        self.driver.set_duty_cycle(motor_actuation)
+        self._sample(0, measured_output)
+        self._sample(2, motor_actuation)
+        self._last_t = t
+
+    def _update_servo(self):
+        """!
+        Runs a servo axis for one period. Homing moves to the zero position
+        and then reports @c RESET; raw PWM isn't possible and holds the servo.
+        """
+        m = self.mode.get()
+        if m == HOME:
+            target = 0.0
+        elif m == POSITION or m == POSITION_SETTLED:
+            target = self.clamp(self.control.get())
+        else:
+            return
+
+        t = utime.ticks_ms()
+        if target != self.angle:
+            offset = 0 if self._offset is None else settings.fparams[self._offset]
+            self.driver.set_angle(offset + target)
+            self.angle = target
+            self._moved_at = t
+            self._sample(0, target)
+
+        if utime.ticks_diff(t, self._moved_at) >= self._settle_ms:
+            if m == HOME:
+                self.mode.put(RESET)
+            elif m == POSITION:
+                self.mode.put(POSITION_SETTLED)
+        elif m == POSITION_SETTLED:
+            self.mode.put(POSITION)
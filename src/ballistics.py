@@ -0,0 +1,153 @@
+"""!
+@file ballistics.py
+Contains the Ballistics class, which turns where the target is into how the
+flywheels and the yaw axis should be set to hit it.
+
+Two tables are looked up with linear interpolation:
+- The flywheel speed differential, as a fraction of the base speed, by target
+  range and the camera's vertical error. Running the upper wheel faster than
+  the lower one lifts the dart, so a positive differential aims higher.
+- The dart's time of flight by target range, from which the yaw lead needed
+  for a moving target is found.
+
+Measured tables, for the flywheels at @c fire_percent, are loaded once at
+start-up from @c ballistics.json if it is on the flash (the same layout as the
+defaults below). The defaults are placeholders until such a file exists: the
+differential is zero everywhere, so both wheels run at the base speed, and the
+times of flight are rough guesses. The tables are held in preallocated arrays
+so a lookup doesn't allocate memory:
+@code
+    table = ballistics.load()
+    diff = table.differential(fparams[settings.TARGET_RANGE], errory.get())
+    upper = base_speed * (1 + diff)
+    lower = base_speed * (1 - diff)
+@endcode
+"""
+import array
+import json
+import micropython
+
+## The file in flash from which measured tables are loaded
+TABLE_FILE = "ballistics.json"
+
+## Target ranges in metres at which the tables are given, increasing
+DEFAULT_RANGES = (1.0, 2.0, 3.0, 4.0, 6.0)
+## Camera vertical errors in pixels at which differentials are given, increasing
+DEFAULT_ERRORS = (-8.0, -4.0, 0.0, 4.0, 8.0)
+## Speed differentials, one row per range and one column per vertical error;
+#  zero until measured
+DEFAULT_DIFFS = ((0.0, 0.0, 0.0, 0.0, 0.0),) * len(DEFAULT_RANGES)
+## Times of flight in seconds, one per range; estimates until measured
+DEFAULT_TOFS = (0.06, 0.12, 0.19, 0.27, 0.45)
+
+
+@micropython.native
+def _index(axis, x):
+    """!
+    Finds the interval of an increasing axis in which a value lies.
+    @param axis The axis values
+    @param x The value
+    @return The index @c i of the interval from @c axis[i] to @c axis[i + 1];
+            values off either end use the first or last interval
+    """
+    i = 0
+    last = len(axis) - 2
+    while i < last and x > axis[i + 1]:
+        i += 1
+    return i
+
+
+@micropython.native
+def _fraction(axis, i, x):
+    """!
+    Gives how far a value lies between two axis points, clamped to 0 to 1 so
+    that values off the ends of the table use the values at the ends.
+    @param axis The axis values
+    @param i The interval found by @c _index()
+    @param x The value
+    @return The fraction of the way from @c axis[i] to @c axis[i + 1]
+    """
+    f = (x - axis[i]) / (axis[i + 1] - axis[i])
+    if f < 0.0:
+        return 0.0
+    if f > 1.0:
+        return 1.0
+    return f
+
+
+class Ballistics:
+    """!
+    Lookup tables for the flywheel differential and the time of flight.
+    """
+
+    def __init__(self, ranges, errors, diffs, tofs):
+        """!
+        Creates the tables.
+        @param ranges Target ranges in metres, increasing, at least two
+        @param errors Camera vertical errors in pixels, increasing, at least two
+        @param diffs Rows of speed differentials, one row for each range with
+               one value for each vertical error
+        @param tofs Times of flight in seconds, one for each range
+        """
+        if len(ranges) < 2 or len(errors) < 2:
+            raise ValueError("Tables need at least two points on each axis")
+        if len(diffs) != len(ranges) or len(tofs) != len(ranges):
+            raise ValueError("Tables need one row per range")
+        for row in diffs:
+            if len(row) != len(errors):
+                raise ValueError("Tables need one value per vertical error")
+
+        self._ranges = array.array('f', ranges)
+        self._errors = array.array('f', errors)
+        self._width = len(errors)
+        self._diffs = array.array('f', [d for row in diffs for d in row])
+        self._tofs = array.array('f', tofs)
+
+    @micropython.native
+    def differential(self, rng, error):
+        """!
+        Looks up the flywheel speed differential.
+        @param rng The target range in metres
+        @param error The camera's vertical error in pixels
+        @return The differential as a fraction of the base speed
+        """
+        i = _index(self._ranges, rng)
+        fr = _fraction(self._ranges, i, rng)
+        j = _index(self._errors, error)
+        fe = _fraction(self._errors, j, error)
+
+        d = self._diffs
+        k = i * self._width + j
+        near = d[k] + (d[k + 1] - d[k]) * fe
+        k += self._width
+        far = d[k] + (d[k + 1] - d[k]) * fe
+        return near + (far - near) * fr
+
+    @micropython.native
+    def time_of_flight(self, rng):
+        """!
+        Looks up how long a dart takes to reach the target.
+        @param rng The target range in metres
+        @return The time of flight in seconds
+        """
+        i = _index(self._ranges, rng)
+        t = self._tofs
+        return t[i] + (t[i + 1] - t[i]) * _fraction(self._ranges, i, rng)
+
+
+def load(path=TABLE_FILE):
+    """!
+    Loads the tables from a file in flash, or the defaults if there isn't one.
+    The file holds a JSON object with @c ranges, @c errors, @c diffs and
+    @c tofs lists laid out like the defaults in this module.
+    @param path The file to read
+    @return A @c Ballistics object
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return Ballistics(data["ranges"], data["errors"], data["diffs"],
+                          data["tofs"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return Ballistics(DEFAULT_RANGES, DEFAULT_ERRORS, DEFAULT_DIFFS,
+                          DEFAULT_TOFS)
@@ -0,0 +1,276 @@
+"""!
+@file bench.py
+Micro-benchmarks of the turret program's hot paths: shares and queues, the
+scheduler, the controller, the encoder reader and the motor linearization.
+
+The same file runs on the board and on a PC. On the board, stop @c main.py
+with Ctrl-C, soft reset with Ctrl-D and Ctrl-C again to get a clean REPL, and
+then:
+@code
+    >>> import bench
+    >>> bench.run()
+@endcode
+On a PC, @c tools/bench.py runs it under CPython with the simulated board in
+@c tools/sim_board, or on the board through @c mpremote, and saves the
+results as JSON so that runs from different commits can be compared.
+
+Each benchmark times @c n calls of a small function with @c utime.ticks_us()
+and subtracts the time taken by the same number of calls of an empty
+function, so the result is the cost of the operation itself in microseconds.
+The results are printed as one line of JSON after @c MARK.
+"""
+import gc
+import json
+import sys
+import utime
+
+import task_share
+import cotask
+import settings
+from control import Control
+
+## Printed before the line of JSON results so a host can pick it out
+MARK = "BENCH "
+## Calls timed for each benchmark unless told otherwise
+DEFAULT_N = 2000
+
+
+def _nothing():
+    """!
+    The empty function whose call time is subtracted from every result.
+    """
+    pass
+
+
+def _time(fn, n):
+    """!
+    Times repeated calls of a function.
+    @param fn The function, called with no arguments
+    @param n The number of calls
+    @return The total time in microseconds
+    """
+    start = utime.ticks_us()
+    for _ in range(n):
+        fn()
+    return utime.ticks_diff(utime.ticks_us(), start)
+
+
+def _idle_task():
+    """!
+    A task function which does nothing each run.
+    """
+    while True:
+        yield 0
+
+
+def share_put():
+    """!
+    Benchmarks Share.put() of an integer, without interrupt protection.
+    """
+    s = task_share.Share('l', thread_protect=False, name="Bench Share")
+    return lambda: s.put(1)
+
+
+def share_get():
+    """!
+    Benchmarks Share.get() of an integer.
+    """
+    s = task_share.Share('l', thread_protect=False, name="Bench Share")
+    s.put(1)
+    return s.get
+
+
+def share_put_protected():
+    """!
+    Benchmarks Share.put() with interrupts disabled around the write.
+    """
+    s = task_share.Share('l', thread_protect=True, name="Bench Share")
+    return lambda: s.put(1)
+
+
+def queue_put_get():
+    """!
+    Benchmarks Queue.put() followed by Queue.get().
+    """
+    q = task_share.Queue('l', 16, name="Bench Queue")
+
+    def op():
+        q.put(1)
+        q.get()
+    return op
+
+
+def queue_put_overwrite():
+    """!
+    Benchmarks Queue.put() into a full queue which overwrites.
+    """
+    q = task_share.Queue('l', 16, overwrite=True, name="Bench Queue")
+    return lambda: q.put(1)
+
+
+def queue_try_put_get():
+    """!
+    Benchmarks Queue.try_put() followed by Queue.try_get().
+    """
+    q = task_share.Queue('l', 16, name="Bench Queue")
+
+    def op():
+        q.try_put(1)
+        q.try_get()
+    return op
+
+
+def task_schedule():
+    """!
+    Benchmarks Task.schedule() of a task which has been told to go.
+    """
+    t = cotask.Task(_idle_task, name="Bench", priority=1, period=None)
+
+    def op():
+        t.go()
+        t.schedule()
+    return op
+
+
+def task_schedule_profiled():
+    """!
+    Benchmarks Task.schedule() with run time profiling on.
+    """
+    t = cotask.Task(_idle_task, name="Bench", priority=1, period=None,
+                    profile=True)
+
+    def op():
+        t.go()
+        t.schedule()
+    return op
+
+
+def task_schedule_traced():
+    """!
+    Benchmarks Task.schedule() with the start, end and state of each run
+    recorded in the trace buffer.
+    """
+    t = cotask.Task(_idle_task, name="Bench", priority=1, period=None,
+                    trace=True)
+
+    def op():
+        t.go()
+        t.schedule()
+    return op
+
+
+def share_put_traced():
+    """!
+    Benchmarks Share.put() of an integer recorded in the trace buffer.
+    """
+    s = task_share.Share('l', thread_protect=False, name="Bench Share",
+                         trace=True)
+    return lambda: s.put(1)
+
+
+def pri_sched_idle():
+    """!
+    Benchmarks one TaskList.pri_sched() pass which finds no task ready.
+    """
+    # Six tasks, as in main.py, none of which is due
+    tl = cotask.TaskList()
+    for pri in (1, 1, 1, 1, 2, 0):
+        tl.append(cotask.Task(_idle_task, name="Bench", priority=pri,
+                              period=1000000))
+    return tl.pri_sched
+
+
+def pri_sched_one_ready():
+    """!
+    Benchmarks one TaskList.pri_sched() pass which runs the last task.
+    """
+    tl = cotask.TaskList()
+    for pri in (1, 1, 1, 2, 0):
+        tl.append(cotask.Task(_idle_task, name="Bench", priority=pri,
+                              period=1000000))
+    t = cotask.Task(_idle_task, name="Bench", priority=1, period=None)
+    tl.append(t)
+
+    def op():
+        t.go()
+        tl.pri_sched()
+    return op
+
+
+def control_run():
+    """!
+    Benchmarks Control.run() of the PID controller.
+    """
+    con = Control(1.0, 0.01, 0.1, setpoint=1000, initial_output=0)
+    return lambda: con.run(500)
+
+
+def encoder_read():
+    """!
+    Benchmarks EncoderReader.read() on timer 8, the yaw encoder's.
+    """
+    import pyb
+    import resources
+    from encoder_reader import EncoderReader
+    # Take the timer back from any earlier run in this session
+    resources.release("EncoderReader")
+    enc = EncoderReader(pyb.Pin.board.PC6, pyb.Pin.board.PC7, 8)
+    return enc.read
+
+
+def linearize():
+    """!
+    Benchmarks settings.linearize() of a motor actuation.
+    """
+    return lambda: settings.linearize(37.5)
+
+
+## Every benchmark: its name and the function which sets it up and returns
+#  the function to time
+CASES = (("share_put", share_put),
+         ("share_get", share_get),
+         ("share_put_protected", share_put_protected),
+         ("queue_put_get", queue_put_get),
+         ("queue_put_overwrite", queue_put_overwrite),
+         ("queue_try_put_get", queue_try_put_get),
+         ("task_schedule", task_schedule),
+         ("task_schedule_profiled", task_schedule_profiled),
+         ("task_schedule_traced", task_schedule_traced),
+         ("share_put_traced", share_put_traced),
+         ("pri_sched_idle", pri_sched_idle),
+         ("pri_sched_one_ready", pri_sched_one_ready),
+         ("control_run", control_run),
+         ("encoder_read", encoder_read),
+         ("linearize", linearize))
+
+
+def run(names=None, n=DEFAULT_N):
+    """!
+    Runs the benchmarks and prints their results.
+    @param names The names of the benchmarks to run, or @c None for all
+    @param n The number of calls timed for each
+    @return A dictionary of the results
+    """
+    results = {}
+    overhead = _time(_nothing, n) / n
+    for name, make in CASES:
+        if names is not None and name not in names:
+            continue
+        try:
+            fn = make()
+        except (ValueError, OSError, ImportError) as e:
+            # A peripheral the benchmark needs can't be had here
+            results[name] = {"error": str(e)}
+            continue
+
+        fn()
+        gc.collect()
+        total = _time(fn, n)
+        results[name] = {"us_per_op": total / n - overhead, "n": n}
+
+    report = {"implementation": sys.implementation.name,
+              "platform": sys.platform,
+              "overhead_us": overhead,
+              "results": results}
+    print(MARK + json.dumps(report))
+    return report
@@ -2,6 +2,8 @@
 @file boot.py
 Contains code used to boostrap the main project
 """
+import boottime
+boottime.mark("boot.py")
 import pyb
 pyb.repl_uart(None)
 pyb.main("main.py")
\ No newline at end of file
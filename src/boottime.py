@@ -0,0 +1,50 @@
+"""!
+@file boottime.py
+Times the stages of starting up, from reset to the scheduler taking over.
+
+The microsecond tick counter starts from zero at reset, so each mark records
+the time since power-on. @c boot.py makes the first mark and @c main.py marks
+the end of each of its start-up stages; @c report() then shows how long each
+stage took:
+@code
+    import boottime
+    boottime.mark("imports")
+    ...
+    boottime.mark("peripherals")
+    print(boottime.report())
+@endcode
+"""
+import utime
+
+# List of (stage name, ticks_us at the end of the stage)
+_marks = []
+
+
+def mark(stage):
+    """!
+    Records the end of a start-up stage.
+    @param stage A short name for the stage which has just finished
+    """
+    _marks.append((stage, utime.ticks_us()))
+
+
+def total_ms():
+    """!
+    Returns the time in milliseconds from reset to the latest mark.
+    """
+    return _marks[-1][1] / 1000.0 if _marks else 0.0
+
+
+def report():
+    """!
+    Makes a table of the start-up stages and how long each took.
+    @return A string with one line per stage and a total
+    """
+    lines = ['BOOT STAGE          TIME ms    AT ms']
+    last = 0
+    for stage, t in _marks:
+        lines.append(f"{stage:<16s}{(utime.ticks_diff(t, last) / 1000.0): 11.1f}"
+                     f"{(t / 1000.0): 9.1f}")
+        last = t
+    lines.append(f"{'Reset to ready':<16s}{total_ms(): 11.1f}")
+    return '\n'.join(lines)
@@ -0,0 +1,191 @@
+"""!
+@file bus.py
+Contains the BusLink class, which exchanges short addressed messages with the
+host coordinator over a UART, either point to point or on an RS-485 bus
+shared by several turrets.
+
+Every message is framed, little endian, as:
+| Offset | Type    | Field                                              |
+|:-------|:--------|:---------------------------------------------------|
+| 0      | uint8   | @c SYNC byte, 0xB5                                 |
+| 1      | uint8   | Destination address, @c BROADCAST for every turret |
+| 2      | uint8   | Source address, @c HOST for the coordinator        |
+| 3      | uint8   | Kind of message, one of the @c MSG_ constants      |
+| 4      | uint8   | Payload length @c n, at most @c MAX_PAYLOAD        |
+| 5      | n bytes | Payload, laid out by the message's @c FMT_ format  |
+| 5 + n  | uint8   | CRC-8 (polynomial 0x07) of bytes 1 to 4 + n        |
+
+The coordinator is the bus master. A turret only transmits in answer to a
+@c MSG_POLL addressed to it, so turrets sharing a bus never talk over each
+other; the answer is a @c MSG_STATUS. @c MSG_ASSIGN tells a turret whether it
+may engage and where to wait, and @c MSG_SECTOR sets the yaw range inside
+which it may aim so that no turret fires across another.
+
+The host side of the protocol is in @c tools/turret_bus, whose
+@c protocol.py must be kept in step with this file.
+"""
+import struct
+import utime
+
+## First byte of every message
+SYNC = 0xB5
+## The coordinator's address
+HOST = 0
+## Destination address which every turret accepts
+BROADCAST = 0xFF
+## The largest payload in bytes
+MAX_PAYLOAD = 32
+## Bytes in a message besides its payload
+OVERHEAD = 6
+
+## Coordinator asks a turret for its status; no payload
+MSG_POLL = 1
+## A turret's answer to a poll
+MSG_STATUS = 2
+## Coordinator allows or stops engagement and gives a bearing to wait at
+MSG_ASSIGN = 3
+## Coordinator sets the yaw range in which a turret may aim
+MSG_SECTOR = 4
+
+## Status: mission state, yaw in degrees, whether a target was seen since the
+#  last poll, the target's yaw angle in degrees and the number of shots fired
+FMT_STATUS = "<BfBfH"
+## Assign: 1 to engage or 0 to hold, then the yaw angle in degrees at which to
+#  wait for the target, NaN to keep the turret's own
+FMT_ASSIGN = "<Bf"
+## Sector: lowest and highest yaw angles in degrees
+FMT_SECTOR = "<ff"
+
+## How long a turret waits without hearing the coordinator before acting
+#  alone again, in ms
+LINK_TIMEOUT_MS = 2000
+
+## Microseconds to send one byte at 115200 baud, ten bits per byte
+_BYTE_US = 87
+
+
+def crc8(buf, start, end):
+    """!
+    Works out the CRC-8 with polynomial 0x07 of part of a buffer.
+    @param buf The buffer
+    @param start The index of the first byte
+    @param end The index after the last byte
+    @return The CRC, from 0 to 255
+    """
+    crc = 0
+    for i in range(start, end):
+        crc ^= buf[i]
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ 0x07) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+    return crc
+
+
+class BusLink:
+    """!
+    Sends and receives framed messages for one turret address.
+    """
+
+    def __init__(self, uart, address, de_pin=None, byte_us=_BYTE_US):
+        """!
+        Creates the link. Messages for other turrets are read and ignored.
+        @param uart The UART on the bus, opened with @c timeout=0
+        @param address This turret's address, 1 to 254
+        @param de_pin For RS-485, the @c pyb.Pin driving the transceiver's
+               driver enable, or @c None for a point to point link
+        @param byte_us Microseconds to send one byte at the UART's baud rate
+        """
+        if not 0 < address < BROADCAST:
+            raise ValueError("Bus address must be from 1 to 254")
+        self.uart = uart
+        self.address = address
+        self._de = de_pin
+        self._byte_us = byte_us
+        if de_pin is not None:
+            de_pin.value(0)
+
+        self._rx = bytearray(MAX_PAYLOAD + OVERHEAD)
+        self._rx_len = 0
+        self._tx = bytearray(MAX_PAYLOAD + OVERHEAD)
+        self._chunk = bytearray(32)
+        self._pending = 0
+        self._pos = 0
+
+        ## The payload of the latest message received, valid until the next
+        #  call to @c receive()
+        self.payload = memoryview(self._rx)[5:5]
+        ## The number of frames thrown away for a bad length or CRC
+        self.errors = 0
+
+    def send(self, kind, fmt, *values):
+        """!
+        Sends a message to the coordinator.
+        @param kind The kind of message, one of the @c MSG_ constants
+        @param fmt The payload's struct format, one of the @c FMT_ constants
+        @param values The values packed into the payload
+        """
+        tx = self._tx
+        n = struct.calcsize(fmt)
+        tx[0] = SYNC
+        tx[1] = HOST
+        tx[2] = self.address
+        tx[3] = kind
+        tx[4] = n
+        struct.pack_into(fmt, tx, 5, *values)
+        tx[5 + n] = crc8(tx, 1, 5 + n)
+
+        if self._de is not None:
+            self._de.value(1)
+        self.uart.write(memoryview(tx)[:OVERHEAD + n])
+        if self._de is not None:
+            # The write returns with the last byte still being shifted out
+            utime.sleep_us(2 * self._byte_us)
+            self._de.value(0)
+
+    def receive(self):
+        """!
+        Reads what has arrived and finds the next complete message addressed
+        to this turret or to all turrets.
+        @return The kind of message, with its payload in @c payload, or
+                @c None if there isn't a complete one yet
+        """
+        rx = self._rx
+        while True:
+            if self._pos >= self._pending:
+                if not self.uart.any():
+                    return None
+                self._pending = self.uart.readinto(self._chunk) or 0
+                self._pos = 0
+                continue
+
+            c = self._chunk[self._pos]
+            self._pos += 1
+            n = self._rx_len
+
+            # Hunt for the sync byte, then collect the header and payload
+            if n == 0:
+                if c == SYNC:
+                    rx[0] = c
+                    self._rx_len = 1
+                continue
+            if n == 4 and c > MAX_PAYLOAD:
+                self.errors += 1
+                self._rx_len = 0
+                continue
+            rx[n] = c
+            n += 1
+            self._rx_len = n
+            if n < OVERHEAD or n < OVERHEAD + rx[4]:
+                continue
+
+            self._rx_len = 0
+            length = rx[4]
+            if crc8(rx, 1, 5 + length) != rx[5 + length]:
+                self.errors += 1
+                continue
+            if rx[1] != self.address and rx[1] != BROADCAST:
+                continue
+            self.payload = memoryview(rx)[5:5 + length]
+            return rx[3]
@@ -0,0 +1,100 @@
+"""!
+@file button.py
+Contains the Button class, which turns a push button's edges into debounced
+press and release events delivered through a task_share Queue.
+
+Both edges of the button's pin raise an external interrupt. Each edge
+restarts a one-shot software timer for the debounce window; only when the
+pin has been quiet for the whole window is its level read and, if it has
+changed, reported. The level is therefore read after the bounce rather than
+during it, and the last edge of a burst is never lost, so a bouncing contact
+produces exactly one event.
+"""
+import machine
+import pyb
+import utime
+import micropython
+
+import resources
+
+## Event put in the queue when the button is pressed
+PRESS = 1
+## Event put in the queue when the button is released
+RELEASE = 2
+
+
+class Button:
+    """!
+    A debounced, interrupt-driven push button wired between a pin and ground.
+    """
+
+    def __init__(self, pin, queue, debounce_ms=20):
+        """!
+        Sets up the button's pin and external interrupt.
+        @param pin The pin to which the button is connected, such as
+               @c pyb.Pin.board.PB3. It is pulled up, so it reads low when the
+               button is pressed.
+        @param queue A @c task_share.Queue of integers into which @c PRESS and
+               @c RELEASE events are put
+        @param debounce_ms The time in milliseconds for which the pin must be
+               quiet before an edge is believed
+        """
+        micropython.alloc_emergency_exception_buf(100)
+
+        self._queue = queue
+        self._window = debounce_ms
+        self._last_edge = utime.ticks_ms()
+        self._pressed = False
+
+        ## The number of edges ignored as contact bounce
+        self.bounces = 0
+
+        # A software timer, so no hardware timer is taken. The callbacks are
+        # bound once here since binding a method in an interrupt allocates
+        self._timer = machine.Timer(-1)
+        self._settle_cb = self._settle
+
+        self._pin = pyb.Pin(resources.claim_pin(pin, "Button"), pyb.Pin.IN,
+                            pull=pyb.Pin.PULL_UP)
+        self._int = pyb.ExtInt(self._pin, pyb.ExtInt.IRQ_RISING_FALLING,
+                               pyb.Pin.PULL_UP, self._edge)
+
+    def _edge(self, line):
+        """!
+        Interrupt callback run on each edge of the pin. It must not allocate
+        memory.
+        @param line The external interrupt line which triggered
+        """
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._last_edge) < self._window:
+            self.bounces += 1
+        self._last_edge = now
+
+        # Read the pin once it has been quiet for the whole window
+        self._timer.init(mode=machine.Timer.ONE_SHOT, period=self._window,
+                         callback=self._settle_cb)
+
+    def _settle(self, timer):
+        """!
+        Timer callback run once the pin has been quiet for the debounce
+        window. It reports the pin's level if that has changed, and must not
+        allocate memory.
+        @param timer The timer which expired
+        """
+        pressed = not self._pin.value()
+        if pressed != self._pressed:
+            self._pressed = pressed
+            self._queue.put(PRESS if pressed else RELEASE, in_ISR=True)
+
+    def set_debounce(self, debounce_ms):
+        """!
+        Changes the debounce window.
+        @param debounce_ms The new window in milliseconds
+        """
+        self._window = debounce_ms
+
+    def is_pressed(self):
+        """!
+        Returns @c True if the button's last debounced event was a press.
+        """
+        return self._pressed
@@ -0,0 +1,91 @@
+"""!
+@file camera_cal.py
+Converts the thermal camera's target position in pixels into a yaw angle.
+
+The angle off the barrel's line is the target's pixel offset from the
+boresight column times the camera's field of view per pixel, plus a small
+correction for lens distortion looked up by column:
+@code
+    cal = camera_cal.load()
+    off = cal.angle(x, fparams[settings.CAM_FOV], fparams[settings.OFF_X])
+    target = position_deg + off
+@endcode
+The field of view and boresight are parameters (@c cam_fov and @c off_x) so
+they can be tuned live; the correction table is measured with
+@c tools/camera_cal.py and kept in @c camera_cal.json on the flash.
+
+Pixel positions are measured from the image's centre column, as sent by the
+camera, and a positive angle turns the turret the way its encoder counts up.
+"""
+import array
+import json
+import micropython
+
+## The file in flash holding the correction table
+CAL_FILE = "camera_cal.json"
+## The camera's width in pixels
+IMG_WIDTH = 32
+## The camera's height in pixels
+IMG_HEIGHT = 24
+
+
+class CameraCal:
+    """!
+    The per-column correction table and the pixel to angle conversion.
+    """
+
+    def __init__(self, correction=None):
+        """!
+        Creates the calibration.
+        @param correction Corrections in degrees at each whole pixel position
+               from -IMG_WIDTH / 2 to IMG_WIDTH / 2, or @c None for none
+        """
+        if correction is None:
+            correction = [0.0] * (IMG_WIDTH + 1)
+        if len(correction) != IMG_WIDTH + 1:
+            raise ValueError("Correction table needs "
+                             + str(IMG_WIDTH + 1) + " values")
+        self.correction = array.array('f', correction)
+
+    @micropython.native
+    def angle(self, x, fov, boresight):
+        """!
+        Works out how far to turn to point at a target.
+        @param x The target's position in pixels from the image centre
+        @param fov The camera's horizontal field of view in degrees, negative
+               if the image is mirrored
+        @param boresight The pixel position at which the barrel points
+        @return The angle in degrees from the current aim to the target
+        """
+        # Interpolate the correction between the whole pixels either side
+        pos = x + IMG_WIDTH // 2
+        if pos <= 0:
+            corr = self.correction[0]
+        elif pos >= IMG_WIDTH:
+            corr = self.correction[IMG_WIDTH]
+        else:
+            i = int(pos)
+            c = self.correction
+            corr = c[i] + (c[i + 1] - c[i]) * (pos - i)
+        return (boresight - x) * fov / IMG_WIDTH + corr
+
+    def save(self, path=CAL_FILE):
+        """!
+        Writes the correction table to flash.
+        @param path The file to write
+        """
+        with open(path, "w") as f:
+            json.dump({"correction": list(self.correction)}, f)
+
+
+def load(path=CAL_FILE):
+    """!
+    Loads the correction table, or no correction if there isn't a valid file.
+    @param path The file to read
+    @return A @c CameraCal object
+    """
+    try:
+        with open(path) as f:
+            return CameraCal(json.load(f)["correction"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return CameraCal()
@@ -89,6 +89,22 @@ class Control:
         # print("PID OUT", motor_actuation, self.Kp_control, self.Ki_control, self.Kd_control)
         return settings.linearize(motor_actuation)
 
+    def set_gains(self, Kp, Ki, Kd):
+        """!
+        Changes the controller gains without resetting the controller state,
+        so that gains can be tuned while the controller is running.
+        """
+        self.Kp = Kp
+        self.Ki = Ki
+        self.Kd = Kd
+
+    def set_thresholds(self, settled_e_thresh, settled_d_thresh):
+        """!
+        Changes the error and error rate thresholds used by is_settled().
+        """
+        self.settled_e_thresh = settled_e_thresh
+        self.settled_d_thresh = settled_d_thresh
+
     def set_setpoint(self, setpoint):
         """!
         Sets the value of setpoint to be part of self.
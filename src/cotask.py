@@ -31,6 +31,27 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import gc                              # Memory allocation garbage collector
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
+import tracebuf                        # The system-wide trace buffer
+
+## Overrun action: only count runs which take longer than the task's budget
+OVERRUN_LOG = 0
+## Overrun action: count the overrun and lower the task's priority by one
+OVERRUN_DEMOTE = 1
+## Overrun action: count the overrun and stop running the task
+OVERRUN_DISABLE = 2
+
+## The longest hyperperiod in microseconds over which @c TaskList.plan_phases()
+#  lays tasks out
+MAX_HYPERPERIOD = 2000000
+
+
+def _gcd(a, b):
+    """!
+    Find the greatest common divisor of two positive integers.
+    """
+    while b:
+        a, b = b, a % b
+    return a
 
 
 class Task:
@@ -70,7 +91,9 @@ class Task:
 
 
     def __init__(self, run_fun, name="NoName", priority=0, period=None,
-                 profile=False, trace=False, shares=()):
+                 profile=False, trace=False, shares=(), mem_profile=False,
+                 budget=None, on_overrun=OVERRUN_LOG, critical=False,
+                 phase=None):
         """!
         Initialize a task object so it may be run by the scheduler.
 
@@ -88,10 +111,24 @@ class Task:
                The time can be given in a @c float or @c int; it will be 
                converted to microseconds for internal use by the scheduler.
         @param profile Set to @c True to enable run-time profiling 
-        @param trace Set to @c True to generate a list of transitions between
-               states. @b Note: This slows things down and allocates memory.
+        @param trace Set to @c True to record the start and end of each run
+               and each change of state in the system-wide trace buffer of
+               @c tracebuf.py. @b Note: This slows every run a little.
         @param shares A list or tuple of shares and queues used by this task.
                If no list is given, no shares are passed to the task
+        @param mem_profile Set to @c True to measure the heap memory allocated
+               by each run of the task. @b Note: Reading the heap usage takes
+               time in proportion to the heap size, so this slows every run.
+        @param budget The longest time in milliseconds one run of the task
+               should take, or @c None if runs aren't checked
+        @param on_overrun What to do when a run takes longer than the
+               budget: @c OVERRUN_LOG, @c OVERRUN_DEMOTE or @c OVERRUN_DISABLE
+        @param critical Set to @c True if the watchdog should only be fed
+               while this task meets its deadlines; see
+               @c TaskList.set_watchdog()
+        @param phase The time in milliseconds by which a periodic task's runs
+               are offset from the start of the schedule, or @c None to let
+               @c TaskList.plan_phases() choose it; see @c TaskList.align()
         """
         # The function which is run to implement this task's code. Since it 
         # is a generator, we "run" it here, which doesn't actually run it but
@@ -120,24 +157,53 @@ class Task:
             self.period = period
             self._next_run = None
 
+        ## The offset in microseconds of a periodic task's runs from the start
+        #  of the schedule, which @c TaskList.align() applies
+        self.phase = 0 if phase is None else int(phase * 1000)
+        # Whether TaskList.plan_phases() may choose the phase
+        self._plan_phase = phase is None
+
         # Flag which causes the task to be profiled, in which the execution
         #  time of the @c run() method is measured and basic statistics kept. 
         self._prof = profile
+        self._mem = mem_profile
         self.reset_profile()
 
+        ## The longest time in microseconds a run should take, or @c None
+        self.budget = None if budget is None else int(budget * 1000)
+        ## What is done when a run takes longer than the budget
+        self.on_overrun = on_overrun
+        ## Whether the watchdog depends on this task meeting its deadlines
+        self.critical = critical
+        ## @c False once the task has been disabled for overrunning
+        self.enabled = True
+
+        # How late the latest run started, and the number of runs and missed
+        # deadlines since the task list last checked for the watchdog
+        self._last_late = 0
+        self._wd_runs = 0
+        self._wd_missed = 0
+
+        # The task list holding this task, which is told about overruns
+        self._list = None
+
         # The previous state in which the task last ran. It is used to watch
         # for and track state transitions.
         self._prev_state = 0
 
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
+        # If tracing has been enabled, register the task as a source of
+        # events in the trace buffer shared by all tasks
         self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us()
+        if trace:
+            self._tracer = tracebuf.get()
+            self._tr_id = self._tracer.register(name, tracebuf.SRC_TASK)
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
         self.go_flag = False
+        # A flag with a set() method which go() also sets, so a scheduler can
+        # sleep until the task is ready; aiotask gives triggered tasks one
+        self._wake = None
 
 
     def schedule(self) -> bool:
@@ -150,50 +216,124 @@ class Task:
         @return @c True if the task ran or @c False if it did not
         """
         if self.ready():
+            self.run()
+            return True
 
-            # Reset the go flag for the next run
-            self.go_flag = False
+        else:
+            return False
+
+
+    def run(self, late=None):
+        """!
+        This method runs the task's generator up to its next @c yield, keeping
+        the profiling and tracing data. The schedulers call it when the task
+        is ready; other schedulers, such as the uasyncio adapter in
+        @c aiotask.py, call it directly.
+        @param late How many microseconds after its due time the run started,
+               if the caller keeps time itself; @c ready() records lateness
+               for the cooperative schedulers
+        """
+        # Reset the go flag for the next run
+        self.go_flag = False
 
-            # If profiling, save the start time
+        # If keeping a latency profile for a caller which times runs itself,
+        # record the data
+        if late is not None:
+            self._last_late = late
             if self._prof:
-                stime = utime.ticks_us()
+                self._late_sum += late
+                if late > self._latest:
+                    self._latest = late
 
-            # Run the method belonging to the state which should be run next
-            curr_state = next(self._run_gen)
+        checked = self.budget is not None or self.critical
 
-            # If profiling or tracing, save timing data
-            if self._prof or self._trace:
-                etime = utime.ticks_us()
+        # If profiling memory, save the heap usage before running
+        if self._mem:
+            mstart = gc.mem_alloc()
 
-            # If profiling, save timing data
-            if self._prof:
-                self._runs += 1
-                runt = utime.ticks_diff(etime, stime)
-                if self._runs > 2:
-                    self._run_sum += runt
-                    if runt > self._slowest:
-                        self._slowest = runt
-
-            # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
-            if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append(
-                            (utime.ticks_diff(etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect()
-
-                self._prev_state = curr_state
-                self._prev_time = etime
+        # If profiling or checking the deadline, save the start time
+        if self._prof or checked:
+            stime = utime.ticks_us()
 
-            return True
+        if self._trace:
+            self._tracer.record(tracebuf.EV_START, self._tr_id)
+
+        # Run the method belonging to the state which should be run next
+        curr_state = next(self._run_gen)
+
+        # If profiling memory, see how much the heap grew. If it shrank,
+        # the garbage collector ran during this run, and the amount the
+        # task allocated can't be known
+        if self._mem:
+            used = gc.mem_alloc() - mstart
+            if used < 0:
+                self._gc_events += 1
+            else:
+                self._mem_runs += 1
+                self._alloc_sum += used
+                if used > self._alloc_max:
+                    self._alloc_max = used
+
+        # If profiling or checking the deadline, save timing data
+        if self._prof or checked:
+            etime = utime.ticks_us()
+
+        if checked:
+            self._check_deadline(utime.ticks_diff(etime, stime))
+
+        # If profiling, save timing data
+        if self._prof:
+            self._runs += 1
+            runt = utime.ticks_diff(etime, stime)
+            if self._runs > 2:
+                self._run_sum += runt
+                if runt > self._slowest:
+                    self._slowest = runt
+
+        # If tracing is on, record the end of the run and any transition.
+        # The buffer is preallocated, so this never runs out of memory
+        if self._trace:
+            if curr_state != self._prev_state:
+                self._tracer.record(tracebuf.EV_STATE, self._tr_id,
+                                    curr_state)
+            self._tracer.record(tracebuf.EV_END, self._tr_id, curr_state)
+            self._prev_state = curr_state
 
-        else:
-            return False
+
+    def _check_deadline(self, runt):
+        """!
+        This method counts overruns of the task's budget, takes the task's
+        overrun action, and notes for the watchdog whether a critical task
+        finished before its deadline: within its budget and, if periodic,
+        before its next run was due.
+        @param runt The time in microseconds the run took
+        """
+        over = self.budget is not None and runt > self.budget
+        if over:
+            self.overruns += 1
+            if runt - self.budget > self._worst_overrun:
+                self._worst_overrun = runt - self.budget
+            if self.on_overrun != OVERRUN_LOG and self._list is not None:
+                self._list._penalize(self)
+
+        if self.critical:
+            self._wd_runs += 1
+            if over or (self.period is not None
+                        and self._last_late + runt > self.period):
+                self._wd_missed += 1
+
+
+    def prime(self):
+        """!
+        This method runs the task's generator up to its first @c yield
+        outside of the scheduler, so that setup code at the top of the task
+        function runs during start-up instead of making the task's first
+        scheduled run much slower than the rest. The run is not profiled, and
+        a periodic task's first scheduled run is put one period from now.
+        """
+        self._prev_state = next(self._run_gen)
+        if self.period != None:
+            self._next_run = utime.ticks_add(utime.ticks_us(), self.period)
 
 
     @micropython.native
@@ -211,6 +351,7 @@ class Task:
             late = utime.ticks_diff(utime.ticks_us(), self._next_run)
             if late > 0:
                 self.go_flag = True
+                self._last_late = late
                 self._next_run = utime.ticks_diff(self.period, 
                                                   -self._next_run)
 
@@ -247,13 +388,31 @@ class Task:
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        self._mem_runs = 0
+        self._alloc_sum = 0
+        self._alloc_max = 0
+        self._gc_events = 0
+        ## The number of runs which took longer than the budget
+        self.overruns = 0
+        self._worst_overrun = 0
+
+
+    def avg_run_time(self):
+        """!
+        This method returns the average run time of the task in microseconds,
+        or 0 if the task is not being profiled or hasn't run yet.
+        """
+        if self._prof and self._runs > 0:
+            return self._run_sum / self._runs
+        return 0
 
 
     def get_trace(self):
         """!
-        This method returns a string containing the task's transition trace.
-        The trace is a set of tuples, each of which contains a time and the
-        states from and to which the system transitioned. 
+        This method returns a string containing the task's transition trace,
+        taken from the events still in the trace buffer. Each line holds the
+        time in seconds since the oldest event in the buffer and the states
+        from and to which the task transitioned.
         @return A possibly quite large string showing state transitions
         """
         tr_str = 'Task ' + self.name + ':'
@@ -261,11 +420,18 @@ class Task:
             tr_str += '\n'
             last_state = 0
             total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
-                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
+            prev_t = None
+            for t, kind, source, value in self._tracer.events():
+                if prev_t is not None:
+                    total_time += utime.ticks_diff(t, prev_t) / 1000000.0
+                prev_t = t
+                if source != self._tr_id:
+                    continue
+                if kind == tracebuf.EV_STATE:
+                    tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (
+                        total_time, last_state, int(value))
+                if kind == tracebuf.EV_STATE or kind == tracebuf.EV_END:
+                    last_state = int(value)
         else:
             tr_str += ' not traced'
         return tr_str
@@ -278,6 +444,8 @@ class Task:
         another task which has data that this task needs to process soon.
         """
         self.go_flag = True
+        if self._wake is not None:
+            self._wake.set()
 
 
     def __repr__(self):
@@ -293,12 +461,33 @@ class Task:
             rst += '         -'
         rst += f"{self._runs: 8d}"
 
-        if self._prof and self._runs > 0:
+        prof = self._prof and self._runs > 0
+        if prof:
             avg_dur = (self._run_sum / self._runs) / 1000.0
             avg_late = (self._late_sum / self._runs) / 1000.0
             rst += f"{avg_dur: 10.3f}{(self._slowest / 1000.0): 10.3f}"
             if self.period != None:
                 rst += f"{avg_late: 10.3f}{(self._latest / 1000.0): 10.3f}"
+
+        if self._mem or self.budget is not None:
+            if not prof:
+                rst += ' ' * 20
+            if not (prof and self.period != None):
+                rst += ' ' * 20
+
+        if self._mem:
+            avg_alloc = self._alloc_sum / self._mem_runs \
+                if self._mem_runs > 0 else 0.0
+            rst += f"{avg_alloc: 10.1f}{self._alloc_max: 10d}" \
+                f"{self._gc_events: 6d}"
+
+        if self.budget is not None:
+            if not self._mem:
+                rst += ' ' * 26
+            rst += f"{(self.budget / 1000.0): 8.1f}{self.overruns: 6d}" \
+                f"{(self._worst_overrun / 1000.0): 10.3f}"
+            if not self.enabled:
+                rst += '  disabled'
         return rst
 
 
@@ -330,6 +519,299 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        # Idle garbage collection is off until set_gc() is called
+        self._gc_free = None
+        self._gc_check = 0
+        self._gc_next_check = utime.ticks_ms()
+        self._gc_guess = 0
+        self._gc_wanted = False
+        self._gc_waiting = False
+        self.reset_gc_profile()
+
+        # Tasks waiting to be demoted or disabled for overrunning their budgets
+        self._penalized = []
+        ## Tasks which have been disabled for overrunning their budgets
+        self.disabled = []
+
+        # The watchdog, fed only while the critical tasks meet their deadlines
+        self._wdt = None
+        self._critical = []
+        self._wd_fed = 0
+        self._wd_withheld = 0
+
+
+    def set_gc(self, free_threshold, check_ms=50, first_guess_us=3000):
+        """!
+        Turn on garbage collection in idle time.
+
+        When no task is ready to run, the scheduler checks (at most once per
+        @c check_ms) how much heap is free. If less than @c free_threshold
+        bytes are free, it runs @c gc.collect() as long as the time left
+        before the next periodic task is due is longer than the slowest
+        collection measured so far. MicroPython's collector can't be run in
+        pieces, so a collection is only started when it is expected to fit.
+        Keeping the heap from filling up means that the automatic collection,
+        which would run in the middle of whichever task happened to be
+        allocating, rarely if ever happens.
+        @param free_threshold Collect when fewer than this many bytes are
+               free, or @c None to turn idle collection off
+        @param check_ms The least time in milliseconds between heap checks,
+               since checking the heap takes time itself
+        @param first_guess_us Estimated collection time in microseconds
+               used until a collection has been measured
+        """
+        self._gc_free = free_threshold
+        self._gc_check = check_ms
+        self._gc_guess = first_guess_us
+
+
+    def set_watchdog(self, wdt):
+        """!
+        Feed a watchdog timer only while the critical tasks keep up.
+
+        Whenever every task created with @c critical=True has run at least
+        once since the last check, the scheduler looks at whether each of
+        those runs finished within the task's budget and before its next run
+        was due. If so, the watchdog is fed; if not, it isn't, and the check
+        starts again. The watchdog's timeout therefore sets how long the
+        critical tasks may keep missing deadlines before the board is reset.
+        The check is made in idle time, or by a coroutine of its own under
+        @c aiotask, so a scheduler which never goes idle doesn't feed the
+        watchdog either.
+        @param wdt An object with a @c feed() method, such as @c machine.WDT
+        """
+        self._wdt = wdt
+
+
+    def plan_phases(self, run_times=None, step=250, default_run=500):
+        """!
+        Stagger the periodic tasks so that their runs fall due at different
+        times as far as possible.
+
+        Tasks with equal or related periods which start together become ready
+        in the same pass, and all but one of them then run late every time.
+        This method lays the tasks out one at a time over the hyperperiod, the
+        least common multiple of their periods, in slots of @c step
+        microseconds: tasks given a fixed phase first, then the rest from the
+        highest priority and shortest period down. Each task gets the phase
+        at which its runs overlap least with those already laid out, the
+        earliest such phase winning ties. The hyperperiod is cut short at
+        @c MAX_HYPERPERIOD, which makes the plan approximate. Tasks without a
+        period can't be planned. Call @c align() afterwards to apply the
+        phases.
+        @param run_times Dictionary of run times in microseconds by task, for
+               instance measured in an earlier run. Otherwise a task's slowest
+               profiled run is used if it has been profiled, then its budget,
+               then @c default_run
+        @param step The resolution of the phases in microseconds
+        @param default_run The run time in microseconds assumed for tasks
+               with nothing better to go on
+        @return Dictionary of the phases in microseconds by task
+        """
+        tasks = [task for pri in self.pri_list for task in pri[2:]
+                 if task.period is not None]
+        tasks.sort(key=lambda t: (t._plan_phase, -t.priority, t.period))
+
+        hyper = 1
+        for task in tasks:
+            slots = max(1, task.period // step)
+            hyper = hyper * slots // _gcd(hyper, slots)
+            if hyper * step > MAX_HYPERPERIOD:
+                hyper = MAX_HYPERPERIOD // step
+                break
+
+        # The number of tasks laid out in each slot of the hyperperiod
+        busy = bytearray(hyper)
+        phases = {}
+        for task in tasks:
+            period = max(1, task.period // step)
+            if run_times is not None and task in run_times:
+                run = run_times[task]
+            elif task._prof and task._runs > 2:
+                run = task._slowest
+            elif task.budget is not None:
+                run = task.budget
+            else:
+                run = default_run
+            width = min(period, max(1, -(-int(run) // step)))
+
+            if task._plan_phase:
+                # Fold the hyperperiod onto one period of this task, so the
+                # overlap at each phase is a sum over a few slots
+                fold = [0] * period
+                for i in range(hyper):
+                    fold[i % period] += busy[i]
+                best = None
+                for p in range(period):
+                    cost = 0
+                    for j in range(width):
+                        cost += fold[(p + j) % period]
+                    if best is None or cost < best:
+                        best = cost
+                        slot = p
+                task.phase = slot * step
+            else:
+                slot = (task.phase // step) % period
+
+            for start in range(slot, hyper, period):
+                for j in range(width):
+                    i = (start + j) % hyper
+                    if busy[i] < 255:
+                        busy[i] += 1
+            phases[task] = task.phase
+        return phases
+
+
+    def align(self, now=None):
+        """!
+        Start the schedules of all periodic tasks together, so that their
+        phases set how their runs are spread out. Each task's first run falls
+        due one period and its phase after @c now; @c prime() can't do this,
+        since the tasks are primed one after another.
+        @param now The start of the schedule from @c utime.ticks_us(), by
+               default the present time
+        """
+        if now is None:
+            now = utime.ticks_us()
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task.period is not None:
+                    task._next_run = utime.ticks_add(now, task.period
+                                                     + task.phase)
+
+
+    def _penalize(self, task):
+        """!
+        Note that a task overran its budget and should be demoted or disabled.
+        The change is made by the scheduler after the run, since the task
+        can't be moved while the priority lists are being walked.
+        @param task The task which overran
+        """
+        if task not in self._penalized:
+            self._penalized.append(task)
+
+
+    def _remove(self, task):
+        """!
+        Take a task out of the priority lists.
+        @param task The task to be removed
+        """
+        for pri in self.pri_list:
+            if task in pri[2:]:
+                pri.remove(task)
+                if len(pri) <= 2:
+                    self.pri_list.remove(pri)
+                elif pri[1] >= len(pri):
+                    pri[1] = 2
+                return
+
+
+    def _apply_penalties(self):
+        """!
+        Demote or disable the tasks which have overrun since the last call.
+        """
+        for task in self._penalized:
+            self._remove(task)
+            if task.on_overrun == OVERRUN_DEMOTE:
+                if task.priority > 0:
+                    task.priority -= 1
+                self.append(task)
+            else:
+                task.enabled = False
+                self.disabled.append(task)
+        self._penalized = []
+
+
+    def _check_watchdog(self):
+        """!
+        Feed the watchdog if every critical task has run and met its deadlines
+        since the last check; see @c set_watchdog().
+        """
+        for task in self._critical:
+            if task._wd_runs == 0:
+                return
+
+        missed = 0
+        for task in self._critical:
+            missed += task._wd_missed
+            task._wd_runs = 0
+            task._wd_missed = 0
+
+        if missed == 0:
+            self._wdt.feed()
+            self._wd_fed += 1
+        else:
+            self._wd_withheld += 1
+
+
+    def reset_gc_profile(self):
+        """!
+        Reset the statistics kept about idle garbage collections.
+        """
+        self._gc_runs = 0
+        self._gc_sum = 0
+        self._gc_slowest = 0
+        self._gc_deferred = 0
+
+
+    def _slack(self, now):
+        """!
+        Find the time until the next periodic task is due to run.
+        @param now The current time from @c utime.ticks_us()
+        @return The time in microseconds, negative if a task is late, or
+                @c None if no task is periodic
+        """
+        slack = None
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task.period is not None:
+                    until = utime.ticks_diff(task._next_run, now)
+                    if slack is None or until < slack:
+                        slack = until
+        return slack
+
+
+    def _idle(self):
+        """!
+        Use idle time before the next deadline for garbage collection, if it
+        has been turned on with @c set_gc() and the heap is getting full.
+        """
+        if self._wdt is not None:
+            self._check_watchdog()
+
+        if self._gc_free is None:
+            return
+
+        # Check the heap now and then; once it's found to be getting full,
+        # keep looking for enough slack on each idle pass until collected
+        if not self._gc_wanted:
+            if utime.ticks_diff(utime.ticks_ms(), self._gc_next_check) < 0:
+                return
+            self._gc_next_check = utime.ticks_add(utime.ticks_ms(),
+                                                  self._gc_check)
+            if gc.mem_free() >= self._gc_free:
+                return
+            self._gc_wanted = True
+
+        now = utime.ticks_us()
+        slack = self._slack(now)
+        if slack is not None and slack < max(self._gc_slowest,
+                                             self._gc_guess):
+            # Not enough time now; count each collection that has to wait
+            if not self._gc_waiting:
+                self._gc_deferred += 1
+                self._gc_waiting = True
+            return
+
+        self._gc_wanted = False
+        self._gc_waiting = False
+        gc.collect()
+        dur = utime.ticks_diff(utime.ticks_us(), now)
+        self._gc_runs += 1
+        self._gc_sum += dur
+        if dur > self._gc_slowest:
+            self._gc_slowest = dur
+
 
     def append(self, task):
         """!
@@ -338,6 +820,10 @@ class TaskList:
         task which is ready to run at any given time. 
         @param task The task to be appended to the list
         """
+        task._list = self
+        if task.critical and task not in self._critical:
+            self._critical.append(task)
+
         # See if there's a tasklist with the given priority in the main list
         new_pri = task.priority
         for pri in self.pri_list:
@@ -376,6 +862,9 @@ class TaskList:
             for task in pri[2:]:
                 task.schedule()
 
+        if self._penalized:
+            self._apply_penalties()
+
 
     @micropython.native
     def pri_sched(self):
@@ -400,18 +889,37 @@ class TaskList:
                 if pri[1] >= length:
                     pri[1] = 2
                 if ran:
+                    if self._penalized:
+                        self._apply_penalties()
                     return
 
+        # No task was ready, so this is idle time
+        self._idle()
+
 
     def __repr__(self):
         """!
         Create some diagnostic text showing the tasks in the task list.
         """
         ret_str = 'TASK             PRI    PERIOD    RUNS   AVG DUR   MAX ' \
-            'DUR  AVG LATE  MAX LATE\n'
+            'DUR  AVG LATE  MAX LATE AVG ALLOC MAX ALLOC   GCS  BUDGET   ' \
+            'OVR  MAX OVER\n'
         for pri in self.pri_list:
             for task in pri[2:]:
                 ret_str += str(task) + '\n'
+        for task in self.disabled:
+            ret_str += str(task) + '\n'
+
+        if self._gc_free is not None:
+            avg_gc = self._gc_sum / self._gc_runs / 1000.0 \
+                if self._gc_runs > 0 else 0.0
+            ret_str += f"{'Idle GC':<16s}{'':4s}{'':10s}{self._gc_runs: 8d}" \
+                f"{avg_gc: 10.3f}{(self._gc_slowest / 1000.0): 10.3f}" \
+                f"  deferred {self._gc_deferred:d}\n"
+
+        if self._wdt is not None:
+            ret_str += f"{'Watchdog':<16s}  fed {self._wd_fed:d}" \
+                f"  withheld {self._wd_withheld:d}\n"
 
         return ret_str
 
@@ -1,91 +1,36 @@
-import pyb
+import struct
 import utime
-from encoder_reader import EncoderReader
 from control import Control
-from motor_driver import MotorDriver
-from servo_driver import Servo
-from flywheel_driver import Flywheel
-import utime as time
 import settings
-
-YAW_IDLE = 0
-YAW_RESET = 1
-YAW_POSITION = 2
-YAW_POSITION_SETTLED = 3
-YAW_RAW_PWM = 4
-YAW_HOME = 5
-
-def yaw(shares):
+import telemetry
+import camera_cal
+import axis
+import bus
+
+# The yaw axis's modes, as used by the mission and the camera task
+YAW_IDLE = axis.IDLE
+YAW_RESET = axis.RESET
+YAW_POSITION = axis.POSITION
+YAW_POSITION_SETTLED = axis.POSITION_SETTLED
+YAW_RAW_PWM = axis.RAW_PWM
+YAW_HOME = axis.HOME
+
+# Tracking modes, the track_mode parameter
+TRACK_PIXEL = 0
+TRACK_ANGLE = 1
+
+def run_axis(shares):
     """!
-    @brief Controls the yaw motor and encoder for the Nerf turret.
+    @brief Runs one axis of the turret, such as yaw or pitch.
 
-    This function manages the yaw motor's movement using PID control,
-    ensuring that it does not turn past its initial starting point (0 degrees)
-    and 270 degrees past that, no matter what value of yawcon.
+    Each run reads the axis's encoder, runs the loop for its mode and sets its driver;
+    see @c axis.Axis for the modes.
 
-    @param shares Tuple containing shared variables for x-axis error and yaw control state.
+    @param shares Tuple containing the @c axis.Axis to be run.
     """
-    yaw_control, yaw_mode = shares
-
-    yaw_motor = MotorDriver(pyb.Pin.board.PA10, pyb.Pin.board.PB4, pyb.Pin.board.PB5, 3)
-    yaw_motor.set_duty_cycle(0)
-
-    yaw_encoder = EncoderReader(pyb.Pin.board.PC6, pyb.Pin.board.PC7, 8)
-    yaw_encoder.zero()
-
-    con = Control(settings.yaw_p, settings.yaw_i, settings.yaw_d, setpoint=0, initial_output=0, settled_d_thresh=5, settled_e_thresh=200)
-    con.set_setpoint(0)
-
-    vel_con = Control(settings.yaw_v_p, settings.yaw_v_i, settings.yaw_v_d, setpoint=0, initial_output=0, settled_d_thresh=5, settled_e_thresh=200)
-    con.set_setpoint(0)
-
-    home_start = None
-    last_t = utime.ticks_ms()
-
+    ax, = shares
     while True:
-
-        measured_output = yaw_encoder.read()
-        t = utime.ticks_ms()
-        delta_t = t - last_t
-        motor_actuation = 0
-
-        # 0 = IDLE
-        if yaw_mode.get() == YAW_IDLE:
-            motor_actuation = 0
-
-        elif yaw_mode.get() == YAW_RESET:  # DISABLE
-            yaw_encoder.zero()
-            motor_actuation = 0
-
-        elif yaw_mode.get() == YAW_POSITION or yaw_mode.get() == YAW_POSITION_SETTLED:  # POSITIONAL CONTROL
-            con.set_setpoint(yaw_control.get())
-            motor_actuation = con.run(measured_output)
-            # print("ERR", con.error_prev)
-            if con.is_settled():
-                yaw_mode.put(YAW_POSITION_SETTLED)
-            else:
-                yaw_mode.put(YAW_POSITION)
-
-        elif yaw_mode.get() == YAW_RAW_PWM:  # PWM CONTROL
-            motor_actuation = yaw_control.get()
-
-
-        # HOME
-        if yaw_mode.get() == YAW_HOME:  # HOME
-            home_start = home_start or utime.ticks_ms()
-            vel_con.set_setpoint(yaw_control.get())
-            motor_actuation = vel_con.run(yaw_encoder.delta() / delta_t)
-
-            print("HOME", yaw_encoder.delta(), motor_actuation, utime.ticks_ms() - home_start)
-
-            if yaw_encoder.delta() == 0 and utime.ticks_ms() - home_start > 1000:
-                home_start = None
-                yaw_encoder.zero()
-                yaw_mode.put(YAW_RESET)
-
-        yaw_motor.set_duty_cycle(motor_actuation)
-
-        last_t = t
+        ax.update()
         yield 0
 
 def flywheel(shares):
@@ -93,25 +38,31 @@ def flywheel(shares):
     @brief Controls the speed of the flywheel motors and adjusts pitch based on y-axis error.
 
     This function handles the speed and pitch of the flywheel motors using the y-axis error
-    from the thermal camera. It applies a differential speed to the motors, causing the Nerf
-    ball to pitch up or down based on the error.
+    from the thermal camera. It applies a differential speed to the motors, looked up in the
+    ballistics tables for the target range and y error, causing the Nerf ball to pitch up or
+    down. It also publishes the dart's time of flight for the camera task's yaw lead.
 
-    @param shares Tuple containing shared variables for flywheel base speed and y-axis error.
+    @param shares Tuple containing the lower and upper flywheels, then shared variables for
+           flywheel base speed and y-axis error, the @c ballistics.Ballistics tables and a
+           share into which the time of flight in seconds is written.
     """
-    speedperc, errory = shares
-    flywheelL = Flywheel(pyb.Pin.board.PB8, 4, 3)
-    flywheelU = Flywheel(pyb.Pin.board.PB9, 4, 4)
+    flywheelL, flywheelU, speedperc, errory, table, tof = shares
+    fparams = settings.fparams
+    tm = telemetry.recorder
 
     while True:
 
         base_speed = speedperc.get()
-        pitch = -settings.pitch_factor * errory.get()
+        rng = fparams[settings.TARGET_RANGE]
+        pitch = table.differential(rng, errory.get())
+        tof.put(table.time_of_flight(rng))
+        tm.sample(telemetry.CH_FLYWHEEL_DIFF, pitch)
 
-        upper_speed = base_speed * (1 + pitch)
-        lower_speed = base_speed * (1 - pitch)
+        upper_speed = min(max(base_speed * (1 + pitch), 0), 100)
+        lower_speed = min(max(base_speed * (1 - pitch), 0), 100)
 
-        flywheelU.set_percent(base_speed)
-        flywheelL.set_percent(base_speed)
+        flywheelU.set_percent(upper_speed)
+        flywheelL.set_percent(lower_speed)
 
         flywheelU.loop()
         flywheelL.loop()
@@ -126,10 +77,9 @@ def firing_pin(shares):
     a dart. In the Delay state, the system waits for a predefined time before transitioning
     to the Return state. In the Return state, the servo resets to its original position.
 
-    @param shares Shared variable for the servo actuation flag.
+    @param shares Tuple containing the firing servo and the servo actuation flag share.
     """
-    fire = shares
-    servo = Servo(pyb.Pin.board.PB10)
+    servo, fire = shares
     while True:
         if fire.get() == 1 and servo.is_set:
             servo.back()
@@ -147,31 +97,162 @@ def camera(shares):
     centroid data (x and y errors) and processes the received data. Invalid or out-of-range
     values are handled to prevent unexpected behavior.
 
-    @param shares Tuple containing shared variables for x-axis and y-axis errors.
+    The task is meant to run with no period, woken by the camera UART's receive idle
+    interrupt calling the task's go() method. Each run reads everything waiting in the
+    UART, acts only on the newest complete line and counts the older lines it skips as
+    stale, so the turret always responds to the latest frame.
+
+    Each frame describes where the target was when the camera captured it, cam_latency
+    ms before the line arrived, and the turret may have turned since. The yaw encoder's
+    position at the capture time is looked up in its history, so the target's angle is
+    taken from where the turret pointed then, and in pixel tracking the error is moved
+    by the turn since. The encoder is only looked up here; the yaw task reads it.
+
+    While tracking, the task aims ahead of a moving target by the distance it moves across
+    the image during the dart's time of flight, from the flywheel task's ballistics lookup.
+
+    While tracking, the pitch axis is also steered by the target's vertical offset from
+    the boresight row, taking pitch_gain of the error each frame since the pitch servo
+    has no encoder from which to look up where it was at capture.
+
+    Every frame's target angle, from where the turret pointed at capture and without
+    lead, is written to the sighting share for the bus task to report.
+
+    With the track_mode parameter at TRACK_ANGLE, each centroid is converted to an angle
+    with the camera calibration and the yaw position loop is sent straight to the target's
+    absolute angle; the turret fires once the loop has settled with the target within
+    track_fire_err degrees across and up. At TRACK_PIXEL, a PID on the pixel error drives the yaw motor
+    with raw PWM instead, but never outwards once the turret is at an edge of the field of
+    fire, yaw_min to yaw_max.
+
+    @param shares Tuple containing the camera UART, the yaw control, yaw mode, camera
+           control flag, y error and fire flag shares, shares into which the UART
+           backlog in bytes and the running count of dropped stale frames are written,
+           the time of flight share, the yaw encoder reader, the pitch control share and
+           the sighting share.
     """
-    yaw_control, yaw_mode, cam_control_flag, errory, fire_flag = shares
-    cam = pyb.UART(4, 115200, timeout=0)
+    cam, yaw_control, yaw_mode, cam_control_flag, errory, fire_flag, cam_backlog, cam_drops, tof, yaw_encoder, pitch_control, sighting = shares
+
+    fparams = settings.fparams
+    iparams = settings.iparams
+    cal = camera_cal.load()
+    con = Control(fparams[settings.TX_P], fparams[settings.TX_I], fparams[settings.TX_D], 0, 0, settled_e_thresh=fparams[settings.TX_SETTLE_E], settled_d_thresh=fparams[settings.TX_SETTLE_D])
+
+    tm = telemetry.recorder
+    params_version = settings.store.version
 
-    con = Control(settings.tx_p, settings.tx_i, settings.tx_d, 0, 0, settled_e_thresh=settings.tx_settle_e, settled_d_thresh=settings.tx_settle_d)
+    rx = bytearray(64)
+    line = bytearray(32)
+    line_len = 0
+    drops = 0
+
+    # Target speed across the image in pixels per second, for the lead
+    last_x = None
+    last_frame = utime.ticks_us()
+    x_rate = 0.0
 
-    res = ""
     while True:
-        if cam.any():
-            c = chr(cam.readchar())
-            if c != "\n":
-                res += c
-                continue
+        # Pick up gains changed over the command channel
+        if params_version != settings.store.version:
+            params_version = settings.store.version
+            con.set_gains(fparams[settings.TX_P], fparams[settings.TX_I], fparams[settings.TX_D])
+            con.set_thresholds(fparams[settings.TX_SETTLE_E], fparams[settings.TX_SETTLE_D])
+
+        backlog = cam.any()
+        cam_backlog.put(backlog)
+        tm.sample(telemetry.CH_CAM_BACKLOG, backlog)
+
+        # Read everything waiting, keeping only the newest complete line
+        res = None
+        while cam.any():
+            n = cam.readinto(rx) or 0
+            for i in range(n):
+                c = rx[i]
+                if c == 0x0A:
+                    if res is not None:
+                        drops += 1
+                    res = bytes(line[:line_len])
+                    line_len = 0
+                elif line_len < len(line):
+                    line[line_len] = c
+                    line_len += 1
+
+        if res is not None:
+            cam_drops.put(drops)
+            tm.sample(telemetry.CH_CAM_DROPS, drops)
 
             try:
                 # Parse the response and split by comma
-                # print(res)
-                x, y = res.strip().split(',')
+                x, y = res.decode().strip().split(',')
                 x, y = float(x), float(y)
 
+                tm.sample(telemetry.CH_CAM_X, x)
+                tm.sample(telemetry.CH_CAM_Y, y)
+
+                # Where the turret pointed when the frame was captured, and how
+                # far it has turned since, in degrees
+                now = utime.ticks_us()
+                captured = utime.ticks_add(now, -1000 * iparams[settings.CAM_LATENCY])
+                then = yaw_encoder.position_at(captured) / settings.deg_fac
+                moved = yaw_encoder.count / settings.deg_fac - then
+                tm.sample(telemetry.CH_CAM_MOTION, moved)
+
+                # Smooth the target's speed across the image, measured in pixels
+                # fixed to the room so the turret's own turning doesn't count;
+                # after a gap in frames start again rather than trust a stale position
+                fov = fparams[settings.CAM_FOV]
+                fixed_x = x - then * camera_cal.IMG_WIDTH / fov if fov else x
+                dt = utime.ticks_diff(now, last_frame) / 1000000
+                last_frame = now
+                if last_x is None or dt <= 0 or dt > 0.5:
+                    x_rate = 0.0
+                else:
+                    x_rate += 0.5 * ((fixed_x - last_x) / dt - x_rate)
+                last_x = fixed_x
+                lead = fparams[settings.LEAD_GAIN] * x_rate * tof.get()
+                tm.sample(telemetry.CH_CAM_LEAD, lead)
+                sighting.put(then + cal.angle(x, fov, fparams[settings.OFF_X]))
+
+                # Turn the pitch part of the way to the target's height
+                up = (fparams[settings.OFF_Y] - y) * fparams[settings.CAM_VFOV] / camera_cal.IMG_HEIGHT
                 if cam_control_flag.get() == 1:
-                    act = con.run(-x + settings.off_x)
-                    print("CAM CON", con.error, con.error_dot)
-                    print("ACT", act)
+                    pitch = pitch_control.get() + fparams[settings.PITCH_GAIN] * up
+                    pitch = min(max(pitch, fparams[settings.PITCH_MIN]), fparams[settings.PITCH_MAX])
+                    pitch_control.put(pitch)
+
+                if cam_control_flag.get() == 1 and iparams[settings.TRACK_MODE] == TRACK_ANGLE:
+                    # Send the position loop to the target's absolute angle,
+                    # measured from where the turret pointed at capture
+                    off = cal.angle(x + lead, fov, fparams[settings.OFF_X])
+                    target = then + off
+                    target = min(max(target, fparams[settings.YAW_MIN]), fparams[settings.YAW_MAX])
+                    tm.sample(telemetry.CH_CAM_ERROR, off)
+                    yaw_control.put(target * settings.deg_fac)
+                    mode = yaw_mode.get()
+                    if mode != YAW_POSITION and mode != YAW_POSITION_SETTLED:
+                        yaw_mode.put(YAW_POSITION)
+
+                    err = fparams[settings.TRACK_FIRE_ERR]
+                    if mode == YAW_POSITION_SETTLED and abs(off - moved) < err and abs(up) < err:
+                        fire_flag.put(1)
+                        cam_control_flag.put(0)
+                    else:
+                        fire_flag.put(0)
+
+                elif cam_control_flag.get() == 1:
+                    # Move the target across the image by the turn since capture
+                    if fov:
+                        x += moved * camera_cal.IMG_WIDTH / fov
+                    act = con.run(-(x + lead) + fparams[settings.OFF_X])
+                    # Don't drive out of the field of fire, which keeps clear of
+                    # the other turrets; the yaw axis only knows its travel limits
+                    pos = yaw_encoder.count / settings.deg_fac
+                    if (act > 0 and pos >= fparams[settings.YAW_MAX]) or \
+                            (act < 0 and pos <= fparams[settings.YAW_MIN]):
+                        act = 0
+                    tm.sample(telemetry.CH_CAM_ERROR, con.error)
+                    tm.sample(telemetry.CH_CAM_ERROR_DOT, con.error_dot)
+                    tm.sample(telemetry.CH_CAM_ACTUATION, act)
                     yaw_mode.put(YAW_RAW_PWM)
                     yaw_control.put(act)
 
@@ -183,9 +264,127 @@ def camera(shares):
 
                 errory.put(y)
 
-            except ValueError:
+            except (ValueError, UnicodeError):
                 pass
 
-            res = ""
+        yield 0
+
+
+def host_link(shares):
+    """!
+    @brief Streams telemetry to the host and runs commands received from it.
+
+    Each run this task samples the watched shares, runs any complete command
+    lines received from the host, and sends a bounded number of buffered
+    telemetry bytes so that it never blocks the other tasks for long. Once a
+    second it also reports the average run time of each profiled task, an
+    overrun event for each task which has overrun its budget since the last
+    report, and the number of dropped telemetry records.
+
+    @param shares Tuple containing the host UART and the task list followed by
+           the yaw control, yaw mode, flywheel speed, fire flag, pitch control and
+           pitch mode shares.
+    """
+    link, task_list, yaw_control, yaw_mode, speed, fire, pitch_control, pitch_mode = shares
+
+    tm = telemetry.recorder
+    parser = telemetry.CommandParser(settings.store, tm)
+    parser.add_share("yaw", yaw_control)
+    parser.add_share("mode", yaw_mode)
+    parser.add_share("speed", speed)
+    parser.add_share("fire", fire)
+    parser.add_share("pitch", pitch_control)
+    parser.add_share("pmode", pitch_mode)
+
+    last_report = utime.ticks_ms()
+    overruns = {}
+
+    while True:
+        tm.sample(telemetry.CH_YAW_SETPOINT, yaw_control.get())
+        tm.sample(telemetry.CH_FLYWHEEL_SPEED, speed.get())
+        tm.sample(telemetry.CH_FIRE, fire.get())
+
+        if link.any():
+            parser.feed(link.read())
+
+        if utime.ticks_diff(utime.ticks_ms(), last_report) >= 1000:
+            last_report = utime.ticks_ms()
+            num = 0
+            for pri in task_list.pri_list:
+                for task in pri[2:]:
+                    tm.log(telemetry.KIND_TASK, num, task.avg_run_time())
+                    if task.overruns != overruns.get(task, 0):
+                        overruns[task] = task.overruns
+                        tm.event(telemetry.EV_OVERRUN, num)
+                    num += 1
+            tm.log(telemetry.KIND_STATUS, telemetry.ST_DROPPED, tm.dropped)
+
+        tm.drain(link)
+        yield 0
+
+
+def bus_link(shares):
+    """!
+    @brief Answers the host coordinator on the multi-turret bus.
+
+    The coordinator polls each turret in turn; this task answers a poll with the mission
+    state, the yaw angle, and the latest target angle from the camera if a target has
+    been seen since the last poll. The coordinator's assignments are written to the
+    engage share, which lets the mission start tracking, and its bearing to wait at to
+    the yaw_active parameter; its sector sets the yaw_min and yaw_max parameters within
+    which the camera task aims. If the coordinator falls silent for LINK_TIMEOUT_MS the
+    turret is allowed to engage on its own again.
+
+    @param shares Tuple containing the @c bus.BusLink, the mission @c StateMachine, the
+           yaw encoder reader, then the sighting, engage and fire flag shares.
+    """
+    link, mission, yaw_encoder, sighting, engage, fire = shares
+
+    store = settings.store
+    nan = float("nan")
+    sighting.put(nan)
+    seen = 0
+    bearing = nan
+    shots = 0
+    firing = 0
+    last_heard = utime.ticks_ms()
+
+    while True:
+        # Count shots as the fire flag is raised
+        f = fire.get()
+        if f and not firing:
+            shots += 1
+        firing = f
+
+        # Keep the newest sighting until the coordinator collects it
+        b = sighting.get()
+        if b == b:
+            seen = 1
+            bearing = b
+            sighting.put(nan)
+
+        kind = link.receive()
+        while kind is not None:
+            last_heard = utime.ticks_ms()
+            try:
+                if kind == bus.MSG_POLL:
+                    link.send(bus.MSG_STATUS, bus.FMT_STATUS, mission.state,
+                              yaw_encoder.count / settings.deg_fac, seen, bearing,
+                              shots & 0xFFFF)
+                    seen = 0
+                elif kind == bus.MSG_ASSIGN:
+                    go, aim = struct.unpack(bus.FMT_ASSIGN, link.payload)
+                    engage.put(go)
+                    if aim == aim:
+                        store.set("yaw_active", aim)
+                elif kind == bus.MSG_SECTOR:
+                    low, high = struct.unpack(bus.FMT_SECTOR, link.payload)
+                    store.set("yaw_min", low)
+                    store.set("yaw_max", high)
+            except ValueError:
+                pass
+            kind = link.receive()
 
+        if utime.ticks_diff(utime.ticks_ms(), last_heard) > bus.LINK_TIMEOUT_MS:
+            engage.put(1)
         yield 0
@@ -1,64 +1,169 @@
 """!
-@file control.py
+@file encoder_reader.py
 Contains the EncoderReader class which is used to track the position of an
 encoder.
+
+The timer counts encoder edges in hardware but only holds 16 bits (or 30 bits
+on a 32-bit timer, since MicroPython's small integers stop there), so each
+read works out how far the counter moved since the last read, modulo the
+counter's range, and adds that to a count which doesn't wrap. This is correct
+as long as the encoder moves less than half the counter's range between reads;
+with a 16-bit timer that is 32767 counts, or about 2.6 output turns of the yaw
+axis in one task period.
+
+Each read is also kept with its time in a short history, so that another task
+can ask where the encoder was at a moment in the recent past with
+@c position_at(), for instance when a camera frame was captured.
 """
+import array
 import pyb
+import micropython
 import utime
 
+import resources
+
+## The largest count of a 16-bit timer
 ENC_MAX = 0xFFFF
+## The largest count used on a 32-bit timer, kept within a small integer
+ENC_MAX_32 = 0x3FFFFFFF
+## Timers which have 32-bit counters on the STM32L476
+TIMERS_32 = (2, 5)
+## Reads kept in the history by default; 32 reads every 10 ms cover 320 ms
+HISTORY_LEN = 32
+
+
+@micropython.viper
+def _extend(cnt: int, last: int, mask: int) -> int:
+    """!
+    Gives the signed change between two readings of a counter which wraps at
+    @c mask + 1, a power of two.
+    @param cnt The latest counter reading
+    @param last The previous counter reading
+    @param mask The counter's largest value
+    @return The change, from -(mask + 1) / 2 to (mask - 1) / 2
+    """
+    delta = (cnt - last) & mask
+    if delta > (mask >> 1):
+        delta -= mask + 1
+    return delta
 
 
 class EncoderReader:
-    count = 0
-    last_raw_cnt = 0
+    """!
+    Reads a quadrature encoder with a timer in encoder mode and keeps a count
+    which doesn't overflow.
+    """
 
-    def __init__(self, pin_a, pin_b, timer):
+    def __init__(self, pin_a, pin_b, timer, bits=16, history=HISTORY_LEN):
         """!
         Creates an encoder reader on the passed pin names and
         timer number.
         @param pin_a The first input pin to be assigned by the encoder.
         @param pin_b The second input pin to be assigned by the encoder.
         @param timer The passed timer channel.
+        @param bits 16, or 32 to use the whole width of timer 2 or 5
+        @param history The number of reads kept for @c position_at()
         """
+        if history < 2:
+            raise ValueError("history must hold at least 2 reads")
+        if bits == 32:
+            if timer not in TIMERS_32:
+                raise ValueError("Timer " + str(timer) + " has a 16-bit counter")
+            self._mask = ENC_MAX_32
+        elif bits == 16:
+            self._mask = ENC_MAX
+        else:
+            raise ValueError("bits must be 16 or 32")
+
         # https://github.com/dhylands/upy-examples/blob/master/encoder2.py
         pa = pyb.Pin(pin_a, mode=pyb.Pin.IN)
         pb = pyb.Pin(pin_b, mode=pyb.Pin.IN)
 
-        self.tim = pyb.Timer(timer, prescaler=0, period=ENC_MAX)
-        self.ch_1 = self.tim.channel(1, pyb.Timer.ENC_AB, pin=pa)
-        self.ch_2 = self.tim.channel(2, pyb.Timer.ENC_AB, pin=pb)
+        self.tim = resources.timer(timer, "EncoderReader", prescaler=0, period=self._mask)
+        self.ch_1 = resources.channel(timer, 1, "EncoderReader", pyb.Timer.ENC_AB, pin=pa)
+        self.ch_2 = resources.channel(timer, 2, "EncoderReader", pyb.Timer.ENC_AB, pin=pb)
+
+        ## Position in encoder counts since the last zero
+        self.count = 0
+        self._last_raw = self.tim.counter()
         self._delta = 0
+
+        # Times in microseconds and counts of the latest reads, as a ring
+        self._hist_t = array.array('l', [0] * history)
+        self._hist_c = array.array('l', [0] * history)
+        self._hist_len = history
+        self._hist_i = 0
+        self._hist_n = 0
+
+    @micropython.native
     def read(self):
         """!
         Reads the encoder count on the passed encoder and allows
         for under and overflow correction.
+        @return The position in encoder counts
         """
-        # Previous count received from the encoder on the last read
         cnt = self.tim.counter()
+        delta = _extend(cnt, self._last_raw, self._mask)
+        self._last_raw = cnt
+        self._delta = delta
+        self.count += delta
 
-        # Difference between the last read count (cnt) and the raw count
-        delta = cnt - self.last_raw_cnt
-
-        # Overflow max -> min
-        if delta > ENC_MAX // 2:
-            delta = ENC_MAX - delta
+        i = self._hist_i
+        self._hist_t[i] = utime.ticks_us()
+        self._hist_c[i] = self.count
+        i += 1
+        self._hist_i = 0 if i == self._hist_len else i
+        if self._hist_n < self._hist_len:
+            self._hist_n += 1
+        return self.count
 
-        # Overflow min -> max
-        elif delta < -ENC_MAX // 2:
-            delta = -ENC_MAX - delta
+    @micropython.native
+    def position_at(self, ticks):
+        """!
+        Works out where the encoder was at a recent moment by interpolating
+        between the reads either side of it in the history. This doesn't read
+        the encoder, so it can be called from a task other than the one which
+        calls @c read().
+        @param ticks The moment, from @c utime.ticks_us()
+        @return The position in encoder counts, which is the newest read for a
+                moment after it and the oldest kept for one before that
+        """
+        n = self._hist_n
+        if n == 0:
+            return self.count
+        ts = self._hist_t
+        cs = self._hist_c
+        size = self._hist_len
 
-        self.count += delta
-        self.last_raw_cnt = cnt
-        self._delta = delta
-        return self.count
+        # Walk back from the newest read to the first one at or before the moment
+        newer = self._hist_i - 1
+        if newer < 0:
+            newer += size
+        if utime.ticks_diff(ticks, ts[newer]) >= 0:
+            return cs[newer]
+        for _ in range(n - 1):
+            older = newer - 1
+            if older < 0:
+                older += size
+            since = utime.ticks_diff(ticks, ts[older])
+            if since >= 0:
+                span = utime.ticks_diff(ts[newer], ts[older])
+                return cs[older] + (cs[newer] - cs[older]) * since / span
+            newer = older
+        return cs[newer]
 
     def delta(self):
+        """!
+        Returns the change in count found by the latest @c read().
+        """
         return self._delta
 
     def zero(self):
         """!
-        Resets the count from the passed encoder to zero.
+        Resets the count from the passed encoder to zero and forgets the
+        history, whose counts were from the old zero.
         """
         self.count = 0
-
+        self._last_raw = self.tim.counter()
+        self._delta = 0
+        self._hist_n = 0
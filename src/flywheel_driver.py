@@ -1,5 +1,6 @@
 import pyb
 
+import resources
 import settings
 import utime
 
@@ -12,8 +13,9 @@ class Flywheel:
         :param timer: the timer to be used for the motor
         : param channel: the channel to be used for the motor
         :"""
-        self.tim = pyb.Timer(timer, freq=freq)
-        self.ch = self.tim.channel(channel, pyb.Timer.PWM, pin=pwm_pin)
+        # Both flywheels share one timer, so they must ask for the same freq
+        self.tim = resources.timer(timer, "Flywheel", freq=freq)
+        self.ch = resources.channel(timer, channel, "Flywheel", pyb.Timer.PWM, pin=pwm_pin)
         self.min_pulse_width = 3000
         self.max_pulse_width = 5000
         self.set_point = self.min_pulse_width
@@ -43,7 +45,7 @@ class Flywheel:
         delta_t = (t - self.t_prev) / 1000
 
         # Limits ramp-ups, doesn't limit ramp-downs
-        self.actual += min(self.set_point - self.actual, settings.max_ramp / delta_t) if delta_t > 0 else self.min_pulse_width
+        self.actual += min(self.set_point - self.actual, settings.fparams[settings.MAX_RAMP] / delta_t) if delta_t > 0 else self.min_pulse_width
         self.ch.pulse_width(int(self.actual))
         # print("FWD", self.actual)
         self.t_prev = t
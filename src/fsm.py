@@ -0,0 +1,167 @@
+"""!
+@file fsm.py
+Contains the StateMachine class, a table-driven finite state machine which
+runs as a cotask task.
+
+States are numbered. Each state may have entry, exit and "during" actions,
+a list of guarded transitions which are checked in the order they were added,
+and a timeout after which the machine moves to another state. The machine's
+@c run() generator yields the current state number, so a task created with
+@c trace=True records every transition through the usual @c Task trace:
+@code
+    mission = fsm.StateMachine(IDLE)
+    mission.add_state(IDLE, "IDLE", entry=stop_flywheels)
+    mission.add_state(ARMED, "ARMED", timeout=1000, timeout_state=IDLE)
+    mission.add_transition(IDLE, button_pressed, ARMED)
+
+    task = cotask.Task(mission.run, name="Mission", priority=1, period=20,
+                       trace=True)
+@endcode
+"""
+import utime
+
+
+class State:
+    """!
+    One state of a state machine and the transitions out of it.
+    """
+
+    def __init__(self, name, entry=None, exit=None, during=None, timeout=None,
+                 timeout_state=None):
+        """!
+        Creates a state. See @c StateMachine.add_state() for the parameters.
+        """
+        self.name = name
+        self.entry = entry
+        self.exit = exit
+        self.during = during
+        self.timeout = timeout
+        self.timeout_state = timeout_state
+        ## List of (guard, target state, action) tuples, checked in order
+        self.transitions = []
+
+
+class StateMachine:
+    """!
+    A finite state machine driven by a table of states and transitions.
+    """
+
+    def __init__(self, initial, on_change=None):
+        """!
+        Creates an empty state machine.
+        @param initial The number of the state in which the machine starts
+        @param on_change Function called with the old and new state numbers
+               each time the machine changes state, such as to log events
+        """
+        ## Dictionary of the machine's states, keyed by state number
+        self.states = {}
+        ## The number of the current state
+        self.state = initial
+        self._initial = initial
+        self._entered = utime.ticks_ms()
+        self._timeout = None
+        self._on_change = on_change
+
+    def add_state(self, number, name, entry=None, exit=None, during=None,
+                  timeout=None, timeout_state=None):
+        """!
+        Adds a state to the machine.
+        @param number The state's number, which is what the task yields
+        @param name A short name for the state, used in diagnostics
+        @param entry Function called with no arguments when the state is
+               entered
+        @param exit Function called with no arguments when the state is left
+        @param during Function called with no arguments on each run of the
+               machine while in the state, before the transitions are checked
+        @param timeout Time in milliseconds after entry at which the machine
+               goes to @c timeout_state, or a function returning that time
+               which is called on entry so that it may read live parameters
+        @param timeout_state The state to go to when the timeout expires
+        """
+        self.states[number] = State(name, entry, exit, during, timeout,
+                                    timeout_state)
+
+    def add_transition(self, source, guard, target, action=None):
+        """!
+        Adds a transition between states.
+        @param source The number of the state the transition leaves
+        @param guard Function called with no arguments which returns @c True
+               when the transition should be taken
+        @param target The number of the state the transition enters
+        @param action Function called with no arguments as the transition is
+               taken, after the source's exit action and before the target's
+               entry action
+        """
+        self.states[source].transitions.append((guard, target, action))
+
+    def time_in_state(self):
+        """!
+        Returns the number of milliseconds since the current state was entered.
+        """
+        return utime.ticks_diff(utime.ticks_ms(), self._entered)
+
+    def goto(self, target, action=None):
+        """!
+        Leaves the current state and enters another, running the exit, action
+        and entry functions in that order.
+        @param target The number of the state to enter
+        @param action An optional function to run between exit and entry
+        """
+        old = self.states[self.state]
+        if old.exit:
+            old.exit()
+        if action:
+            action()
+        if self._on_change:
+            self._on_change(self.state, target)
+        self._enter(target)
+
+    def _enter(self, number):
+        """!
+        Makes a state current, runs its entry action and starts its timeout.
+        """
+        self.state = number
+        self._entered = utime.ticks_ms()
+        new = self.states[number]
+        timeout = new.timeout
+        self._timeout = timeout() if callable(timeout) else timeout
+        if new.entry:
+            new.entry()
+
+    def step(self):
+        """!
+        Runs the machine once: the during action of the current state, then
+        the first transition whose guard is true, or the timeout if it has
+        expired and no transition was taken.
+        @return The number of the current state after the step
+        """
+        current = self.states[self.state]
+        if current.during:
+            current.during()
+
+        for guard, target, action in current.transitions:
+            if guard():
+                self.goto(target, action)
+                return self.state
+
+        if self._timeout is not None and self.time_in_state() >= self._timeout:
+            self.goto(current.timeout_state)
+
+        return self.state
+
+    def run(self):
+        """!
+        Generator which runs the machine, for use as a cotask task function.
+        It enters the initial state, then steps the machine each time the task
+        runs and yields the current state number.
+        """
+        self._enter(self._initial)
+        while True:
+            yield self.step()
+
+    def __repr__(self):
+        """!
+        Shows the current state and how long the machine has been in it.
+        """
+        return "{:s} for {:d} ms".format(self.states[self.state].name,
+                                         self.time_in_state())
@@ -12,19 +12,26 @@ through UART to the STM32 Nucleo board, which runs Micropython and the pyboard l
 """
 
 # Imports
+import boottime
+import machine
 import pyb
-import utime
 
 import cotask as ct
 import task_share as ts
 from encoder_reader import EncoderReader
-from control import Control
 from motor_driver import MotorDriver
 from servo_driver import Servo
 from flywheel_driver import Flywheel
-import utime as time
 import settings
 import cotasks
+import telemetry
+import ballistics
+import resources
+import tracebuf
+import axis
+import bus
+from mission import make_mission
+from button import Button
 
 """!
 Pin Layout
@@ -38,126 +45,193 @@ PC6: Encoder Pin A
 PC7: Encoder Pin B
 PA0: Uart TX
 PA1: Uart RX
-PB10: Servo PWM 
+PB10: Servo PWM
+PB11: Pitch Servo PWM TIM2_CH4
+PB6: Turret Bus UART1 TX
+PB7: Turret Bus UART1 RX
+PC8: Turret Bus RS-485 Driver Enable
+PB3: Main Button (external interrupt)
 """
 
-main_button = pyb.Pin(pyb.Pin.board.PB3, pyb.Pin.IN, pull=pyb.Pin.PULL_UP)
-
+## Scheduler used to run the tasks: "cotask" for the cooperative priority
+#  scheduler or "uasyncio" for the adapter in aiotask.py
+SCHEDULER = "cotask"
 
 if __name__ == "__main__":
-    # Create motor and encoder objects
-    fire = ts.Share('l', thread_protect=False, name="Servo Actuation Flag")
-    yaw_control = ts.Share('f', thread_protect=False, name="Input to yaw mode")
-    yaw_mode = ts.Share('l', thread_protect=False, name="Yaw mode control") # Controls what mode yaw is in. 0=position, 1=position move finished, 2 = raw PWM control
+    boottime.mark("imports")
+
+    # Set up the peripherals, motors off
+    yaw_motor = MotorDriver(pyb.Pin.board.PA10, pyb.Pin.board.PB4, pyb.Pin.board.PB5, 3)
+    yaw_motor.set_duty_cycle(0)
+    yaw_encoder = EncoderReader(pyb.Pin.board.PC6, pyb.Pin.board.PC7, 8)
+    yaw_encoder.zero()
+    flywheelL = Flywheel(pyb.Pin.board.PB8, 4, 3)
+    flywheelU = Flywheel(pyb.Pin.board.PB9, 4, 4)
+    servo = Servo(pyb.Pin.board.PB10)
+    pitch_servo = Servo(pyb.Pin.board.PB11, channel=4, name="Pitch Servo")
+    cam_uart = resources.uart(4, "Camera", 115200, timeout=0, read_buf_len=256)
+    host_uart = resources.uart(telemetry.UART_NUM, "Host Link", telemetry.BAUD, timeout=0)
+    bus_addr = settings.iparams[settings.BUS_ADDR]
+    if bus_addr > 0:
+        bus_uart = resources.uart(1, "Turret Bus", 115200, timeout=0)
+        bus_de = pyb.Pin(resources.claim_pin(pyb.Pin.board.PC8, "Turret Bus"), pyb.Pin.OUT_PP)
+        bus_link = bus.BusLink(bus_uart, bus_addr, de_pin=bus_de)
+    boottime.mark("peripherals")
+
+    # Size the trace buffer before any traced task or share registers with it.
+    # With trace_all set every task and the fire and yaw shares are traced, so the
+    # whole schedule can be seen on one timeline
+    tracebuf.get(settings.iparams[settings.TRACE_SIZE])
+    trace_all = settings.iparams[settings.TRACE_ALL] == 1
+
+    # Create shares and queues
+    fire = ts.Share('l', thread_protect=False, name="Servo Actuation Flag",
+                    trace=trace_all)
+    yaw_control = ts.Share('f', thread_protect=False, name="Input to yaw mode",
+                           trace=trace_all)
+    yaw_mode = ts.Share('l', thread_protect=False, name="Yaw mode control",
+                        trace=trace_all) # Controls what mode yaw is in. 0=position, 1=position move finished, 2 = raw PWM control
     speed = ts.Share('l', thread_protect=False, name="Flywheel Base Speed")
     errory = ts.Share('f', thread_protect=False, name="Camera y Error")
     buzzer = ts.Share('l', thread_protect=False, name="Speaker Sound")
     cam_control_flag = ts.Share('l', thread_protect=False, name="Camera Control")
+    cam_backlog = ts.Share('l', thread_protect=False, name="Camera UART Backlog")
+    cam_drops = ts.Share('l', thread_protect=False, name="Camera Stale Frames")
+    button_events = ts.Queue('B', 8, name="Button Events")
+    tof = ts.Share('f', thread_protect=False, name="Dart Time of Flight")
+    pitch_control = ts.Share('f', thread_protect=False, name="Input to pitch mode")
+    pitch_mode = ts.Share('l', thread_protect=False, name="Pitch mode control")
+    sighting = ts.Share('f', thread_protect=False, name="Target Yaw Angle")
+    engage = ts.Share('l', thread_protect=False, name="Engagement Allowed")
 
+    fire.put(0)
+    cam_control_flag.put(0)
+    speed.put(0)
+    tof.put(0)
+    # The pitch servo holds level until the camera steers it
+    pitch_control.put(0)
+    pitch_mode.put(axis.POSITION)
+    # On the bus a turret waits for the coordinator to give it a target
+    engage.put(0 if bus_addr > 0 else 1)
+
+    table = ballistics.load()
+
+    # Each axis is run by its own task from the same code
+    yaw_axis = axis.Axis("Yaw", yaw_motor, yaw_mode, yaw_control,
+                         encoder=yaw_encoder, scale=settings.deg_fac,
+                         gains=(settings.YAW_P, settings.YAW_I, settings.YAW_D),
+                         vel_gains=(settings.YAW_V_P, settings.YAW_V_I, settings.YAW_V_D),
+                         limits=(settings.YAW_LIMIT_MIN, settings.YAW_LIMIT_MAX),
+                         brake=(settings.YAW_DECEL, settings.YAW_BRAKE),
+                         channels=(telemetry.CH_YAW_POSITION, telemetry.CH_YAW_ERROR,
+                                   telemetry.CH_YAW_ACTUATION, telemetry.CH_HOME_DELTA))
+    pitch_axis = axis.Axis("Pitch", pitch_servo, pitch_mode, pitch_control,
+                           limits=(settings.PITCH_MIN, settings.PITCH_MAX),
+                           offset=settings.PITCH_LEVEL,
+                           channels=(telemetry.CH_PITCH_POSITION, telemetry.CH_PITCH_ERROR,
+                                     telemetry.CH_PITCH_ACTUATION, telemetry.CH_PITCH_HOME_DELTA))
+
+    main_button = Button(pyb.Pin.board.PB3, button_events,
+                         settings.iparams[settings.BUTTON_DEBOUNCE])
+    boottime.mark("shares")
+
+    # Create the tasks
     task_list = ct.TaskList()
-    yawTask = ct.Task(cotasks.yaw, name="Yaw Motor Driver", priority=1,
-                      period=10, profile=False, trace=False,
-                      shares=(yaw_control, yaw_mode))
+    # Collect garbage in idle time rather than in the middle of a task
+    task_list.set_gc(settings.iparams[settings.GC_FREE_MIN])
+    # Every task is profiled so the table printed on Ctrl-C has the run times
+    # tools/schedulability.py needs. Budgets are in ms. The yaw loop is
+    # critical: the watchdog, if turned on, is only fed while it keeps up
+    yawTask = ct.Task(cotasks.run_axis, name="Yaw Motor Driver", priority=1,
+                      period=10, profile=True, trace=trace_all,
+                      budget=3, critical=True, shares=(yaw_axis,))
     task_list.append(yawTask)
+    pitchTask = ct.Task(cotasks.run_axis, name="Pitch Servo Driver", priority=1,
+                        period=20, profile=True, trace=trace_all, budget=2,
+                        shares=(pitch_axis,))
+    task_list.append(pitchTask)
     flywheelTask = ct.Task(cotasks.flywheel, name="Flywheel Motor Driver", priority=1,
-                           period=10, profile=True, trace=False,
-                           shares=(speed, errory))
+                           period=10, profile=True, trace=trace_all, budget=3,
+                           shares=(flywheelL, flywheelU, speed, errory, table, tof))
     task_list.append(flywheelTask)
     firingTask = ct.Task(cotasks.firing_pin, name="Firing Servo Controller", priority=2,
-                         period=300, profile=True, trace=False,
-                         shares=fire)
+                         period=300, profile=True, trace=trace_all, budget=3,
+                         on_overrun=ct.OVERRUN_DEMOTE, shares=(servo, fire))
     task_list.append(firingTask)
+    # The camera task has no period; it runs when a line arrives from the ESP32.
+    # Under uasyncio it reads through a StreamInput which is filled by awaiting
+    # the UART, rather than from the UART directly
+    if SCHEDULER == "uasyncio":
+        import aiotask
+        cam_input = aiotask.StreamInput()
+    else:
+        cam_input = cam_uart
     cameraTask = ct.Task(cotasks.camera, name="Camera Controller", priority=1,
-                         period=1000/30, profile=False, trace=False,
-                         shares=(yaw_control, yaw_mode, cam_control_flag, errory, fire))
+                         period=None, profile=True, trace=trace_all, budget=5,
+                         shares=(cam_input, yaw_control, yaw_mode, cam_control_flag,
+                                 errory, fire, cam_backlog, cam_drops, tof, yaw_encoder,
+                                 pitch_control, sighting))
     task_list.append(cameraTask)
-
-    fire.put(0)
-    cam_control_flag.put(0)
-    start_time = time.ticks_ms()
-    fire_time = start_time + 5000
-    state = 0
-    speed.put(0)
-
+    hostTask = ct.Task(cotasks.host_link, name="Host Link", priority=0,
+                       period=5, profile=True, trace=trace_all, budget=3,
+                       shares=(host_uart, task_list, yaw_control, yaw_mode, speed, fire,
+                               pitch_control, pitch_mode))
+    task_list.append(hostTask)
+
+    mission = make_mission((fire, yaw_control, yaw_mode, speed, cam_control_flag,
+                            engage), button_events)
+    missionTask = ct.Task(mission.run, name="Mission", priority=1,
+                          period=20, profile=True, trace=True, budget=5)
+    task_list.append(missionTask)
+    tasks = [yawTask, pitchTask, flywheelTask, firingTask, cameraTask, hostTask,
+             missionTask]
+    if bus_addr > 0:
+        busTask = ct.Task(cotasks.bus_link, name="Turret Bus", priority=0,
+                          period=10, profile=True, trace=trace_all, budget=3,
+                          shares=(bus_link, mission, yaw_encoder, sighting, engage, fire))
+        task_list.append(busTask)
+        tasks.append(busTask)
+    boottime.mark("tasks")
+
+    # Run each task's setup code now rather than in its first scheduled run
+    for task in tasks:
+        task.prime()
+    boottime.mark("first runs")
+
+    # Stagger the periodic tasks, from their budgets since none has been
+    # profiled yet, and start their schedules together
+    if settings.iparams[settings.PHASE_PLAN]:
+        task_list.plan_phases()
+    task_list.align()
+    boottime.mark("phases")
+
+    if SCHEDULER != "uasyncio":
+        cam_go = cameraTask.go
+
+        def cam_rx(uart):
+            cam_go()
+
+        cam_uart.irq(handler=cam_rx, trigger=pyb.UART.IRQ_RXIDLE)
+
+    # Start the watchdog last, since it can't be stopped once running
+    if settings.iparams[settings.WDT_TIMEOUT] > 0:
+        task_list.set_watchdog(machine.WDT(timeout=settings.iparams[settings.WDT_TIMEOUT]))
+
+    print(boottime.report())
     print("SETUP COMPLETE! Starting... Press button to home.")
 
-    while main_button.value():
-        task_list.pri_sched()
-
-    # Homing routine
-    yaw_mode.put(cotasks.YAW_HOME)
-    yaw_control.put(settings.home_speed)
-
-    while yaw_mode.get() != cotasks.YAW_RESET:
-        task_list.pri_sched()
-
-    print("HOME DONE!")
-
-    yaw_mode.put(cotasks.YAW_POSITION)
-    yaw_control.put(settings.yaw_home)
-
-    while yaw_mode.get() != cotasks.YAW_POSITION_SETTLED:
-        task_list.pri_sched()
-
-    print("Homed! Starting control FSM. Press button to begin the duel!")
-
-    state = 0
-
-    while True:
-        task_list.pri_sched()
-        current_time = time.ticks_ms()
-
-        if state == 0:  # Preform a home on button press
-            state = 1
-
-        elif state == 1:  # IDLE
-            # print("IDLE")
-            speed.put(0)
-            if not main_button.value():
-                print("GOING INTO PRE-ACTIVE!!")
-                start_time = time.ticks_ms()
-                state = 2
-
-        elif state == 2:  # PRE-ACTIVATE
-            # print("PRE-ACTIVE")
-            speed.put(settings.arm_percent)
-
-            if time.ticks_ms() - start_time > settings.pre_arm_time:
-                print("GOING INTO ACTIVE!!")
-                start_time = time.ticks_ms()
-                state = 3
-                yaw_mode.put(cotasks.YAW_POSITION)
-                yaw_control.put(settings.yaw_active)
-
-
-        elif state == 3:  # ACTIVATE
-            # print("ACTIVE")
-            speed.put(settings.fire_percent)
-            if yaw_mode.get() == cotasks.YAW_POSITION_SETTLED and time.ticks_ms() - start_time > settings.track_delay:
-                print("GOING INTO TRACKING!!")
-                cam_control_flag.put(1)
-                yaw_mode.put(cotasks.YAW_RAW_PWM)
-                state = 4
-
-        elif state == 4:  # POSITION
-            if cam_control_flag.get() == 0:
-                print("GOING INTO FIRE MODE!!")
-                cam_control_flag.put(0)
-                yaw_mode.put(cotasks.YAW_IDLE)
-                start_time = utime.ticks_ms()
-                state = 5
-
-        elif state == 5: # FIRE
-            fire.put(1)
-            if utime.ticks_ms() - start_time > 5000:
-                yaw_mode.put(cotasks.YAW_POSITION)
-                yaw_control.put(settings.yaw_home)
-                fire.put(0)
-                state = 6
-
-        elif state == 6:  # RETURN
-            if yaw_mode.get() == cotasks.YAW_POSITION_SETTLED:
-                yaw_mode.put(cotasks.YAW_IDLE)
-                yaw_control.put(0)
-                state = 1
-
+    try:
+        if SCHEDULER == "uasyncio":
+            aiotask.run(task_list, streams={cameraTask: (cam_uart, cam_input)})
+        else:
+            while True:
+                task_list.pri_sched()
+
+    # Stop with Ctrl-C to see task timing and the mission's state transitions,
+    # followed by the trace buffer for tools/trace_export.py
+    except KeyboardInterrupt:
+        tracebuf.tracer.enabled = False
+        print(resources.report())
+        print(task_list)
+        print(missionTask.get_trace())
+        tracebuf.tracer.dump()
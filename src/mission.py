@@ -0,0 +1,141 @@
+"""!
+@file mission.py
+Contains the turret's mission logic: homing, arming, tracking, firing and
+returning home, written as a table of states for @c fsm.StateMachine.
+
+See the state diagram in the project documentation for the flow between
+the states.
+"""
+import pyb
+import settings
+import telemetry
+import cotasks
+import button
+from fsm import StateMachine
+
+# Mission states, yielded by the mission task
+WAIT_HOME = 0       # Waiting for the button to start homing
+HOMING = 1          # Driving yaw into its hard stop to find zero
+HOME_MOVE = 2       # Moving yaw from the hard stop to its home position
+IDLE = 3            # Homed, flywheels off, waiting for the button
+PRE_ACTIVE = 4      # Flywheels spinning up at arming speed
+ACTIVE = 5          # Flywheels at firing speed, yaw moving to its active angle
+TRACKING = 6        # Camera controls yaw until the target is centered
+FIRE = 7            # Firing servo running, yaw stopped
+RETURN = 8          # Moving yaw back to its home position
+
+
+def make_mission(shares, button_events):
+    """!
+    @brief Builds the turret's mission state machine.
+
+    @param shares Tuple containing the fire flag, yaw control, yaw mode,
+           flywheel speed and camera control flag shares, and the engage share,
+           which the multi-turret coordinator clears to keep the turret from
+           tracking a target given to another turret.
+    @param button_events The @c task_share.Queue into which the main
+           @c button.Button puts its press and release events.
+    @return A @c StateMachine whose @c run() method is the mission task.
+    """
+    fire, yaw_control, yaw_mode, speed, cam_control_flag, engage = shares
+    fparams = settings.fparams
+    iparams = settings.iparams
+    tm = telemetry.recorder
+
+    def pressed():
+        # Consume events up to and including the first press
+        while button_events.any():
+            if button_events.get() == button.PRESS:
+                return True
+        return False
+
+    def enter_idle():
+        # Forget presses made while busy so that only a fresh press arms. The
+        # button's interrupt puts into this queue, so keep it out meanwhile
+        irq_state = pyb.disable_irq()
+        button_events.clear()
+        pyb.enable_irq(irq_state)
+        speed.put(0)
+
+    def settled():
+        return yaw_mode.get() == cotasks.YAW_POSITION_SETTLED
+
+    def yaw_to(param):
+        yaw_mode.put(cotasks.YAW_POSITION)
+        yaw_control.put(fparams[param] * settings.deg_fac)
+
+    def start_homing():
+        yaw_mode.put(cotasks.YAW_HOME)
+        yaw_control.put(fparams[settings.HOME_SPEED])
+
+    def start_active():
+        speed.put(iparams[settings.FIRE_PERCENT])
+        yaw_to(settings.YAW_ACTIVE)
+
+    def hold():
+        # Another turret has the target; wait at the active angle again
+        cam_control_flag.put(0)
+
+    def start_tracking():
+        cam_control_flag.put(1)
+        # In angle tracking the position loop holds its aim until the camera
+        # task gives it the target's angle
+        if iparams[settings.TRACK_MODE] == cotasks.TRACK_ANGLE:
+            yaw_mode.put(cotasks.YAW_POSITION)
+        else:
+            yaw_mode.put(cotasks.YAW_RAW_PWM)
+
+    def start_fire():
+        cam_control_flag.put(0)
+        yaw_mode.put(cotasks.YAW_IDLE)
+        fire.put(1)
+        tm.event(telemetry.EV_FIRE)
+
+    def start_return():
+        fire.put(0)
+        yaw_to(settings.YAW_HOME)
+
+    def stop_yaw():
+        yaw_mode.put(cotasks.YAW_IDLE)
+        yaw_control.put(0)
+
+    m = StateMachine(WAIT_HOME,
+                     on_change=lambda old, new: tm.event(telemetry.EV_STATE,
+                                                         new))
+
+    m.add_state(WAIT_HOME, "WAIT HOME")
+    m.add_transition(WAIT_HOME, pressed, HOMING)
+
+    m.add_state(HOMING, "HOMING", entry=start_homing)
+    m.add_transition(HOMING, lambda: yaw_mode.get() == cotasks.YAW_RESET,
+                     HOME_MOVE)
+
+    m.add_state(HOME_MOVE, "HOME MOVE", entry=lambda: yaw_to(settings.YAW_HOME))
+    m.add_transition(HOME_MOVE, settled, IDLE)
+
+    m.add_state(IDLE, "IDLE", entry=enter_idle)
+    m.add_transition(IDLE, pressed, PRE_ACTIVE)
+
+    m.add_state(PRE_ACTIVE, "PRE-ACTIVE",
+                entry=lambda: speed.put(iparams[settings.ARM_PERCENT]),
+                timeout=lambda: iparams[settings.PRE_ARM_TIME],
+                timeout_state=ACTIVE)
+
+    # The coordinator may move the active angle while the turret waits
+    m.add_state(ACTIVE, "ACTIVE", entry=start_active,
+                during=lambda: yaw_control.put(fparams[settings.YAW_ACTIVE]
+                                               * settings.deg_fac))
+    m.add_transition(ACTIVE, lambda: settled() and engage.get() and
+                     m.time_in_state() > iparams[settings.TRACK_DELAY], TRACKING)
+
+    m.add_state(TRACKING, "TRACKING", entry=start_tracking)
+    m.add_transition(TRACKING, lambda: not engage.get(), ACTIVE, action=hold)
+    m.add_transition(TRACKING, lambda: cam_control_flag.get() == 0, FIRE)
+
+    m.add_state(FIRE, "FIRE", entry=start_fire, timeout=5000,
+                timeout_state=RETURN)
+
+    m.add_state(RETURN, "RETURN", entry=start_return)
+    m.add_transition(RETURN, settled, IDLE, action=stop_yaw)
+
+    return m
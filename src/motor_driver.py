@@ -5,6 +5,7 @@ specified percent power in a specified direction.
 """
 import pyb
 import settings
+import resources
 
 class MotorDriver:
     """!
@@ -22,12 +23,12 @@ class MotorDriver:
         @param timer GPIO pin for the time that is used in running the motor
         """
         # initialize GPIO
-        self.enable_motor = pyb.Pin(en_pin, pyb.Pin.OUT_PP)
+        self.enable_motor = pyb.Pin(resources.claim_pin(en_pin, "MotorDriver"), pyb.Pin.OUT_PP)
         self.pin_1 = pyb.Pin(in1pin, pyb.Pin.OUT_PP)
         self.pin_2 = pyb.Pin(in2pin, pyb.Pin.OUT_PP)
-        self.timer = pyb.Timer(timer, freq=20000)
-        self.ch_1 = self.timer.channel(1, pyb.Timer.PWM, pin=self.pin_1)
-        self.ch_2 = self.timer.channel(2, pyb.Timer.PWM, pin=self.pin_2)
+        self.timer = resources.timer(timer, "MotorDriver", freq=20000)
+        self.ch_1 = resources.channel(timer, 1, "MotorDriver", pyb.Timer.PWM, pin=self.pin_1)
+        self.ch_2 = resources.channel(timer, 2, "MotorDriver", pyb.Timer.PWM, pin=self.pin_2)
         # initialize the motors to have 0 speed
         self.enable_motor.value(True)
         self.ch_1.pulse_width_percent(0)
@@ -0,0 +1,179 @@
+"""!
+@file params.py
+Contains the ParamStore class, a typed registry of tunable parameters which
+can be changed while the turret is running and saved to flash.
+
+Parameters are kept in two preallocated arrays, one for floats and one for
+integers. Defining a parameter returns its index into the array of its type,
+so that reading a parameter in a hot loop is a single indexed access:
+@code
+    import settings
+    fparams = settings.fparams
+    while True:
+        aim = -x + fparams[settings.OFF_X]
+        yield 0
+@endcode
+
+Every change to a parameter increments @c ParamStore.version, which lets code
+that caches derived values (such as controller gains) notice that it should
+refresh them.
+"""
+import array
+import json
+
+## The file in flash to which parameters are saved
+PARAM_FILE = "params.json"
+
+## Version of the layout of the saved parameter file
+FILE_VERSION = 1
+
+
+class ParamStore:
+    """!
+    A registry of named, typed and bounded parameters.
+
+    Float parameters (type code @c 'f') live in @c fparams and integer
+    parameters (type code @c 'l') live in @c iparams. Both arrays are allocated
+    once, when the store is created, and are never resized, so references to
+    them may be kept by tasks.
+    """
+
+    def __init__(self, size=48, path=PARAM_FILE):
+        """!
+        Creates an empty parameter store.
+        @param size The maximum number of parameters of each type
+        @param path The file in flash used by @c save() and @c load()
+        """
+        ## Array holding the values of the float parameters
+        self.fparams = array.array('f', range(size))
+        ## Array holding the values of the integer parameters
+        self.iparams = array.array('l', range(size))
+        ## Incremented each time any parameter is changed
+        self.version = 0
+
+        self.path = path
+        self._size = size
+        self._num_f = 0
+        self._num_i = 0
+
+        # Maps each parameter name to (type code, index, default, low, high)
+        self._defs = {}
+        # Parameter names in the order in which they were defined
+        self.names = []
+
+    def define(self, name, default, type_code='f', low=None, high=None):
+        """!
+        Adds a parameter to the store and sets it to its default value.
+        @param name The name by which the parameter is set over the command
+               channel and saved to flash
+        @param default The default value of the parameter
+        @param type_code @c 'f' for a float parameter or @c 'l' for an integer
+        @param low The lowest allowed value, or @c None for no lower bound
+        @param high The highest allowed value, or @c None for no upper bound
+        @return The index of the parameter in @c fparams or @c iparams
+        """
+        if name in self._defs:
+            raise ValueError("Parameter " + name + " already defined")
+
+        if type_code == 'f':
+            idx = self._num_f
+            self._num_f += 1
+        elif type_code == 'l':
+            idx = self._num_i
+            self._num_i += 1
+        else:
+            raise ValueError("Parameter type must be 'f' or 'l'")
+
+        if idx >= self._size:
+            raise ValueError("Parameter store is full")
+
+        self._defs[name] = (type_code, idx, default, low, high)
+        self.names.append(name)
+        self._array(type_code)[idx] = default
+        return idx
+
+    def _array(self, type_code):
+        """!
+        Returns the value array which holds parameters of the given type.
+        """
+        return self.fparams if type_code == 'f' else self.iparams
+
+    def get(self, name):
+        """!
+        Looks up a parameter by name. This is meant for the command channel and
+        diagnostics; tasks should index @c fparams or @c iparams directly.
+        @param name The name of the parameter
+        @return The current value of the parameter
+        """
+        type_code, idx, _, _, _ = self._defs[name]
+        return self._array(type_code)[idx]
+
+    def set(self, name, value):
+        """!
+        Changes a parameter by name, checking it against the parameter's
+        bounds. Integer parameters given a float value are rounded.
+        @param name The name of the parameter
+        @param value The new value of the parameter
+        @return The new version number of the store
+        """
+        try:
+            type_code, idx, _, low, high = self._defs[name]
+        except KeyError:
+            raise KeyError("No parameter named " + name)
+
+        value = float(value) if type_code == 'f' else int(round(value))
+        if (low is not None and value < low) \
+                or (high is not None and value > high):
+            raise ValueError("Parameter " + name + " out of range")
+
+        self._array(type_code)[idx] = value
+        self.version += 1
+        return self.version
+
+    def reset(self):
+        """!
+        Returns every parameter to its default value.
+        """
+        for name in self.names:
+            type_code, idx, default, _, _ = self._defs[name]
+            self._array(type_code)[idx] = default
+        self.version += 1
+
+    def save(self):
+        """!
+        Writes all parameters to the parameter file in flash.
+        """
+        data = {"version": FILE_VERSION,
+                "params": {name: self.get(name) for name in self.names}}
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    def load(self):
+        """!
+        Reads parameters from the parameter file in flash, if there is one.
+        Parameters missing from the file keep their defaults, and names in the
+        file which are no longer defined or values out of range are ignored.
+        @return @c True if the file was found and read, @c False if not
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if data.get("version") != FILE_VERSION:
+            return False
+
+        for name, value in data.get("params", {}).items():
+            try:
+                self.set(name, value)
+            except (KeyError, ValueError, TypeError):
+                pass
+        return True
+
+    def __repr__(self):
+        """!
+        Shows the name and value of every parameter, one per line.
+        """
+        return '\n'.join("{:<16s}{}".format(name, self.get(name))
+                         for name in self.names)
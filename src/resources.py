@@ -0,0 +1,188 @@
+"""!
+@file resources.py
+Keeps track of which driver uses each hardware timer, timer channel, UART and
+pin, so that two drivers can't silently reconfigure the same hardware.
+
+Drivers ask this module for timers instead of calling @c pyb.Timer()
+themselves. A timer already in use is shared if the new request asks for the
+same settings, and refused with a @c ValueError if it asks for different ones;
+channels and pins can only have one user each:
+@code
+    tim = resources.timer(4, "Flywheel", freq=50)      # creates Timer 4
+    tim = resources.timer(4, "Flywheel", freq=50)      # shares Timer 4
+    tim = resources.timer(4, "Servo", freq=200)        # ValueError
+    ch = resources.channel(4, 3, "Flywheel", pyb.Timer.PWM, pin=pyb.Pin.board.PB8)
+@endcode
+"""
+import pyb
+
+# Timer number -> [timer object, settings tuple, set of users]
+_timers = {}
+# (timer number, channel number) -> user
+_channels = {}
+# UART number -> [UART object, baud rate, set of users]
+_uarts = {}
+# Pin name -> user
+_pins = {}
+
+
+def _pin_name(pin):
+    """!
+    Gives a pin's name, such as @c "B8", for use as a dictionary key.
+    """
+    try:
+        return pin.name()
+    except AttributeError:
+        return str(pin)
+
+
+def claim_pin(pin, user):
+    """!
+    Records that a pin is used by a driver.
+    @param pin The pin, such as @c pyb.Pin.board.PB8
+    @param user A short name for the driver using the pin
+    @return The pin, unchanged
+    """
+    name = _pin_name(pin)
+    if name in _pins:
+        raise ValueError("Pin " + name + " is used by " + _pins[name]
+                         + "; " + user + " can't use it")
+    _pins[name] = user
+    return pin
+
+
+def timer(num, user, freq=None, prescaler=None, period=None):
+    """!
+    Gets a hardware timer, creating it on first use. A timer can be shared by
+    drivers which all ask for the same frequency (or prescaler and period).
+    @param num The timer number
+    @param user A short name for the driver using the timer
+    @param freq The timer frequency in Hz, or @c None to set the prescaler
+           and period instead
+    @param prescaler The timer's prescaler, if @c freq isn't given
+    @param period The timer's period, if @c freq isn't given
+    @return The @c pyb.Timer object
+    """
+    config = (freq, prescaler, period)
+    if num in _timers:
+        tim, old, users = _timers[num]
+        if old != config:
+            raise ValueError("Timer " + str(num) + " is set up as "
+                             + _describe(old) + " for " + ", ".join(users)
+                             + "; " + user + " asked for " + _describe(config))
+        users.add(user)
+        return tim
+
+    if freq is not None:
+        tim = pyb.Timer(num, freq=freq)
+    else:
+        tim = pyb.Timer(num, prescaler=prescaler, period=period)
+    _timers[num] = [tim, config, {user}]
+    return tim
+
+
+def _describe(config):
+    """!
+    Describes timer settings for error messages.
+    """
+    freq, prescaler, period = config
+    if freq is not None:
+        return str(freq) + " Hz"
+    return "prescaler " + str(prescaler) + " period " + str(period)
+
+
+def channel(num, ch, user, mode, pin=None, **kwargs):
+    """!
+    Sets up a channel of a timer already obtained with @c timer(). The
+    channel's pin, if any, is claimed as well.
+    @param num The timer number
+    @param ch The channel number
+    @param user A short name for the driver using the channel
+    @param mode The channel mode, such as @c pyb.Timer.PWM
+    @param pin The pin connected to the channel
+    @param kwargs Other settings passed to @c pyb.Timer.channel()
+    @return The timer channel object
+    """
+    if num not in _timers:
+        raise ValueError("Timer " + str(num) + " hasn't been set up")
+    key = (num, ch)
+    if key in _channels:
+        raise ValueError("Timer " + str(num) + " channel " + str(ch)
+                         + " is used by " + _channels[key] + "; " + user
+                         + " can't use it")
+    if pin is not None:
+        claim_pin(pin, user)
+        kwargs["pin"] = pin
+    _channels[key] = user
+    return _timers[num][0].channel(ch, mode, **kwargs)
+
+
+def uart(num, user, baud, **kwargs):
+    """!
+    Gets a UART, creating it on first use. Like timers, a UART can be shared
+    by users which ask for the same baud rate.
+    @param num The UART number
+    @param user A short name for the driver using the UART
+    @param baud The baud rate
+    @param kwargs Other settings passed to @c pyb.UART() on creation
+    @return The @c pyb.UART object
+    """
+    if num in _uarts:
+        port, old_baud, users = _uarts[num]
+        if old_baud != baud:
+            raise ValueError("UART " + str(num) + " runs at " + str(old_baud)
+                             + " baud for " + ", ".join(users) + "; " + user
+                             + " asked for " + str(baud))
+        users.add(user)
+        return port
+
+    port = pyb.UART(num, baud, **kwargs)
+    _uarts[num] = [port, baud, {user}]
+    return port
+
+
+def release(user):
+    """!
+    Frees everything a driver was using, so that it may be set up again with
+    different settings. Timers and UARTs are only deinitialized when their
+    last user releases them.
+    @param user The name the driver used when claiming its resources
+    """
+    for key in [k for k, u in _channels.items() if u == user]:
+        del _channels[key]
+    for name in [n for n, u in _pins.items() if u == user]:
+        del _pins[name]
+    for num in list(_timers):
+        tim, _, users = _timers[num]
+        users.discard(user)
+        if not users:
+            tim.deinit()
+            del _timers[num]
+    for num in list(_uarts):
+        port, _, users = _uarts[num]
+        users.discard(user)
+        if not users:
+            port.deinit()
+            del _uarts[num]
+
+
+def report():
+    """!
+    Lists the hardware in use and which driver uses it.
+    @return A string with one line per timer, channel, UART and pin
+    """
+    lines = []
+    for num in sorted(_timers):
+        _, config, users = _timers[num]
+        lines.append("Timer {:<3d}{:<28s}{}".format(num, _describe(config),
+                                                    ", ".join(sorted(users))))
+        for (t, ch) in sorted(_channels):
+            if t == num:
+                lines.append("  ch {:<30d}{}".format(ch, _channels[(t, ch)]))
+    for num in sorted(_uarts):
+        _, baud, users = _uarts[num]
+        lines.append("UART  {:<3d}{:<28s}{}".format(
+            num, str(baud) + " baud", ", ".join(sorted(users))))
+    for name in sorted(_pins):
+        lines.append("Pin   {:<31s}{}".format(name, _pins[name]))
+    return '\n'.join(lines)
@@ -1,14 +1,17 @@
 import pyb
+import resources
 
 class Servo:
-    def __init__(self, pin):
+    def __init__(self, pin, channel=3, name="Servo"):
         """!
         Brief: The initial setup for the servo motor that controls the firing mechanism.
         Sets up the pin, timer, min and max pulse width.
         :param pin: the pin to be used for output
+        :param channel: the channel of timer 2 on the pin, which all servos share at 200 Hz
+        :param name: the name under which the timer channel and pin are claimed
         :"""
-        self.tim = pyb.Timer(2, freq=200)
-        self.ch = self.tim.channel(3, pyb.Timer.PWM, pin=pin)
+        self.tim = resources.timer(2, name, freq=200)
+        self.ch = resources.channel(2, channel, name, pyb.Timer.PWM, pin=pin)
         self.min_pulse_width = 500
         self.max_pulse_width = 2500
         self.is_set = False
@@ -1,49 +1,103 @@
+"""!
+@file settings.py
+Contains the turret's gains and thresholds. Anything that may need tuning is a
+parameter in @c store, which can be changed live and saved to flash; fixed
+hardware constants remain plain module variables.
+
+Tasks read parameters by index, e.g. @c settings.fparams[settings.OFF_X].
+"""
 import math
+import params
+
+## The store holding every tunable parameter
+store = params.ParamStore()
+## Values of the float parameters, indexed by the float parameter indices
+fparams = store.fparams
+## Values of the integer parameters, indexed by the integer parameter indices
+iparams = store.iparams
 
 do_rotate = True
 
-pre_arm_time = 1000
+PRE_ARM_TIME = store.define("pre_arm_time", 1000, 'l', 0, 60000)
+BUTTON_DEBOUNCE = store.define("button_debounce", 20, 'l', 0, 500)  # ms
+GC_FREE_MIN = store.define("gc_free_min", 16384, 'l', 0)  # bytes
+# Watchdog timeout, read at start-up; 0 leaves the watchdog off
+WDT_TIMEOUT = store.define("wdt_timeout", 0, 'l', 0, 30000)  # ms
+# Address on the multi-turret bus; 0 runs alone without the coordinator
+BUS_ADDR = store.define("bus_addr", 0, 'l', 0, 254)
+# Trace buffer, read at start-up: events kept, and 1 to trace every task
+TRACE_SIZE = store.define("trace_size", 512, 'l', 16, 4096)
+TRACE_ALL = store.define("trace_all", 0, 'l', 0, 1)
+# 1 staggers the periodic tasks at start-up so equal periods don't fall due together
+PHASE_PLAN = store.define("phase_plan", 1, 'l', 0, 1)
 
 # Flywheel settings
-fire_percent = 100
-arm_percent = 45
-max_ramp = 10  # % / second
+FIRE_PERCENT = store.define("fire_percent", 100, 'l', 0, 100)
+ARM_PERCENT = store.define("arm_percent", 45, 'l', 0, 100)
+MAX_RAMP = store.define("max_ramp", 10, 'f', 0)  # % / second
 
 # Yaw settings
-yaw_p = .8
-yaw_i = .01
-yaw_d = .007  # .0000015
-yaw_settle_err = 40
+YAW_P = store.define("yaw_p", .8)
+YAW_I = store.define("yaw_i", .01)
+YAW_D = store.define("yaw_d", .007)  # .0000015
+YAW_SETTLE_ERR = store.define("yaw_settle_err", 40, 'f', 0)
 
 # Yaw Velocity
-yaw_v_p = 10
-yaw_v_i = .05
-yaw_v_d = 0
+YAW_V_P = store.define("yaw_v_p", 10)
+YAW_V_I = store.define("yaw_v_i", .05)
+YAW_V_D = store.define("yaw_v_d", 0)
 
 # track X settings
-tx_p = 6
-tx_i = .012
-tx_d = .3
-tx_settle_d = 1
-tx_settle_e = .3
-off_x = -1.75
-track_delay = 5000
-
-
-# Pitch settings
-pitch_factor = -0.1
+TX_P = store.define("tx_p", 6)
+TX_I = store.define("tx_i", .012)
+TX_D = store.define("tx_d", .3)
+TX_SETTLE_D = store.define("tx_settle_d", 1, 'f', 0)
+TX_SETTLE_E = store.define("tx_settle_e", .3, 'f', 0)
+OFF_X = store.define("off_x", -1.75)  # boresight, pixels from image centre
+TRACK_DELAY = store.define("track_delay", 5000, 'l', 0, 60000)
+
+# Tracking: 0 chases the pixel error with PWM, 1 sets absolute yaw angles
+TRACK_MODE = store.define("track_mode", 1, 'l', 0, 1)
+CAM_FOV = store.define("cam_fov", 55, 'f', -180, 180)  # deg across the image
+TRACK_FIRE_ERR = store.define("track_fire_err", 1, 'f', 0, 45)  # deg
+# From the camera's exposure to its line arriving, to find where the turret was
+CAM_LATENCY = store.define("cam_latency", 60, 'l', 0, 300)  # ms
+
+
+# Ballistics settings; the tables themselves are in ballistics.py
+TARGET_RANGE = store.define("target_range", 3, 'f', 0.5, 20)  # m
+LEAD_GAIN = store.define("lead_gain", 1, 'f', 0, 5)
 
 enc_per_deg = 4072 / 360
 gearRatio = 200 / 16
 deg_fac = enc_per_deg * gearRatio
 
-yaw_max = 250 * deg_fac
-yaw_min = 20 * deg_fac
+# Pitch servo, in degrees up from level; the camera's vertical error steers it
+PITCH_LEVEL = store.define("pitch_level", 90, 'f', 0, 180)  # servo angle when level
+PITCH_MIN = store.define("pitch_min", -15, 'f', -90, 90)
+PITCH_MAX = store.define("pitch_max", 30, 'f', -90, 90)
+PITCH_GAIN = store.define("pitch_gain", .5, 'f', 0, 1)  # share of the error taken per frame
+CAM_VFOV = store.define("cam_vfov", 35, 'f', -180, 180)  # deg up the image
+OFF_Y = store.define("off_y", 0)  # boresight, pixels from image centre
+
+# Yaw positions, in degrees; multiply by deg_fac for encoder counts
+YAW_MAX = store.define("yaw_max", 250, 'f', 0, 360)
+YAW_MIN = store.define("yaw_min", 20, 'f', 0, 360)
 
-yaw_active = 195 * deg_fac # 185 * deg_fac
-yaw_home = 5 * deg_fac
+# Soft stops, held in every mode once homed; yaw_min and yaw_max above are
+# only the field of fire, which the bus coordinator moves
+YAW_LIMIT_MIN = store.define("yaw_limit_min", 2, 'f', 0, 360)
+YAW_LIMIT_MAX = store.define("yaw_limit_max", 270, 'f', 0, 360)
+YAW_DECEL = store.define("yaw_decel", 720, 'f', 1)  # deg/s^2 when braked at yaw_brake
+YAW_BRAKE = store.define("yaw_brake", 40, 'f', 0, 100)  # % duty cycle
 
-home_speed = -20
+YAW_ACTIVE = store.define("yaw_active", 195, 'f', 0, 360)  # 185
+YAW_HOME = store.define("yaw_home", 5, 'f', 0, 360)
+
+HOME_SPEED = store.define("home_speed", -20, 'f', -100, 100)
+
+# Replace the defaults with any values tuned and saved on an earlier run
+store.load()
 
 
 def linearize(actuation):
@@ -66,4 +120,3 @@ def linearize(actuation):
         a = max(a, m1)
 
     return a * sign
-
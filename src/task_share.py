@@ -26,6 +26,7 @@ import array
 import gc
 import pyb
 import micropython
+import tracebuf
 
 
 ## This is a system-wide list of all the queues and shared variables. It is
@@ -100,6 +101,14 @@ class Queue (BaseShare):
     # In another task, read data from the queue
     something = my_queue.get ()
     @endcode
+
+    In a cooperative scheduler a task must never wait for another task, so
+    tasks should normally use the non-blocking @c try_put() and @c try_get(),
+    or move many items at once with @c put_many() and @c get_into().
+
+    The buffer's length is rounded up to a power of two so that its indices
+    wrap with a mask rather than a comparison; the queue still holds no more
+    than @c size items.
     """
     ## A counter used to give serial numbers to queues for diagnostic use.
     ser_num = 0
@@ -143,15 +152,21 @@ class Queue (BaseShare):
             else 'Queue' + str (Queue.ser_num)
         Queue.ser_num += 1
 
-        # Allocate memory in which the queue's data will be stored
+        # Allocate memory in which the queue's data will be stored, rounding
+        # the buffer up to a power of two so indices can wrap with a mask
+        length = 1
+        while length < size:
+            length <<= 1
+        self._mask = length - 1
         try:
-            self._buffer = array.array (type_code, range (size))
+            self._buffer = array.array (type_code, range (length))
         except MemoryError:
             self._buffer = None
             raise
         except ValueError:
             self._buffer = None
             raise
+        self._view = memoryview (self._buffer)
 
         # Initialize pointers to be used for reading and writing data
         self.clear ()
@@ -170,14 +185,12 @@ class Queue (BaseShare):
         until room becomes available, unless the @c overwrite constructor
         parameter was set to @c True to allow old data to be clobbered. If
         non-blocking behavior without overwriting is needed, one should call
-        @c full() to ensure that the queue is not full before putting data
-        into it:
+        @c try_put() instead:
         @code
         |   def some_task ():
         |       # Setup
         |       while True:
-        |           if not my_queue.full ():
-        |               my_queue.put (create_something_to_put ())
+        |           my_queue.try_put (create_something_to_put ())
         |           yield 0
         @endcode
         @param item The item to be placed into the queue
@@ -200,12 +213,11 @@ class Queue (BaseShare):
 
         # Write the data and advance the counts and pointers
         self._buffer[self._wr_idx] = item
-        self._wr_idx += 1
-        if self._wr_idx >= self._size:
-            self._wr_idx = 0
-        self._num_items += 1
-        if self._num_items >= self._size:        # Can't be fuller than full
-            self._num_items = self._size
+        self._wr_idx = (self._wr_idx + 1) & self._mask
+        if self._num_items >= self._size:        # Overwrote the oldest item
+            self._rd_idx = (self._rd_idx + 1) & self._mask
+        else:
+            self._num_items += 1
         if self._num_items > self._max_full:     # Record maximum fillage
             self._max_full = self._num_items
 
@@ -221,8 +233,8 @@ class Queue (BaseShare):
 
         If there isn't anything in there, wait (blocking the calling process)
         until something becomes available. If non-blocking reads are needed,
-        one should call @c any() to check for items before attempting to read
-        from the queue. This is usually done in a low priority task:
+        one should call @c try_get(), or call @c any() to check for items
+        before attempting to read from the queue:
         @code
         |   def some_task ():
         |       # Setup
@@ -247,12 +259,8 @@ class Queue (BaseShare):
         to_return = self._buffer[self._rd_idx]
 
         # Move the read pointer and adjust the number of items in the queue
-        self._rd_idx += 1
-        if self._rd_idx >= self._size:
-            self._rd_idx = 0
+        self._rd_idx = (self._rd_idx + 1) & self._mask
         self._num_items -= 1
-        if self._num_items < 0:
-            self._num_items = 0
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
@@ -261,6 +269,140 @@ class Queue (BaseShare):
         return (to_return)
 
 
+    @micropython.native
+    def try_put (self, item, in_ISR = False):
+        """!
+        Put an item into the queue if there's room, without waiting.
+
+        If the queue was created with @c overwrite set to @c True, the oldest
+        item is clobbered when the queue is full and the put always succeeds.
+        @param item The item to be placed into the queue
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if the item was put into the queue, @c False if the
+                queue was full
+        """
+        if self._num_items >= self._size and not self._overwrite:
+            return False
+        self.put (item, in_ISR)
+        return True
+
+
+    @micropython.native
+    def try_get (self, default = None, in_ISR = False):
+        """!
+        Read an item from the queue if there is one, without waiting.
+        @code
+        |   def some_task ():
+        |       while True:
+        |           item = my_queue.try_get ()
+        |           if item is not None:
+        |               do_something_with (item)
+        |           yield 0
+        @endcode
+        @param default The value returned if the queue is empty
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The oldest item in the queue, or @c default if it's empty
+        """
+        if self._num_items <= 0:
+            return default
+        return self.get (in_ISR)
+
+
+    def put_many (self, buf, in_ISR = False):
+        """!
+        Put the items of a buffer into the queue, copying slices of the
+        buffer rather than one item at a time.
+
+        The buffer must be an @c array.array (or a @c memoryview of one) with
+        the same type code as the queue. If there isn't room for everything,
+        only the first items are put, unless the queue overwrites old data, in
+        which case the last @c size items of the buffer are kept.
+        @param buf The items to be placed into the queue
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The number of items put into the queue
+        """
+        src = memoryview (buf)
+        n = len (src)
+        if self._overwrite:
+            if n > self._size:
+                src = src[n - self._size:]
+                n = self._size
+        else:
+            n = min (n, self._size - self._num_items)
+        if n <= 0:
+            return 0
+
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        # Copy in at most two pieces, before and after the end of the buffer
+        wr = self._wr_idx
+        first = min (n, self._mask + 1 - wr)
+        self._view[wr:wr + first] = src[:first]
+        if first < n:
+            self._view[:n - first] = src[first:n]
+        self._wr_idx = (wr + n) & self._mask
+
+        # Drop the oldest items if new ones overwrote them
+        total = self._num_items + n
+        if total > self._size:
+            self._rd_idx = (self._rd_idx + total - self._size) & self._mask
+            total = self._size
+        self._num_items = total
+        if total > self._max_full:
+            self._max_full = total
+
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+        return n
+
+
+    def get_into (self, buf, in_ISR = False):
+        """!
+        Move as many items as are available, up to the buffer's length, from
+        the queue into a buffer, copying slices rather than single items.
+
+        The buffer must be an @c array.array (or a @c memoryview of one) with
+        the same type code as the queue. It is filled from the start; items
+        past the returned count are left unchanged.
+        @param buf The buffer into which items are copied
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The number of items copied
+        """
+        dst = memoryview (buf)
+        n = min (len (dst), self._num_items)
+        if n <= 0:
+            return 0
+
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        rd = self._rd_idx
+        first = min (n, self._mask + 1 - rd)
+        dst[:first] = self._view[rd:rd + first]
+        if first < n:
+            dst[first:n] = self._view[:n - first]
+        self._rd_idx = (rd + n) & self._mask
+        self._num_items -= n
+
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+        return n
+
+
+    @micropython.native
+    def peek_latest (self, default = None):
+        """!
+        Look at the newest item in the queue without removing anything. This
+        suits queues of samples where only the latest value matters.
+        @param default The value returned if the queue is empty
+        @return The item most recently put, or @c default if the queue is empty
+        """
+        if self._num_items <= 0:
+            return default
+        return self._buffer[(self._wr_idx - 1) & self._mask]
+
+
     @micropython.native
     def any (self):
         """!
@@ -359,7 +501,8 @@ class Share (BaseShare):
     ser_num = 0
 
 
-    def __init__ (self, type_code, thread_protect = True, name = None):
+    def __init__ (self, type_code, thread_protect = True, name = None,
+                  trace = False):
         """!
         Create a shared data item used to transfer data between tasks.
 
@@ -382,6 +525,8 @@ class Share (BaseShare):
         @param thread_protect True if mutual exclusion protection is used
         @param name A short name for the share, default @c ShareN where @c N
                is a serial number for the share
+        @param trace Set to @c True to record every value written in the
+               system-wide trace buffer of @c tracebuf.py
         """
         # First call the parent class initializer
         super ().__init__ (type_code, thread_protect, name)
@@ -392,6 +537,13 @@ class Share (BaseShare):
             else 'Share' + str (Share.ser_num)
         Share.ser_num += 1
 
+        # If tracing, register the share as a source of trace events
+        self._tracer = None
+        if trace:
+            self._tracer = tracebuf.get ()
+            self._tr_id = self._tracer.register (self._name,
+                                                 tracebuf.SRC_SHARE)
+
 
     @micropython.native
     def put (self, data, in_ISR = False):
@@ -416,6 +568,9 @@ class Share (BaseShare):
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (irq_state)
 
+        if self._tracer is not None:
+            self._tracer.record (tracebuf.EV_SHARE, self._tr_id, data)
+
 
     @micropython.native
     def get (self, in_ISR = False):
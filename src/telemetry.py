@@ -0,0 +1,303 @@
+"""!
+@file telemetry.py
+Contains the Telemetry recorder, which buffers compact binary records for the
+host without blocking, and the CommandParser which handles text commands
+received from the host.
+
+Every record is 12 bytes, little endian, packed as @c RECORD_FORMAT:
+| Offset | Type    | Field                                              |
+|:-------|:--------|:---------------------------------------------------|
+| 0      | uint8   | @c SYNC byte, 0xA5                                 |
+| 1      | uint8   | Kind of record, one of the @c KIND_ constants      |
+| 2      | uint16  | Channel, task, event or parameter number           |
+| 4      | uint32  | @c utime.ticks_us() when logged (wraps at 2**30)   |
+| 8      | float32 | Value                                              |
+
+Records are written into a preallocated ring buffer by @c log(), which never
+allocates or blocks; when the buffer is full new records are dropped and
+counted. The telemetry task drains a bounded number of bytes per run, so a
+slow link can never hold up the control tasks.
+
+Commands are lines of ASCII text:
+| Command             | Effect                                             |
+|:--------------------|:---------------------------------------------------|
+| @c set NAME VALUE   | Set a parameter, answered with a @c KIND_PARAM     |
+| @c get NAME         | Read a parameter, answered with a @c KIND_PARAM    |
+| @c save             | Save all parameters to flash                       |
+| @c load             | Reload parameters from flash                       |
+| @c reset            | Return all parameters to their defaults            |
+| @c sp SHARE VALUE   | Write a value into a named share (a setpoint)      |
+| @c tm MASK          | Select which channels are streamed (bit mask)      |
+Other commands are answered with a @c KIND_STATUS record.
+"""
+import struct
+import utime
+
+## The UART connected to the host, through the Nucleo's ST-Link
+UART_NUM = 2
+## Baud rate of the host link
+BAUD = 460800
+## The number of channels which can be selected with the @c tm command
+MAX_CHANNELS = 32
+
+## First byte of every record, used by the host to find record boundaries
+SYNC = 0xA5
+## The struct format of one record
+RECORD_FORMAT = "<BBHIf"
+## The number of bytes in one record
+RECORD_SIZE = 12
+
+## A sample of a channel; number is the channel
+KIND_CHANNEL = 0
+## A task timing report; number is the task's index, value its average run
+#  time in microseconds
+KIND_TASK = 1
+## An event; number is the event code and value its argument
+KIND_EVENT = 2
+## A parameter value; number is the parameter's index in @c store.names
+KIND_PARAM = 3
+## A status report; number is one of the @c ST_ codes
+KIND_STATUS = 4
+
+# Channels
+CH_YAW_SETPOINT = 0
+CH_YAW_POSITION = 1
+CH_YAW_ERROR = 2
+CH_YAW_ACTUATION = 3
+CH_HOME_DELTA = 4
+CH_CAM_X = 5
+CH_CAM_Y = 6
+CH_CAM_ERROR = 7
+CH_CAM_ERROR_DOT = 8
+CH_CAM_ACTUATION = 9
+CH_FLYWHEEL_SPEED = 10
+CH_FIRE = 11
+CH_CAM_BACKLOG = 12
+CH_CAM_DROPS = 13
+CH_FLYWHEEL_DIFF = 14
+CH_CAM_LEAD = 15
+CH_CAM_MOTION = 16
+CH_PITCH_POSITION = 17
+CH_PITCH_ERROR = 18
+CH_PITCH_ACTUATION = 19
+CH_PITCH_HOME_DELTA = 20
+
+# Events
+EV_STATE = 0          # Mission state changed; value is the new state
+EV_HOME_DONE = 1      # Homing finished
+EV_FIRE = 2           # Fire command issued
+EV_OVERRUN = 3        # A task overran its budget; value is the task number
+
+# Status codes
+ST_OK = 0             # Command succeeded
+ST_BAD_COMMAND = 1    # Command not recognized
+ST_BAD_ARGUMENT = 2   # Unknown name or value out of range
+ST_DROPPED = 3        # Value is the number of records dropped so far
+ST_SAVE_FAILED = 4    # Parameters couldn't be written to flash
+
+
+class Telemetry:
+    """!
+    A ring buffer of binary telemetry records waiting to be sent to the host.
+    """
+
+    def __init__(self, size=256):
+        """!
+        Allocates the ring buffer.
+        @param size The number of records which the buffer can hold
+        """
+        self._cap = size * RECORD_SIZE
+        self._buf = bytearray(self._cap)
+        self._mv = memoryview(self._buf)
+        self._wr = 0
+        self._rd = 0
+        self._count = 0
+
+        ## The number of records dropped because the buffer was full
+        self.dropped = 0
+        # One byte per channel, set if sample() records the channel. A 32 bit
+        # mask would be a heap allocated integer in MicroPython, and testing
+        # it would allocate on every sample
+        self._selected = bytearray(b"\x01" * MAX_CHANNELS)
+
+    def log(self, kind, number, value):
+        """!
+        Adds a record to the buffer. If the buffer is full the record is
+        dropped and counted.
+        @param kind The kind of record, one of the @c KIND_ constants
+        @param number The channel, task, event or parameter number
+        @param value The value to record
+        @return @c True if the record was buffered, @c False if dropped
+        """
+        if self._count > self._cap - RECORD_SIZE:
+            self.dropped += 1
+            return False
+
+        struct.pack_into(RECORD_FORMAT, self._buf, self._wr, SYNC, kind,
+                         number, utime.ticks_us(), value)
+        self._wr += RECORD_SIZE
+        if self._wr >= self._cap:
+            self._wr = 0
+        self._count += RECORD_SIZE
+        return True
+
+    def select(self, mask):
+        """!
+        Chooses which channels @c sample() records.
+        @param mask Bit mask of the channels, bit 0 for channel 0
+        """
+        for ch in range(MAX_CHANNELS):
+            self._selected[ch] = (mask >> ch) & 1
+
+    def sample(self, channel, value):
+        """!
+        Records a sample of a channel if that channel is selected.
+        @param channel The channel number, one of the @c CH_ constants
+        @param value The sampled value
+        """
+        if self._selected[channel]:
+            self.log(KIND_CHANNEL, channel, value)
+
+    def event(self, code, value=0):
+        """!
+        Records an event.
+        @param code The event code, one of the @c EV_ constants
+        @param value An argument for the event
+        """
+        self.log(KIND_EVENT, code, value)
+
+    def pending(self):
+        """!
+        Returns the number of bytes waiting to be sent.
+        """
+        return self._count
+
+    def drain(self, stream, max_bytes=48):
+        """!
+        Writes at most @c max_bytes of buffered records to a stream.
+
+        Only bytes which the stream accepts are removed from the buffer, so a
+        record cut short by a slow stream is finished on the next call.
+        @param stream An object with a @c write() method such as a UART
+        @param max_bytes The most bytes to write in this call
+        @return The number of bytes written
+        """
+        n = min(self._count, max_bytes, self._cap - self._rd)
+        if n <= 0:
+            return 0
+
+        sent = stream.write(self._mv[self._rd:self._rd + n])
+        if not sent:
+            return 0
+
+        self._rd += sent
+        if self._rd >= self._cap:
+            self._rd = 0
+        self._count -= sent
+        return sent
+
+
+## The recorder shared by all tasks
+recorder = Telemetry()
+
+
+class CommandParser:
+    """!
+    Collects characters from the host into lines and runs them as commands.
+    """
+
+    def __init__(self, store, tm, max_len=48):
+        """!
+        Creates a command parser.
+        @param store The @c params.ParamStore changed by @c set and @c get
+        @param tm The @c Telemetry recorder to which answers are logged
+        @param max_len The longest command line accepted
+        """
+        self._store = store
+        self._tm = tm
+        self._line = bytearray(max_len)
+        self._len = 0
+        self._shares = {}
+
+    def add_share(self, name, share):
+        """!
+        Allows a share to be written by the @c sp command.
+        @param name The name used for the share in commands
+        @param share The share
+        """
+        self._shares[name] = share
+
+    def feed(self, data):
+        """!
+        Adds received characters, running each command as its line ends.
+        Lines longer than the line buffer are thrown away.
+        @param data A @c bytes object of received characters
+        """
+        for c in data:
+            if c == 0x0A or c == 0x0D:
+                if self._len > 0:
+                    self.run(bytes(self._line[:self._len]).decode())
+                elif self._len < 0:
+                    self._tm.log(KIND_STATUS, ST_BAD_COMMAND, 0)
+                self._len = 0
+
+            # A length of -1 means the rest of an overlong line is skipped
+            elif self._len < 0:
+                pass
+            elif self._len < len(self._line):
+                self._line[self._len] = c
+                self._len += 1
+            else:
+                self._len = -1
+
+    def _answer_param(self, name):
+        """!
+        Logs the value of a parameter for the host.
+        """
+        self._tm.log(KIND_PARAM, self._store.names.index(name),
+                     self._store.get(name))
+
+    def run(self, line):
+        """!
+        Runs one command line.
+        @param line The command, without its line ending
+        """
+        words = line.split()
+        if not words:
+            return
+        cmd = words[0]
+
+        try:
+            if cmd == "set" and len(words) == 3:
+                self._store.set(words[1], float(words[2]))
+                self._answer_param(words[1])
+            elif cmd == "get" and len(words) == 2:
+                self._answer_param(words[1])
+            elif cmd == "save" and len(words) == 1:
+                try:
+                    self._store.save()
+                except OSError:
+                    self._tm.log(KIND_STATUS, ST_SAVE_FAILED, 0)
+                    return
+                self._tm.log(KIND_STATUS, ST_OK, 0)
+            elif cmd == "load" and len(words) == 1:
+                self._tm.log(KIND_STATUS, ST_OK if self._store.load()
+                             else ST_BAD_ARGUMENT, 0)
+            elif cmd == "reset" and len(words) == 1:
+                self._store.reset()
+                self._tm.log(KIND_STATUS, ST_OK, 0)
+            elif cmd == "sp" and len(words) == 3:
+                # Integer shares can't hold floats, so keep integers as such
+                try:
+                    value = int(words[2])
+                except ValueError:
+                    value = float(words[2])
+                self._shares[words[1]].put(value)
+                self._tm.log(KIND_STATUS, ST_OK, 0)
+            elif cmd == "tm" and len(words) == 2:
+                self._tm.select(int(words[1], 0))
+                self._tm.log(KIND_STATUS, ST_OK, 0)
+            else:
+                self._tm.log(KIND_STATUS, ST_BAD_COMMAND, 0)
+        except (KeyError, ValueError, TypeError):
+            self._tm.log(KIND_STATUS, ST_BAD_ARGUMENT, 0)
@@ -0,0 +1,153 @@
+"""!
+@file tracebuf.py
+Contains the TraceBuffer, one preallocated ring of timestamped events shared by
+every traced task and share, so that all of them can be seen on one timeline.
+
+Tasks created with @c trace=True record when each run starts and ends and
+every change of state; shares created with @c trace=True record each value
+written. Each event takes 10 bytes in four arrays which are allocated once, so
+recording never allocates and the oldest events are overwritten once the
+buffer is full. Stamps are @c utime.ticks_us(), which wraps at 2**30.
+
+The buffer is printed as lines of text by @c dump(), one per event after one
+per source:
+@code
+    TRACE SRC <source> <type> <name>
+    TRACE EV <ticks_us> <kind> <source> <value>
+    TRACE END <events recorded> <events overwritten>
+@endcode
+@c tools/trace_export.py turns these lines into a Chrome Trace / Perfetto file.
+"""
+import array
+import micropython
+import utime
+
+## Events the buffer holds unless told otherwise
+DEFAULT_SIZE = 512
+
+## Source type: a task
+SRC_TASK = 0
+## Source type: a share
+SRC_SHARE = 1
+
+## A task's run started; value 0
+EV_START = 0
+## A task's run ended; value is the state it yielded
+EV_END = 1
+## A task changed state; value is the new state
+EV_STATE = 2
+## A value was written into a share; value is the value
+EV_SHARE = 3
+
+## The buffer shared by all tasks and shares, created by @c get()
+tracer = None
+
+
+def get(size=DEFAULT_SIZE):
+    """!
+    Returns the system-wide trace buffer, creating it the first time. Call
+    this with a size before creating any traced task or share to choose how
+    many events are kept.
+    @param size The number of events kept, rounded up to a power of two
+    @return The @c TraceBuffer
+    """
+    global tracer
+    if tracer is None:
+        tracer = TraceBuffer(size)
+    return tracer
+
+
+class TraceBuffer:
+    """!
+    A ring buffer of timestamped task and share events.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        """!
+        Allocates the ring buffer.
+        @param size The number of events kept, rounded up to a power of two
+               so the write index wraps with a mask
+        """
+        length = 1
+        while length < size:
+            length <<= 1
+        self._mask = length - 1
+        self._t = array.array('l', range(length))
+        self._val = array.array('f', range(length))
+        self._kind = bytearray(length)
+        self._src = bytearray(length)
+        self._next = 0
+        self._n = 0
+        ## The number of events overwritten because the buffer was full
+        self.lost = 0
+
+        ## List of (type, name) of each source, indexed by source number
+        self.sources = []
+        ## @c False to stop recording, leaving the buffer as it is
+        self.enabled = True
+
+    def register(self, name, kind=SRC_TASK):
+        """!
+        Adds a source of events. This allocates, so it's done at start-up.
+        @param name The task's or share's name
+        @param kind The type of source, @c SRC_TASK or @c SRC_SHARE
+        @return The source number to pass to @c record()
+        """
+        if len(self.sources) >= 256:
+            raise ValueError("Too many trace sources")
+        self.sources.append((kind, name))
+        return len(self.sources) - 1
+
+    @micropython.native
+    def record(self, kind, source, value=0):
+        """!
+        Records an event, overwriting the oldest if the buffer is full. This
+        may be called from an interrupt; the slot is claimed first, so an
+        interrupting event can only be stored a little out of order.
+        @param kind The kind of event, one of the @c EV_ constants
+        @param source The source number from @c register()
+        @param value The event's value
+        """
+        if not self.enabled:
+            return
+        i = self._next
+        self._next = (i + 1) & self._mask
+        self._t[i] = utime.ticks_us()
+        self._kind[i] = kind
+        self._src[i] = source
+        self._val[i] = value
+        if self._n <= self._mask:
+            self._n += 1
+        else:
+            self.lost += 1
+
+    def clear(self):
+        """!
+        Throws away every recorded event, keeping the sources.
+        """
+        self._next = 0
+        self._n = 0
+        self.lost = 0
+
+    def events(self):
+        """!
+        Goes through the recorded events, oldest first.
+        @return A generator of (ticks_us, kind, source, value) tuples
+        """
+        i = (self._next - self._n) & self._mask
+        for _ in range(self._n):
+            yield self._t[i], self._kind[i], self._src[i], self._val[i]
+            i = (i + 1) & self._mask
+
+    def dump(self, write=print):
+        """!
+        Prints the sources and the recorded events as lines of text for
+        @c tools/trace_export.py. Recording should be stopped first by
+        setting @c enabled to @c False.
+        @param write A function which prints one line
+        """
+        for num, (kind, name) in enumerate(self.sources):
+            write("TRACE SRC {:d} {:d} {:s}".format(num, kind, name))
+        for t, kind, source, value in self.events():
+            write("TRACE EV {:d} {:d} {:d} {:g}".format(t, kind, source, value))
+        write("TRACE END {:d} {:d}".format(self._n, self.lost))
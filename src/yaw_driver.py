@@ -1,4 +1,5 @@
 import pyb
+import resources
 
 class Yaw():
     def __init__(self, pin):
@@ -8,8 +9,10 @@ class Yaw():
         :param pin: the pin to be used for output
         :"""
         freq = 200
-        self.tim = pyb.Timer(2, freq=freq)
-        self.ch = self.tim.channel(3, pyb.Timer.PWM, pin=pin)
+        # Timer 2 channel 3 is also the firing servo's; the resource manager
+        # refuses to hand it out twice
+        self.tim = resources.timer(2, "Yaw", freq=freq)
+        self.ch = resources.channel(2, 3, "Yaw", pyb.Timer.PWM, pin=pin)
         self.min_pulse_width = 500
         self.max_pulse_width = 2500
         self.set_angle(0)
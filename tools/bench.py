@@ -0,0 +1,189 @@
+"""!
+@file tools/bench.py
+Runs the micro-benchmarks in @c src/bench.py and keeps the results as JSON so
+they can be compared between commits.
+
+The benchmarks run either on the board, through @c mpremote, or under CPython
+with the simulated board in @c tools/sim_board standing in for @c pyb,
+@c utime and @c micropython. Both print the same line of JSON, which is saved
+with the commit it was measured on. The board must have the current modules
+on it and @c main.py stopped, since @c mpremote needs the REPL.
+
+Usage, from the repository root:
+@code
+    python tools/bench.py sim                       # bench_results/<commit>-sim.json
+    python tools/bench.py device /dev/ttyACM0 --copy
+    python tools/bench.py compare bench_results/abc123-device.json bench_results/def456-device.json
+@endcode
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+## The repository's root directory
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+## Directory holding the board's source files
+SRC_DIR = os.path.join(ROOT, "src")
+## Directory holding the simulated board's modules
+SIM_DIR = os.path.join(ROOT, "tools", "sim_board")
+## Where results are saved unless told otherwise
+RESULTS_DIR = os.path.join(ROOT, "bench_results")
+## Printed before the results by @c bench.run(), @c bench.MARK on the board
+MARK = "BENCH "
+
+
+def commit():
+    """!
+    Names the commit being measured.
+    @return The short hash, with @c -dirty if there are uncommitted changes,
+            or @c unknown outside a git checkout
+    """
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "src"],
+                               cwd=ROOT, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return rev.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def _call(names, n):
+    """!
+    Gives the Python statement which runs the benchmarks.
+    """
+    return "import bench; bench.run({!r}, {:d})".format(names, n)
+
+
+def parse(output):
+    """!
+    Finds the results in what the benchmarks printed.
+    @param output The printed text
+    @return The results dictionary
+    """
+    for line in output.splitlines():
+        if line.startswith(MARK):
+            return json.loads(line[len(MARK):])
+    raise ValueError("No benchmark results in the output:\n" + output)
+
+
+def run_sim(names, n):
+    """!
+    Runs the benchmarks under CPython with the simulated board.
+    @param names The benchmarks to run, or @c None for all
+    @param n The number of calls timed for each
+    @return The results dictionary
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join((SIM_DIR, SRC_DIR))
+    out = subprocess.run([sys.executable, "-c", _call(names, n)], cwd=SRC_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    return parse(out.stdout)
+
+
+def run_device(port, names, n, mpremote="mpremote", copy=False):
+    """!
+    Runs the benchmarks on the board.
+    @param port The board's serial port
+    @param names The benchmarks to run, or @c None for all
+    @param n The number of calls timed for each
+    @param mpremote The @c mpremote command
+    @param copy Copy @c src/bench.py to the board first
+    @return The results dictionary
+    """
+    cmd = [mpremote, "connect", port]
+    if copy:
+        cmd += ["cp", os.path.join(SRC_DIR, "bench.py"), ":bench.py", "+"]
+    cmd += ["exec", _call(names, n)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return parse(out.stdout)
+
+
+def compare(old, new):
+    """!
+    Lays out two sets of results side by side.
+    @param old The earlier results dictionary
+    @param new The later results dictionary
+    @return Lines of text, one per benchmark
+    """
+    lines = ["{:24s} {:>10s} {:>10s} {:>8s}".format(
+        "benchmark", old.get("commit", "old"), new.get("commit", "new"), "ratio")]
+    for name, result in new["results"].items():
+        before = old["results"].get(name, {}).get("us_per_op")
+        after = result.get("us_per_op")
+        if before is None or after is None:
+            lines.append("{:24s} {:>10s} {:>10s}".format(
+                name, "-" if before is None else "{:.2f}".format(before),
+                "-" if after is None else "{:.2f}".format(after)))
+            continue
+        ratio = after / before if before > 0 else float("inf")
+        lines.append("{:24s} {:10.2f} {:10.2f} {:8.2f}".format(
+            name, before, after, ratio))
+    return lines
+
+
+def main(argv=None):
+    """!
+    Parses the command line and runs the chosen command.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("sim", "device"):
+        p = sub.add_parser(name, help="run on the simulated board" if name == "sim"
+                           else "run on the board through mpremote")
+        if name == "device":
+            p.add_argument("port")
+            p.add_argument("--mpremote", default="mpremote")
+            p.add_argument("--copy", action="store_true",
+                           help="copy src/bench.py to the board first")
+        p.add_argument("--only", nargs="+", default=None,
+                       help="names of the benchmarks to run")
+        p.add_argument("-n", type=int, default=2000,
+                       help="calls timed for each benchmark")
+        p.add_argument("--out", default=None,
+                       help="results file, by default in bench_results/")
+
+    p = sub.add_parser("compare", help="compare two results files")
+    p.add_argument("old")
+    p.add_argument("new")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print("\n".join(compare(old, new)))
+        return
+
+    if args.command == "sim":
+        report = run_sim(args.only, args.n)
+    else:
+        report = run_device(args.port, args.only, args.n, args.mpremote,
+                            args.copy)
+    report["target"] = args.command
+    report["commit"] = commit()
+    report["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    out = args.out or os.path.join(RESULTS_DIR, "{}-{}.json".format(
+        report["commit"], args.command))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=1)
+
+    for name, result in report["results"].items():
+        if "error" in result:
+            print("{:24s} {}".format(name, result["error"]))
+        else:
+            print("{:24s} {:8.2f} us".format(name, result["us_per_op"]))
+    print("Wrote", out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""!
+@file tools/build_mpy.py
+Compiles the turret's modules in @c src to MicroPython @c .mpy bytecode so the
+board doesn't have to compile them from source at every power-on.
+
+Two ways of shipping the bytecode are supported:
+- Copy the @c .mpy files onto the board's flash in place of the @c .py files
+  (@c --deploy, which needs @c mpremote). @c boot.py and @c main.py stay as
+  source, since MicroPython runs them by file name.
+- Freeze the modules into a custom firmware build with the generated
+  @c manifest.py, which puts the bytecode in flash where it runs without
+  being loaded into RAM at all:
+  @code
+      make -C ports/stm32 BOARD=NUCLEO_L476RG FROZEN_MANIFEST=/path/to/build/manifest.py
+  @endcode
+
+Usage, from the repository root:
+@code
+    python tools/build_mpy.py                     # compile into build/
+    python tools/build_mpy.py --deploy /dev/ttyACM0
+@endcode
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+## Directory holding the board's source files
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+## Files which must stay as source because MicroPython runs them by name
+KEEP_AS_SOURCE = ("boot.py", "main.py")
+
+## Scripts in src which are run by hand and are not part of the turret program
+SCRIPTS = ("linear.py", "uart.py")
+
+## The Nucleo-L476RG's Cortex-M4F needs this to compile native and viper code
+DEFAULT_ARCH = "armv7emsp"
+
+
+def modules(src_dir):
+    """!
+    Lists the modules in the source directory which are compiled.
+    @param src_dir The source directory
+    @return Sorted list of file names
+    """
+    return sorted(f for f in os.listdir(src_dir) if f.endswith(".py")
+                  and f not in KEEP_AS_SOURCE and f not in SCRIPTS)
+
+
+def compile_all(src_dir, out_dir, mpy_cross, arch, opt):
+    """!
+    Compiles each module to a @c .mpy file in the output directory.
+    @param src_dir The source directory
+    @param out_dir The directory for the @c .mpy files
+    @param mpy_cross The @c mpy-cross command
+    @param arch The architecture passed to @c mpy-cross @c -march
+    @param opt The optimization level passed to @c mpy-cross @c -O
+    @return List of the @c .mpy file paths
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    built = []
+    for name in modules(src_dir):
+        out = os.path.join(out_dir, name[:-3] + ".mpy")
+        cmd = [mpy_cross, "-march=" + arch, "-O" + str(opt), "-o", out,
+               "-s", name, os.path.join(src_dir, name)]
+        subprocess.run(cmd, check=True)
+        built.append(out)
+        print("{:<24s}{:8d} bytes".format(os.path.basename(out),
+                                          os.path.getsize(out)))
+    return built
+
+
+def write_manifest(src_dir, out_dir, opt):
+    """!
+    Writes a firmware manifest which freezes the turret's modules.
+    @param src_dir The source directory
+    @param out_dir The directory in which @c manifest.py is written
+    @param opt The optimization level for frozen modules
+    @return The manifest's path
+    """
+    path = os.path.join(out_dir, "manifest.py")
+    src = os.path.abspath(src_dir).replace("\\", "/")
+    with open(path, "w") as f:
+        f.write('include("$(BOARD_DIR)/manifest.py")\n')
+        f.write("freeze({!r}, {!r}, opt={:d})\n".format(
+            src, tuple(modules(src_dir)), opt))
+    return path
+
+
+def deploy(port, built, src_dir, mpremote):
+    """!
+    Copies the compiled modules and the start-up scripts to the board and
+    removes the source copies of compiled modules, since MicroPython would
+    import a @c .py file in preference to the @c .mpy.
+    @param port The board's serial port
+    @param built Paths of the @c .mpy files
+    @param src_dir The source directory
+    @param mpremote The @c mpremote command
+    """
+    base = [mpremote, "connect", port]
+    for path in built:
+        subprocess.run(base + ["rm", ":" + os.path.basename(path)[:-4] + ".py"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    files = built + [os.path.join(src_dir, f) for f in KEEP_AS_SOURCE]
+    subprocess.run(base + ["cp"] + files + [":"], check=True)
+
+
+def main(argv=None):
+    """!
+    Parses the command line, then compiles and optionally deploys.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Compile the turret's modules to .mpy bytecode")
+    parser.add_argument("--src", default=SRC_DIR)
+    parser.add_argument("--out", default="build")
+    parser.add_argument("--arch", default=DEFAULT_ARCH)
+    parser.add_argument("-O", dest="opt", type=int, default=1,
+                        help="optimization level; 1 or more drops asserts")
+    parser.add_argument("--mpy-cross", default="mpy-cross")
+    parser.add_argument("--mpremote", default="mpremote")
+    parser.add_argument("--deploy", metavar="PORT", default=None,
+                        help="copy the result to the board on this port")
+    args = parser.parse_args(argv)
+
+    if shutil.which(args.mpy_cross) is None:
+        sys.exit("mpy-cross not found; install it with 'pip install mpy-cross'"
+                 " (matching the board's MicroPython version)")
+
+    built = compile_all(args.src, args.out, args.mpy_cross, args.arch,
+                        args.opt)
+    print("Wrote", write_manifest(args.src, args.out, args.opt))
+
+    if args.deploy:
+        deploy(args.deploy, built, args.src, args.mpremote)
+
+
+if __name__ == "__main__":
+    main()
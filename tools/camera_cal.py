@@ -0,0 +1,196 @@
+"""!
+@file tools/camera_cal.py
+Measures the thermal camera's pixel to angle mapping for @c src/camera_cal.py.
+
+With the turret homed and idle and a small hot target fixed in front of it,
+the tool steps the yaw axis across a range of angles through the host link,
+and at each step records where the target appears in the image. Since the
+target doesn't move, the change in its pixel position against the change in
+yaw angle gives the field of view, and what is left over after a straight-line
+fit is the lens distortion, which becomes the per-column correction table.
+
+The boresight can't be told from the sweep alone; sight down the barrel, find
+the yaw angle at which it points at the target and give it with @c --aim.
+Without @c --aim the current @c off_x is kept.
+
+Usage, from the repository root:
+@code
+    python tools/camera_cal.py /dev/ttyACM0 --start 175 --stop 215 --aim 196
+    python tools/camera_cal.py /dev/ttyACM0 --aim 196 --apply --deploy
+@endcode
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from turret_telemetry.decode import Decoder
+from turret_telemetry.protocol import KIND_CHANNEL, KIND_PARAM, channel_number
+from turret_telemetry.source import SerialSource
+
+## Encoder counts per output degree, @c settings.deg_fac on the board
+DEG_FAC = 4072 / 360 * 200 / 16
+## The camera's width in pixels, @c camera_cal.IMG_WIDTH on the board
+IMG_WIDTH = 32
+## Yaw mode for position control, @c cotasks.YAW_POSITION on the board
+YAW_POSITION = 2
+
+
+def collect(src, decoder, seconds):
+    """!
+    Reads telemetry for a while and keeps the camera x and yaw position.
+    @param src The @c SerialSource
+    @param decoder The telemetry @c Decoder
+    @param seconds How long to read
+    @return Arrays of the camera x values and yaw positions in counts
+    """
+    cam_x = channel_number("cam_x")
+    yaw_pos = channel_number("yaw_position")
+    xs, ps = [], []
+    end = time.time() + seconds
+    while time.time() < end:
+        records, _ = decoder.feed(src.read())
+        ch = records[records["kind"] == KIND_CHANNEL]
+        xs.extend(ch["value"][ch["number"] == cam_x])
+        ps.extend(ch["value"][ch["number"] == yaw_pos])
+    return np.array(xs), np.array(ps)
+
+
+def read_param(src, decoder, name, timeout=2.0):
+    """!
+    Asks the board for a parameter's value.
+    @param src The @c SerialSource
+    @param decoder The telemetry @c Decoder
+    @param name The parameter name
+    @param timeout How long to wait for the answer in seconds
+    @return The value
+    """
+    src.command("get " + name)
+    end = time.time() + timeout
+    while time.time() < end:
+        records, _ = decoder.feed(src.read())
+        found = records[records["kind"] == KIND_PARAM]
+        if len(found):
+            return float(found["value"][-1])
+    raise TimeoutError("No answer for " + name)
+
+
+def sweep(src, angles, settle, dwell):
+    """!
+    Moves the turret to each angle and records the target's position.
+    @param src The @c SerialSource
+    @param angles The yaw angles to visit in degrees
+    @param settle Time in seconds allowed for each move
+    @param dwell Time in seconds over which each position is measured
+    @return Arrays of the measured yaw angles and target pixel positions
+    """
+    decoder = Decoder()
+    measured, pixels = [], []
+    src.command("sp mode {:d}".format(YAW_POSITION))
+    for angle in angles:
+        src.command("sp yaw {:d}".format(int(round(angle * DEG_FAC))))
+        collect(src, decoder, settle)
+        xs, ps = collect(src, decoder, dwell)
+        if len(xs) == 0 or len(ps) == 0:
+            print("{:7.2f} deg: no target seen, skipped".format(angle))
+            continue
+        measured.append(np.median(ps) / DEG_FAC)
+        pixels.append(np.median(xs))
+        print("{:7.2f} deg: x = {:6.2f} px".format(measured[-1], pixels[-1]))
+    return np.array(measured), np.array(pixels)
+
+
+def fit(angles, pixels, aim=None, boresight=0.0):
+    """!
+    Fits the pixel to angle mapping.
+
+    A fixed target at angle @c T appears at pixel @c x when the turret is at
+    angle @c a = T - (b - x) * k, for boresight @c b and @c k degrees per
+    pixel, so the turret angle is a straight line in the pixel position with
+    slope @c k. The line is fitted that way round, the same way the board
+    turns pixels into angles, so that distortion left over from the line
+    doesn't bias the field of view.
+    @param angles The turret angles in degrees
+    @param pixels The target's pixel positions
+    @param aim The turret angle at which the barrel points at the target, or
+           @c None to keep @c boresight
+    @param boresight The boresight in pixels, used if @c aim isn't given
+    @return A tuple of the field of view in degrees, the boresight in pixels
+            and the correction table in degrees
+    """
+    if len(angles) < 3:
+        raise ValueError("Need the target in view at three or more angles")
+    k, icept = np.polyfit(pixels, angles, 1)
+    if aim is not None:
+        boresight = (aim - icept) / k
+    target = icept + k * boresight
+
+    # What the straight line misses is put in the correction table
+    offset = target - angles
+    predicted = (boresight - pixels) * k
+    order = np.argsort(pixels)
+    table = np.arange(IMG_WIDTH + 1) - IMG_WIDTH // 2
+    correction = np.interp(table, pixels[order], (offset - predicted)[order])
+    return k * IMG_WIDTH, boresight, correction
+
+
+def main(argv=None):
+    """!
+    Parses the command line, runs the sweep and reports or applies the fit.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Calibrate the thermal camera's pixel to angle mapping")
+    parser.add_argument("port")
+    parser.add_argument("--baud", type=int, default=460800)
+    parser.add_argument("--start", type=float, default=175.0,
+                        help="first yaw angle in degrees")
+    parser.add_argument("--stop", type=float, default=215.0,
+                        help="last yaw angle in degrees")
+    parser.add_argument("--steps", type=int, default=11)
+    parser.add_argument("--settle", type=float, default=1.5,
+                        help="seconds allowed for each move")
+    parser.add_argument("--dwell", type=float, default=1.0,
+                        help="seconds over which each position is measured")
+    parser.add_argument("--aim", type=float, default=None,
+                        help="yaw angle at which the barrel points at the target")
+    parser.add_argument("--out", default="camera_cal.json")
+    parser.add_argument("--apply", action="store_true",
+                        help="set and save cam_fov and off_x on the board")
+    parser.add_argument("--deploy", action="store_true",
+                        help="copy the correction table to the board with mpremote")
+    parser.add_argument("--mpremote", default="mpremote")
+    args = parser.parse_args(argv)
+
+    with SerialSource(args.port, args.baud) as src:
+        boresight = read_param(src, Decoder(), "off_x")
+        angles, pixels = sweep(src, np.linspace(args.start, args.stop,
+                                                args.steps),
+                               args.settle, args.dwell)
+        fov, boresight, correction = fit(angles, pixels, args.aim, boresight)
+        print("cam_fov {:.3f}  off_x {:.3f}  correction {:.3f} to {:.3f} deg"
+              .format(fov, boresight, correction.min(), correction.max()))
+
+        if args.apply:
+            src.command("set cam_fov {:.4f}".format(fov))
+            src.command("set off_x {:.4f}".format(boresight))
+            src.command("save")
+
+    with open(args.out, "w") as f:
+        json.dump({"correction": [round(float(c), 4) for c in correction]}, f)
+    print("Wrote", args.out)
+
+    if args.deploy:
+        # mpremote needs the REPL, so main.py must have been stopped
+        subprocess.run([args.mpremote, "connect", args.port, "cp", args.out,
+                        ":camera_cal.json"], check=True)
+
+
+if __name__ == "__main__":
+    main()
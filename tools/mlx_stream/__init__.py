@@ -0,0 +1,14 @@
+"""!
+@file tools/mlx_stream/__init__.py
+Host-side tools for the ESP32 thermal camera's debug stream.
+
+The camera sends framed packets (see @c protocol.py) at 1.5 Mbaud, including
+every 32 x 24 temperature frame. This package decodes the stream from a serial
+port or a raw recording without copying payloads, records frames to
+memory-mapped files and fans packets out to several consumers. Raw byte
+sources are shared with @c turret_telemetry.
+"""
+from .protocol import BAUD, COMMANDS, tuning_packet
+from .decode import Packet, StreamDecoder, image, timings, analysis, message
+from .recording import FRAME_DTYPE, FrameRecorder, read_recording
+from .fanout import FanOut, Subscription, pump, start_pump
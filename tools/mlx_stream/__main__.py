@@ -0,0 +1,114 @@
+"""!
+@file tools/mlx_stream/__main__.py
+Command line interface, run from the @c tools directory as
+@code
+    python -m mlx_stream record /dev/ttyUSB0 session.mlxf --raw session.bin
+    python -m mlx_stream record session.bin replayed.mlxf
+    python -m mlx_stream info session.mlxf
+    python -m mlx_stream log /dev/ttyUSB0
+    python -m mlx_stream tune /dev/ttyUSB0 27 100 40
+@endcode
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from turret_telemetry.source import SerialSource, open_source
+
+from .decode import StreamDecoder, message
+from .fanout import FanOut, pump
+from .protocol import BAUD, CMD_DEBUG, tuning_packet
+from .recording import FrameRecorder, read_recording
+
+
+def _record(args):
+    decoder = StreamDecoder()
+    fanout = FanOut()
+    with open_source(args.source, args.baud, args.raw, True) as src, \
+            FrameRecorder(args.out) as rec:
+        fanout.add_callback(rec.handle)
+        fanout.add_callback(lambda p: print(message(p.payload)), (CMD_DEBUG,))
+        start = time.time()
+        try:
+            total = pump(src, decoder, fanout, seconds=args.seconds)
+        except KeyboardInterrupt:
+            total = None
+        elapsed = time.time() - start
+    print("Recorded {} frames in {:.1f} s to {}".format(rec.count, elapsed,
+                                                        args.out))
+    if total is not None:
+        print("Read {} bytes".format(total))
+    print("{} packets, {} bytes skipped, {} false sync bytes".format(
+        decoder.packets, decoder.skipped, decoder.bad_headers))
+
+
+def _info(args):
+    frames = read_recording(args.recording)
+    print("{} frames".format(len(frames)))
+    if len(frames) > 1:
+        span = frames["time"][-1] - frames["time"][0]
+        if span > 0:
+            print("{:.1f} s, {:.2f} frames/s".format(span,
+                                                     (len(frames) - 1) / span))
+        pixels = frames["pixels"]
+        print("Temperatures {:.1f} to {:.1f} C".format(np.min(pixels),
+                                                       np.max(pixels)))
+
+
+def _log(args):
+    decoder = StreamDecoder()
+    fanout = FanOut()
+    fanout.add_callback(lambda p: print(message(p.payload)), (CMD_DEBUG,))
+    with open_source(args.source, args.baud, release_reset=True) as src:
+        try:
+            pump(src, decoder, fanout)
+        except KeyboardInterrupt:
+            pass
+
+
+def _tune(args):
+    with SerialSource(args.port, args.baud, release_reset=True) as src:
+        src.write(tuning_packet(args.tmin, args.tamb_min, args.tmax))
+
+
+def main(argv=None):
+    """!
+    Parses the command line and runs the chosen command.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(prog="mlx_stream",
+                                     description="Thermal camera stream tools")
+    parser.add_argument("--baud", type=int, default=BAUD)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="record frames from a port or raw file")
+    p.add_argument("source", help="serial port or raw recording")
+    p.add_argument("out", help="frame recording to write")
+    p.add_argument("--raw", default=None,
+                   help="also save the raw bytes from a serial port")
+    p.add_argument("--seconds", type=float, default=None)
+    p.set_defaults(func=_record)
+
+    p = sub.add_parser("info", help="summarize a frame recording")
+    p.add_argument("recording")
+    p.set_defaults(func=_info)
+
+    p = sub.add_parser("log", help="print the camera's debug messages")
+    p.add_argument("source")
+    p.set_defaults(func=_log)
+
+    p = sub.add_parser("tune", help="send temperature thresholds")
+    p.add_argument("port")
+    p.add_argument("tmin", type=float)
+    p.add_argument("tamb_min", type=float)
+    p.add_argument("tmax", type=float)
+    p.set_defaults(func=_tune)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
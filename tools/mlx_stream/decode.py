@@ -0,0 +1,131 @@
+"""!
+@file tools/mlx_stream/decode.py
+Splits the camera's byte stream into packets without copying payloads.
+
+Each chunk read from the port is scanned with @c bytes.find() for sync bytes
+and the packets in it are returned as @c memoryview slices of the chunk.
+Payloads are viewed as NumPy arrays with @c np.frombuffer(), so a frame is
+never copied byte by byte; the only copy is joining a packet split between
+two chunks onto the front of the next chunk. Since chunks are immutable
+@c bytes, the views stay valid for as long as a consumer keeps them, even on
+another thread.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .protocol import (HEADER_SIZE, SYNC, IMG_HEIGHT, IMG_WIDTH, IMAGE_DTYPE,
+                       TIMINGS_DTYPE, ANALYSIS_DTYPE, PARAMS_DTYPE,
+                       valid_header)
+
+## One packet: its command byte, its payload as a @c memoryview, and the
+#  host time in seconds at which the chunk holding it was read
+Packet = namedtuple("Packet", ("cmd", "payload", "time"))
+
+_SYNC = bytes((SYNC,))
+
+
+class StreamDecoder:
+    """!
+    Finds packets in a stream fed to it in chunks of any size.
+    """
+
+    def __init__(self):
+        """!
+        Creates a decoder expecting the start of a packet.
+        """
+        self._pending = b""
+        ## Number of packets decoded
+        self.packets = 0
+        ## Number of bytes skipped while looking for a packet start
+        self.skipped = 0
+        ## Number of sync bytes rejected because the header made no sense
+        self.bad_headers = 0
+
+    def feed(self, data, time=0.0):
+        """!
+        Decodes the packets completed by a chunk of the stream.
+        @param data The chunk's bytes
+        @param time The host time at which the chunk was read
+        @return A list of @c Packet tuples, in stream order
+        """
+        buf = self._pending + bytes(data) if self._pending else bytes(data)
+        view = memoryview(buf)
+        n = len(buf)
+        pos = 0
+        out = []
+        while True:
+            start = buf.find(_SYNC, pos)
+            if start < 0:
+                self.skipped += n - pos
+                pos = n
+                break
+            self.skipped += start - pos
+            if start + HEADER_SIZE > n:
+                pos = start
+                break
+
+            cmd = buf[start + 1]
+            length = buf[start + 2] | (buf[start + 3] << 8)
+            if not valid_header(cmd, length):
+                # Not a real packet start; look again one byte on
+                self.bad_headers += 1
+                self.skipped += 1
+                pos = start + 1
+                continue
+
+            end = start + HEADER_SIZE + length
+            if end > n:
+                pos = start
+                break
+            out.append(Packet(cmd, view[start + HEADER_SIZE:end], time))
+            pos = end
+
+        self.packets += len(out)
+        self._pending = buf[pos:]
+        return out
+
+
+def image(payload):
+    """!
+    Views an image packet's payload as temperatures without copying it.
+    @param payload The payload of a @c CMD_IMAGE packet
+    @return A read-only @c IMG_HEIGHT by @c IMG_WIDTH float32 array
+    """
+    return np.frombuffer(payload, IMAGE_DTYPE).reshape(IMG_HEIGHT, IMG_WIDTH)
+
+
+def timings(payload):
+    """!
+    Views a timings packet's payload.
+    @param payload The payload of a @c CMD_TIMINGS packet
+    @return A record with the fields of @c TIMINGS_DTYPE
+    """
+    return np.frombuffer(payload, TIMINGS_DTYPE)[0]
+
+
+def analysis(payload):
+    """!
+    Views an analysis packet's payload.
+    @param payload The payload of a @c CMD_ANALYSIS packet
+    @return A record with the fields of @c ANALYSIS_DTYPE
+    """
+    return np.frombuffer(payload, ANALYSIS_DTYPE)[0]
+
+
+def params(payload):
+    """!
+    Views a camera settings packet's payload.
+    @param payload The payload of a @c CMD_PARAMS packet
+    @return A record with the fields of @c PARAMS_DTYPE
+    """
+    return np.frombuffer(payload, PARAMS_DTYPE)[0]
+
+
+def message(payload):
+    """!
+    Decodes a debug packet's text.
+    @param payload The payload of a @c CMD_DEBUG packet
+    @return The message as a string
+    """
+    return bytes(payload).decode("ascii", "replace").rstrip("\0")
@@ -0,0 +1,144 @@
+"""!
+@file tools/mlx_stream/fanout.py
+Hands each decoded packet to any number of consumers.
+
+Callbacks run on the reading thread and must be quick, like the recorder's
+@c handle(). Slower consumers, such as a live display or analysis, take
+packets from a bounded queue on their own thread; when one falls behind its
+oldest packets are dropped and counted, so it can never hold up reading the
+port and make the camera's stream overflow.
+"""
+import queue
+import threading
+import time
+
+from turret_telemetry.source import FileSource
+
+
+class Subscription:
+    """!
+    A bounded queue of packets for one consumer.
+    """
+
+    def __init__(self, cmds, maxsize):
+        """!
+        Creates an empty subscription.
+        @param cmds The commands wanted, or @c None for every packet
+        @param maxsize The most packets held before the oldest are dropped
+        """
+        self.cmds = cmds
+        ## Queue from which the consumer takes packets
+        self.queue = queue.Queue(maxsize)
+        ## The number of packets dropped because the consumer fell behind
+        self.dropped = 0
+
+    def offer(self, packet):
+        """!
+        Adds a packet, dropping the oldest one if the queue is full.
+        @param packet The packet
+        """
+        while True:
+            try:
+                self.queue.put_nowait(packet)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """!
+        Takes the next packet, waiting for one.
+        @param timeout The longest time to wait in seconds, or @c None
+        @return The packet, or @c None if the timeout passed
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FanOut:
+    """!
+    Passes packets to callbacks and subscriptions.
+    """
+
+    def __init__(self):
+        """!
+        Creates a fan-out with no consumers.
+        """
+        self._callbacks = []
+        self._subs = []
+
+    def add_callback(self, callback, cmds=None):
+        """!
+        Calls a function with each packet, on the reading thread.
+        @param callback A function taking a @c Packet
+        @param cmds The commands wanted, or @c None for every packet
+        """
+        self._callbacks.append((callback, cmds))
+
+    def subscribe(self, cmds=None, maxsize=64):
+        """!
+        Creates a queue of packets for a consumer on another thread.
+        @param cmds The commands wanted, or @c None for every packet
+        @param maxsize The most packets held before the oldest are dropped
+        @return The @c Subscription
+        """
+        sub = Subscription(cmds, maxsize)
+        self._subs.append(sub)
+        return sub
+
+    def publish(self, packets):
+        """!
+        Hands packets to every consumer which wants them.
+        @param packets A list of @c Packet tuples
+        """
+        for p in packets:
+            for callback, cmds in self._callbacks:
+                if cmds is None or p.cmd in cmds:
+                    callback(p)
+            for sub in self._subs:
+                if sub.cmds is None or p.cmd in sub.cmds:
+                    sub.offer(p)
+
+
+def pump(source, decoder, fanout, stop=None, seconds=None):
+    """!
+    Reads the source, decodes it and publishes the packets until the source
+    ends, @c stop is set or the time runs out.
+    @param source A source with @c read(), such as @c SerialSource
+    @param decoder A @c StreamDecoder
+    @param fanout The @c FanOut to publish to
+    @param stop A @c threading.Event which ends the pump when set
+    @param seconds The longest time to run, or @c None
+    @return The number of bytes read
+    """
+    total = 0
+    start = time.time()
+    while stop is None or not stop.is_set():
+        if seconds is not None and time.time() - start >= seconds:
+            break
+        data = source.read()
+        if not data:
+            # A serial port has nothing yet; a file has ended
+            if isinstance(source, FileSource):
+                break
+            continue
+        total += len(data)
+        fanout.publish(decoder.feed(data, time.time()))
+    return total
+
+
+def start_pump(source, decoder, fanout):
+    """!
+    Runs @c pump() on a background thread.
+    @return The thread and a @c threading.Event which stops it when set
+    """
+    stop = threading.Event()
+    thread = threading.Thread(target=pump, args=(source, decoder, fanout, stop),
+                              daemon=True)
+    thread.start()
+    return thread, stop
@@ -0,0 +1,93 @@
+"""!
+@file tools/mlx_stream/protocol.py
+The packet format of the ESP32 thermal camera's debug stream, mirroring
+@c mlx-viewer/firmware/src/MLX.h and the viewer's @c camdata.ts.
+
+Every packet is the sync byte @c 0xA0, a command byte, a little-endian
+16-bit payload length and the payload. Keep this file in step with @c MLX.h
+when packets are added.
+"""
+import struct
+
+import numpy as np
+
+## First byte of every packet
+SYNC = 0xA0
+## Bytes before the payload: sync, command and 16-bit length
+HEADER_SIZE = 4
+## The camera's debug port baud rate, @c Serial.begin() in @c main.cpp
+BAUD = 1500000
+
+IMG_WIDTH = 32
+IMG_HEIGHT = 24
+
+# Packets from the camera
+CMD_IMAGE = 0x00      # One frame of temperatures, IMG_HEIGHT x IMG_WIDTH floats
+CMD_DEBUG = 0x01      # A text message
+CMD_PARAMS = 0x02     # The camera's control register settings (CamInfo)
+CMD_TIMINGS = 0x03    # Times taken to fetch, send and calculate a frame
+CMD_ANALYSIS = 0x04   # The target's centroid
+
+# Packets to the camera
+CMD_TUNING = 0x01     # Temperature thresholds used to find the target
+
+## Command names, for printing
+COMMANDS = {CMD_IMAGE: "image", CMD_DEBUG: "debug", CMD_PARAMS: "params",
+            CMD_TIMINGS: "timings", CMD_ANALYSIS: "analysis"}
+
+## Temperatures in degrees C, row by row
+IMAGE_DTYPE = np.dtype("<f4")
+## @c cam_timing in @c MLX.h, in milliseconds (an ESP32 @c long is 32 bits)
+TIMINGS_DTYPE = np.dtype([("t_frame_fetch", "<i4"), ("t_frame_tx_time", "<i4"),
+                          ("t_calc_time", "<i4")])
+## @c analysis in @c MLX.h, in pixels
+ANALYSIS_DTYPE = np.dtype([("cx", "<f4"), ("cy", "<f4")])
+## @c CamInfo in @c MLX.h, packed
+PARAMS_DTYPE = np.dtype([("en_subpage_mode", "u1"), ("en_data_hold", "u1"),
+                         ("en_subpage_repeat", "u1"), ("select_subpage", "u1"),
+                         ("refresh_rate", "u1"), ("resolution", "u1"),
+                         ("pattern", "u1")])
+
+## Payload length of each fixed-size packet
+PAYLOAD_SIZES = {CMD_IMAGE: IMG_WIDTH * IMG_HEIGHT * IMAGE_DTYPE.itemsize,
+                 CMD_TIMINGS: TIMINGS_DTYPE.itemsize,
+                 CMD_ANALYSIS: ANALYSIS_DTYPE.itemsize,
+                 CMD_PARAMS: PARAMS_DTYPE.itemsize}
+
+## The longest payload accepted, as in the viewer; longer ones mean lost sync
+MAX_LEN = 5000
+
+
+def valid_header(cmd, length):
+    """!
+    Checks whether a packet header could be real, so that a sync byte found
+    inside a payload after lost data isn't taken as the start of a packet.
+    @param cmd The command byte
+    @param length The payload length
+    @return @c True if a packet with this command may have this length
+    """
+    if cmd in PAYLOAD_SIZES:
+        return length == PAYLOAD_SIZES[cmd]
+    return cmd == CMD_DEBUG and 0 < length <= MAX_LEN
+
+
+def packet(cmd, payload):
+    """!
+    Builds a packet for sending to the camera.
+    @param cmd The command byte
+    @param payload The payload bytes
+    @return The packet's bytes
+    """
+    return struct.pack("<BBH", SYNC, cmd, len(payload)) + bytes(payload)
+
+
+def tuning_packet(tmin, tamb_min, tmax):
+    """!
+    Builds the packet which sets the camera's target temperature thresholds,
+    as the viewer's @c writeTuning() does.
+    @param tmin The lowest temperature counted as target, degrees C
+    @param tamb_min The @c tamb_min tuning value, degrees C
+    @param tmax The highest temperature counted as target, degrees C
+    @return The packet's bytes
+    """
+    return packet(CMD_TUNING, struct.pack("<fff", tmin, tamb_min, tmax))
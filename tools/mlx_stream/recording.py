@@ -0,0 +1,159 @@
+"""!
+@file tools/mlx_stream/recording.py
+Frame recordings kept in memory-mapped files.
+
+A recording is a 64-byte header followed by fixed-size frame records of
+@c FRAME_DTYPE. The recorder maps the file and writes each frame straight
+into the map, growing the file a block of frames at a time, so hours of
+frames at full rate never have to fit in memory. @c read_recording() maps a
+finished (or still growing) recording as a NumPy array, so analysis code can
+slice a whole session without loading it:
+@code
+    frames = read_recording("session.mlxf")
+    hottest = frames["pixels"].max(axis=(1, 2))
+@endcode
+"""
+import os
+import struct
+
+import numpy as np
+
+from .decode import image, analysis, timings
+from .protocol import (CMD_IMAGE, CMD_ANALYSIS, CMD_TIMINGS, IMG_HEIGHT,
+                       IMG_WIDTH)
+
+## First bytes of a recording file
+MAGIC = b"MLXFRM01"
+## Bytes before the first frame
+HEADER_SIZE = 64
+# Header layout: magic, frame count, width, height
+_HEADER = struct.Struct("<8sQII")
+
+## One recorded frame: the host time it was read, its number in the session,
+#  the latest centroid and fetch time reported by the camera, and the image
+FRAME_DTYPE = np.dtype([("time", "<f8"), ("seq", "<u4"), ("cx", "<f4"),
+                        ("cy", "<f4"), ("fetch_ms", "<i4"),
+                        ("pixels", "<f4", (IMG_HEIGHT, IMG_WIDTH))])
+
+
+class FrameRecorder:
+    """!
+    Writes image packets to a memory-mapped recording. Its @c handle()
+    method can be given to @c FanOut.add_callback().
+    """
+
+    def __init__(self, path, block=1024, sync_every=64):
+        """!
+        Creates the recording file.
+        @param path The file to write
+        @param block The number of frames by which the file grows
+        @param sync_every The header's frame count is brought up to date
+               after this many frames, so a recording cut short by a crash
+               can still be read up to that point
+        """
+        self.path = path
+        self._block = block
+        self._sync_every = sync_every
+        self._file = open(path, "w+b")
+        self._file.write(_HEADER.pack(MAGIC, 0, IMG_WIDTH, IMG_HEIGHT)
+                         .ljust(HEADER_SIZE, b"\0"))
+        ## The number of frames recorded
+        self.count = 0
+        self._capacity = 0
+        self._map = None
+        self._grow()
+
+        self._cx = np.nan
+        self._cy = np.nan
+        self._fetch = -1
+
+    def _grow(self):
+        """!
+        Lengthens the file by a block of frames and maps it again.
+        """
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._capacity += self._block
+        self._file.truncate(HEADER_SIZE + self._capacity * FRAME_DTYPE.itemsize)
+        self._map = np.memmap(self._file, FRAME_DTYPE, "r+", HEADER_SIZE,
+                              (self._capacity,))
+
+    def _write_count(self):
+        """!
+        Writes the frame count into the header.
+        """
+        self._file.seek(8)
+        self._file.write(struct.pack("<Q", self.count))
+        self._file.flush()
+
+    def handle(self, packet):
+        """!
+        Records a packet: image packets become frames, and analysis and
+        timing packets are kept to be stored with the next frame.
+        @param packet A @c Packet from @c StreamDecoder
+        """
+        if packet.cmd == CMD_ANALYSIS:
+            a = analysis(packet.payload)
+            self._cx, self._cy = a["cx"], a["cy"]
+        elif packet.cmd == CMD_TIMINGS:
+            self._fetch = timings(packet.payload)["t_frame_fetch"]
+        elif packet.cmd == CMD_IMAGE:
+            self.add(image(packet.payload), packet.time)
+
+    def add(self, pixels, time):
+        """!
+        Records one frame.
+        @param pixels The frame's temperatures
+        @param time The host time at which the frame was read
+        """
+        if self.count >= self._capacity:
+            self._grow()
+        rec = self._map[self.count]
+        rec["time"] = time
+        rec["seq"] = self.count
+        rec["cx"] = self._cx
+        rec["cy"] = self._cy
+        rec["fetch_ms"] = self._fetch
+        rec["pixels"] = pixels
+        self.count += 1
+        if self.count % self._sync_every == 0:
+            self._write_count()
+
+    def close(self):
+        """!
+        Finishes the recording, trimming the unused part of the last block.
+        """
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map = None
+        self._file.truncate(HEADER_SIZE + self.count * FRAME_DTYPE.itemsize)
+        self._write_count()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path):
+    """!
+    Maps a recording's frames without reading them into memory.
+    @param path The recording file
+    @return A read-only memory-mapped array of @c FRAME_DTYPE
+    """
+    with open(path, "rb") as f:
+        magic, count, width, height = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or (width, height) != (IMG_WIDTH, IMG_HEIGHT):
+        raise ValueError(path + " isn't a frame recording")
+
+    # A recording still being written (or cut short) may hold more frames
+    # than the header says; only the counted ones are known to be complete
+    room = (os.path.getsize(path) - HEADER_SIZE) // FRAME_DTYPE.itemsize
+    count = min(count, room)
+    if count == 0:
+        return np.zeros(0, FRAME_DTYPE)
+    return np.memmap(path, FRAME_DTYPE, "r", HEADER_SIZE, (count,))
@@ -0,0 +1,373 @@
+"""!
+@file tools/schedulability.py
+Checks whether the board's tasks can all meet their deadlines, from the run
+times measured by @c cotask profiling, and proposes rate-monotonic priorities.
+
+Stop the board's program with Ctrl-C and save what it prints; the task table
+printed by @c print(task_list) gives each task's priority, period and slowest
+run. The tool works out the CPU utilization and a bound on each task's
+response time under @c TaskList.pri_sched(), which never preempts a task:
+ - a task can be held up by one run of any lower priority task which had just
+   started (blocking), then by every run of a higher priority task which falls
+   due before it starts;
+ - tasks of the same priority are taken in turn, which is bounded by counting
+   them as higher priority, so the bounds are safe but may be pessimistic;
+ - each run is charged the scheduler's own time, @c --overhead.
+A task is infeasible if its bound is longer than its period, its deadline. The
+tool then assigns priorities by rate, shortest period highest, and checks
+those; if rate-monotonic order fails it searches for any order which works
+(Audsley's algorithm). The headroom is how much every run time could grow, in
+proportion, before some task would miss its deadline.
+
+Tasks without a period, such as the camera task, are run by interrupts; give
+the shortest time between their runs with @c --sporadic, or they are only
+counted as blocking other tasks. @c --period tries a different period, to see
+whether a loop can be run faster.
+
+Usage, from the repository root:
+@code
+    python tools/schedulability.py run.log --sporadic "Camera Controller=33.3" --overhead 0.05
+    python tools/schedulability.py run.log --period "Yaw Motor Driver=5"
+@endcode
+"""
+import argparse
+import math
+import re
+import sys
+
+## Matches the start of a row of the task table: name, priority, period, runs
+ROW = re.compile(r"^(?P<name>.+?)\s+(?P<pri>-?\d+)\s+(?P<period>\d+\.\d+|-)"
+                 r"\s+(?P<runs>\d+)(?=\s|$)(?P<rest>.*)$")
+## Rows of the task table which are not tasks
+NOT_TASKS = ("Idle GC", "Watchdog")
+
+
+class Task:
+    """!
+    One task's timing, in milliseconds.
+    """
+
+    def __init__(self, name, priority, period, run):
+        """!
+        @param name The task's name
+        @param priority The task's priority, higher numbers first
+        @param period The period or least time between runs, or @c None if
+               unknown, in which case the task only blocks others
+        @param run The longest run time
+        """
+        self.name = name
+        self.priority = priority
+        self.period = period
+        self.run = run
+
+    def __repr__(self):
+        return "Task({!r}, {}, {}, {})".format(self.name, self.priority,
+                                               self.period, self.run)
+
+
+def parse_table(lines):
+    """!
+    Reads the last task table printed by @c print(task_list) from a log.
+    @param lines The lines of text
+    @return A list of @c Task objects; tasks which weren't profiled have a
+            run time of @c None
+    """
+    tasks = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("TASK ") and "PERIOD" in line:
+            tasks = []
+            continue
+        if tasks is None:
+            continue
+        m = ROW.match(line)
+        if m is None or m.group("name").strip() in NOT_TASKS:
+            continue
+        period = m.group("period")
+        # The average and slowest run take 10 characters each after the runs
+        rest = m.group("rest")
+        run = float(rest[10:20]) if rest[:10].strip() else None
+        tasks.append(Task(m.group("name").strip(), int(m.group("pri")),
+                          None if period == "-" else float(period), run))
+    if not tasks:
+        raise ValueError("No task table found")
+    return tasks
+
+
+def _blocking(task, tasks, pri, overhead):
+    """!
+    Finds the longest run which may have just started when @c task falls due:
+    that of a task of lower priority, or of a task without a period.
+    """
+    return max([t.run + overhead for t in tasks if t is not task and (
+        pri[t] < pri[task] or t.period is None)], default=0.0)
+
+
+def _interferers(task, tasks, pri):
+    """!
+    Finds the periodic tasks which may run before @c task once it's due.
+    """
+    return [t for t in tasks if t is not task and pri[t] >= pri[task]
+            and t.period is not None]
+
+
+def response_time(task, tasks, pri, overhead=0.0, limit=100):
+    """!
+    Bounds the time from a periodic task falling due to its run ending.
+
+    This is the response time analysis for non-preemptive fixed priorities of
+    Davis, Burns, Bril and Lukkien (2007): every run of the task in the
+    longest level-i busy period is checked, since under non-preemptive
+    scheduling the first run is not always the slowest to respond.
+    @param task The @c Task
+    @param tasks Every @c Task
+    @param pri Dictionary of the priority of each task
+    @param overhead Scheduler time charged to each run, in milliseconds
+    @param limit The most runs of the task checked before giving up
+    @return The bound in milliseconds, or @c math.inf if the busy period
+            doesn't end
+    """
+    c = task.run + overhead
+    hp = _interferers(task, tasks, pri)
+    b = _blocking(task, tasks, pri, overhead)
+
+    # The longest busy period at this task's priority
+    busy = b + c
+    for _ in range(1000):
+        nxt = b + math.ceil(busy / task.period) * c + sum(
+            math.ceil(busy / t.period) * (t.run + overhead) for t in hp)
+        if nxt == busy:
+            break
+        busy = nxt
+    else:
+        return math.inf
+    runs = math.ceil(busy / task.period)
+    if runs > limit:
+        return math.inf
+
+    worst = 0.0
+    for q in range(runs):
+        # When the q-th run in the busy period starts
+        start = b + q * c
+        for _ in range(1000):
+            nxt = b + q * c + sum(
+                (math.floor(start / t.period) + 1) * (t.run + overhead)
+                for t in hp)
+            if nxt == start:
+                break
+            start = nxt
+        else:
+            return math.inf
+        worst = max(worst, start + c - q * task.period)
+    return worst
+
+
+def analyse(tasks, pri, overhead=0.0):
+    """!
+    Bounds the response time of every periodic task.
+    @param tasks Every @c Task
+    @param pri Dictionary of the priority of each task
+    @param overhead Scheduler time charged to each run, in milliseconds
+    @return Dictionary of the bound on each periodic task's response time
+    """
+    return {t: response_time(t, tasks, pri, overhead) for t in tasks
+            if t.period is not None}
+
+
+def feasible(tasks, pri, overhead=0.0):
+    """!
+    Checks that every periodic task meets its deadline, its period.
+    """
+    return all(r <= t.period for t, r in analyse(tasks, pri, overhead).items())
+
+
+def utilization(tasks, overhead=0.0):
+    """!
+    Works out the fraction of the CPU used by the periodic tasks.
+    """
+    return sum((t.run + overhead) / t.period for t in tasks
+               if t.period is not None)
+
+
+def rate_monotonic(tasks):
+    """!
+    Gives priorities by rate, the shortest period highest. Tasks with equal
+    periods share a priority; tasks without a period get the lowest, 0.
+    @param tasks Every @c Task
+    @return Dictionary of the priority of each task
+    """
+    periods = sorted({t.period for t in tasks if t.period is not None},
+                     reverse=True)
+    return {t: 0 if t.period is None else periods.index(t.period) + 1
+            for t in tasks}
+
+
+def audsley(tasks, overhead=0.0):
+    """!
+    Searches for distinct priorities under which every task meets its
+    deadline, giving the lowest priority to the first task found which can
+    take it. Tasks without a period stay at the bottom.
+    @param tasks Every @c Task
+    @param overhead Scheduler time charged to each run, in milliseconds
+    @return Dictionary of the priority of each task, or @c None if no order
+            works
+    """
+    left = [t for t in tasks if t.period is not None]
+    pri = {t: 0 for t in tasks if t.period is None}
+    level = 1
+    while left:
+        # Try the slowest tasks at the lowest priority first
+        for t in sorted(left, key=lambda t: -t.period):
+            trial = dict(pri)
+            trial[t] = level
+            for other in left:
+                if other is not t:
+                    trial[other] = level + 1
+            if response_time(t, tasks, trial, overhead) <= t.period:
+                pri[t] = level
+                left.remove(t)
+                level += 1
+                break
+        else:
+            return None
+    return pri
+
+
+def headroom(tasks, pri, overhead=0.0):
+    """!
+    Finds how far all run times could be scaled up with every task still
+    meeting its deadline.
+    @return The largest factor found, 0 if the tasks are infeasible already
+    """
+    def scaled(k):
+        return [Task(t.name, t.priority, t.period, t.run * k) for t in tasks]
+
+    def ok(k):
+        s = scaled(k)
+        return feasible(s, {a: pri[t] for a, t in zip(s, tasks)}, overhead)
+
+    if not ok(1.0):
+        return 0.0
+    low, high = 1.0, 2.0
+    while ok(high) and high < 1000:
+        low, high = high, high * 2
+    for _ in range(30):
+        mid = (low + high) / 2
+        if ok(mid):
+            low = mid
+        else:
+            high = mid
+    return low
+
+
+def report(tasks, pri, overhead=0.0):
+    """!
+    Lays out each task's timing and response time bound.
+    @return Lines of text
+    """
+    bounds = analyse(tasks, pri, overhead)
+    lines = ["{:24s} {:>4s} {:>8s} {:>8s} {:>7s} {:>9s}  {}".format(
+        "task", "pri", "period", "run", "util", "response", "")]
+    for t in sorted(tasks, key=lambda t: (-pri[t], t.period or math.inf)):
+        period = "-" if t.period is None else "{:8.1f}".format(t.period)
+        util = "-" if t.period is None else "{:6.1f}%".format(
+            100 * (t.run + overhead) / t.period)
+        if t in bounds:
+            r = bounds[t]
+            resp = "{:9.3f}".format(r)
+            flag = "ok" if r <= t.period else "MISSES DEADLINE"
+        else:
+            resp, flag = "-", "blocking only"
+        lines.append("{:24s} {:4d} {:>8s} {:8.3f} {:>7s} {:>9s}  {}".format(
+            t.name[:24], pri[t], period, t.run, util, resp, flag))
+    return lines
+
+
+def _named(values, option):
+    """!
+    Splits NAME=MS arguments into a dictionary.
+    """
+    out = {}
+    for item in values or ():
+        name, sep, ms = item.rpartition("=")
+        if not sep:
+            raise SystemExit("{} wants NAME=MS, not {!r}".format(option, item))
+        out[name] = float(ms)
+    return out
+
+
+def main(argv=None):
+    """!
+    Parses the command line and analyses the task set.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Check the tasks' deadlines and propose priorities")
+    parser.add_argument("log", nargs="?", default="-",
+                        help="log holding the task table, - for standard input")
+    parser.add_argument("--overhead", type=float, default=0.0,
+                        help="scheduler time per run in ms, e.g. from "
+                             "bench.py's pri_sched_one_ready")
+    parser.add_argument("--sporadic", nargs="+", metavar="NAME=MS",
+                        help="least time between runs of a task without a period")
+    parser.add_argument("--period", nargs="+", metavar="NAME=MS",
+                        help="try a task at a different period")
+    parser.add_argument("--run", nargs="+", metavar="NAME=MS",
+                        help="run time for a task which wasn't profiled")
+    args = parser.parse_args(argv)
+
+    if args.log == "-":
+        tasks = parse_table(sys.stdin)
+    else:
+        with open(args.log, errors="replace") as f:
+            tasks = parse_table(f)
+
+    changes = _named(args.sporadic, "--sporadic")
+    changes.update(_named(args.period, "--period"))
+    runs = _named(args.run, "--run")
+    for name in list(changes) + list(runs):
+        if name not in [t.name for t in tasks]:
+            raise SystemExit("No task named {!r}".format(name))
+    for t in tasks:
+        t.period = changes.get(t.name, t.period)
+        t.run = runs.get(t.name, t.run)
+    missing = [t.name for t in tasks if t.run is None]
+    if missing:
+        raise SystemExit("No run time for {}; profile them or give --run".format(
+            ", ".join(missing)))
+
+    u = utilization(tasks, args.overhead)
+    n = len([t for t in tasks if t.period is not None])
+    print("Utilization {:.1f}% of the CPU; the rate-monotonic bound for {} tasks "
+          "with preemption is {:.1f}%".format(100 * u, n,
+                                             100 * n * (2 ** (1 / n) - 1) if n else 0))
+    if u > 1:
+        print("INFEASIBLE: the tasks need more than the whole CPU")
+
+    pri = {t: t.priority for t in tasks}
+    print("\nPriorities as set:")
+    print("\n".join(report(tasks, pri, args.overhead)))
+    print("{} with headroom {:.2f}x".format(
+        "Feasible" if feasible(tasks, pri, args.overhead) else "INFEASIBLE",
+        headroom(tasks, pri, args.overhead)))
+
+    rm = rate_monotonic(tasks)
+    print("\nRate-monotonic priorities:")
+    print("\n".join(report(tasks, rm, args.overhead)))
+    if feasible(tasks, rm, args.overhead):
+        print("Feasible with headroom {:.2f}x".format(
+            headroom(tasks, rm, args.overhead)))
+        return
+
+    print("INFEASIBLE")
+    order = audsley(tasks, args.overhead)
+    if order is None:
+        print("\nNo order of priorities meets every deadline")
+    else:
+        print("\nPriorities which meet every deadline:")
+        print("\n".join(report(tasks, order, args.overhead)))
+        print("Headroom {:.2f}x".format(headroom(tasks, order, args.overhead)))
+
+
+if __name__ == "__main__":
+    main()
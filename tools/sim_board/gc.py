@@ -0,0 +1,56 @@
+"""!
+@file tools/sim_board/gc.py
+Adds MicroPython's @c gc.mem_free() and @c gc.mem_alloc() to CPython's @c gc
+module.
+
+CPython's own @c gc is built in, so it is always found before this file on
+the path; instead the simulated @c micropython module, which the board's code
+imports, loads this file and copies its functions onto the real @c gc. The
+heap is modelled as @c HEAP_SIZE bytes, of which the memory CPython has
+allocated since the last @c collect() counts as used. The numbers only show
+whether code allocates, not how much it would on the board.
+"""
+import gc as _builtin
+import sys
+
+## Bytes in the simulated heap, about what MicroPython has on the STM32L476
+HEAP_SIZE = 96 * 1024
+## Bytes counted for each block CPython allocates
+BLOCK_SIZE = 16
+
+_collect = _builtin.collect
+_base = sys.getallocatedblocks()
+
+
+def mem_alloc():
+    """!
+    Gives the bytes of the simulated heap in use.
+    """
+    used = (sys.getallocatedblocks() - _base) * BLOCK_SIZE
+    return min(max(used, 0), HEAP_SIZE)
+
+
+def mem_free():
+    """!
+    Gives the bytes of the simulated heap still free.
+    """
+    return HEAP_SIZE - mem_alloc()
+
+
+def collect():
+    """!
+    Runs CPython's collector and empties the simulated heap.
+    """
+    global _base
+    n = _collect()
+    _base = sys.getallocatedblocks()
+    return n
+
+
+def install():
+    """!
+    Puts these functions on CPython's @c gc module.
+    """
+    _builtin.mem_alloc = mem_alloc
+    _builtin.mem_free = mem_free
+    _builtin.collect = collect
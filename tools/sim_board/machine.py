@@ -0,0 +1,51 @@
+"""!
+@file tools/sim_board/machine.py
+A stand-in for MicroPython's @c machine module.
+"""
+
+
+class WDT:
+    """!
+    A watchdog which counts its feeds and never resets anything.
+    """
+
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+        self.feeds = 0
+
+    def feed(self):
+        self.feeds += 1
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+class Timer:
+    """!
+    A software timer. Nothing runs it; a simulation calls @c fire() when the
+    period would have passed.
+    """
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.callback = None
+        self.period = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.mode = mode
+        self.period = period
+        self.callback = callback
+
+    def fire(self):
+        callback = self.callback
+        if self.mode == Timer.ONE_SHOT:
+            self.callback = None
+        if callback is not None:
+            callback(self)
+
+    def deinit(self):
+        self.callback = None
@@ -0,0 +1,40 @@
+"""!
+@file tools/sim_board/micropython.py
+A stand-in for MicroPython's @c micropython module. The code emitters are
+ignored, so native and viper functions run as ordinary Python.
+
+Importing this module also gives CPython's @c gc the @c mem_free() and
+@c mem_alloc() functions from @c gc.py here.
+"""
+import importlib.util
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    "_sim_gc", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gc.py"))
+_sim_gc = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_sim_gc)
+_sim_gc.install()
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def const(x):
+    return x
+
+
+def schedule(f, arg):
+    f(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
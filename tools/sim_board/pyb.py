@@ -0,0 +1,181 @@
+"""!
+@file tools/sim_board/pyb.py
+A stand-in for MicroPython's @c pyb module, so that the turret's modules can
+be imported and exercised under CPython.
+
+Peripherals keep their state in plain attributes instead of driving any
+hardware: a timer's encoder count is set with @c counter(value), a channel
+remembers its last pulse width, and a UART reads bytes given to @c inject()
+and keeps what is written in @c written.
+"""
+
+
+class _Board:
+    """!
+    Makes up a pin for any attribute, like @c pyb.Pin.board.PC6.
+    """
+
+    def __getattr__(self, name):
+        return Pin(name[1:] if name.startswith("P") else name)
+
+
+class Pin:
+    """!
+    A GPIO pin which holds its output value.
+    """
+    board = _Board()
+    IN = 0
+    OUT_PP = 1
+    PULL_UP = 1
+
+    def __init__(self, name, mode=IN, pull=None):
+        self._name = name.name() if isinstance(name, Pin) else str(name)
+        self.mode = mode
+        self._value = 1 if pull == Pin.PULL_UP else 0
+
+    def name(self):
+        return self._name
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def __str__(self):
+        return "Pin(" + self._name + ")"
+
+
+class TimerChannel:
+    """!
+    A timer channel which remembers its latest pulse width.
+    """
+
+    def __init__(self, timer, channel, mode, **kwargs):
+        self.timer = timer
+        self.channel = channel
+        self.mode = mode
+        self.width = 0
+        self.percent = 0
+
+    def pulse_width(self, width=None):
+        if width is None:
+            return self.width
+        self.width = width
+
+    def pulse_width_percent(self, percent=None):
+        if percent is None:
+            return self.percent
+        self.percent = percent
+
+
+class Timer:
+    """!
+    A timer whose counter is set by the simulation.
+    """
+    PWM = 0
+    ENC_AB = 1
+
+    def __init__(self, num, freq=None, prescaler=None, period=None):
+        self.num = num
+        self.freq = freq
+        self.prescaler = prescaler
+        self.period = 0xFFFF if period is None else period
+        self._count = 0
+        self.channels = {}
+
+    def counter(self, value=None):
+        if value is None:
+            return self._count
+        self._count = value & self.period
+
+    def channel(self, ch, mode, **kwargs):
+        self.channels[ch] = TimerChannel(self, ch, mode, **kwargs)
+        return self.channels[ch]
+
+    def deinit(self):
+        self.channels = {}
+
+
+class UART:
+    """!
+    A UART which reads injected bytes and keeps written ones.
+    """
+    IRQ_RXIDLE = 1
+
+    def __init__(self, num, baud=9600, timeout=0, read_buf_len=64, **kwargs):
+        self.num = num
+        self.baud = baud
+        self._rx = bytearray()
+        ## Every byte written to the UART
+        self.written = bytearray()
+        self._handler = None
+
+    def inject(self, data):
+        """!
+        Makes bytes arrive, calling the receive interrupt handler if set.
+        @param data The bytes received
+        """
+        self._rx += data
+        if self._handler:
+            self._handler(self)
+
+    def any(self):
+        return len(self._rx)
+
+    def read(self, n=None):
+        if not self._rx:
+            return None
+        n = len(self._rx) if n is None else n
+        data = bytes(self._rx[:n])
+        del self._rx[:n]
+        return data
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self._rx))
+        if not n:
+            return None
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        return n
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def irq(self, handler=None, trigger=0):
+        self._handler = handler
+
+    def deinit(self):
+        self._handler = None
+
+
+class ExtInt:
+    """!
+    An external interrupt line whose callback the simulation can call.
+    """
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+    IRQ_RISING_FALLING = 3
+
+    def __init__(self, pin, mode, pull, callback):
+        self.pin = pin
+        self.callback = callback
+
+    def line(self):
+        return 0
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=True):
+    pass
+
+
+def repl_uart(uart=None):
+    pass
+
+
+def main(filename):
+    pass
@@ -0,0 +1,38 @@
+"""!
+@file tools/sim_board/utime.py
+A stand-in for MicroPython's @c utime module. Tick counters wrap at 2**30
+as they do on the board, so code which forgets @c ticks_diff() fails here too.
+"""
+import time
+
+_PERIOD = 1 << 30
+_start = time.perf_counter()
+
+
+def ticks_us():
+    return int((time.perf_counter() - _start) * 1e6) % _PERIOD
+
+
+def ticks_ms():
+    return int((time.perf_counter() - _start) * 1e3) % _PERIOD
+
+
+def ticks_diff(end, start):
+    d = (end - start) % _PERIOD
+    return d - _PERIOD if d >= _PERIOD // 2 else d
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % _PERIOD
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+def sleep(s):
+    time.sleep(s)
@@ -0,0 +1,16 @@
+"""!
+@file tools/tests/conftest.py
+Puts the simulated board in @c tools/sim_board and the board's code in @c src
+on the path ahead of the host tools, so the tests import the same modules as
+the board does.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The board's modules come first, since some tools share their names
+for i, path in enumerate((os.path.join(ROOT, "tools", "sim_board"),
+                          os.path.join(ROOT, "src"), os.path.join(ROOT, "tools"))):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(i, path)
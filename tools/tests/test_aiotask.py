@@ -0,0 +1,145 @@
+"""!
+@file tools/tests/test_aiotask.py
+Runs tasks under the uasyncio adapter with CPython's asyncio.
+"""
+import asyncio
+
+import aiotask
+import cotask
+import utime
+
+
+class FakeReader:
+    """!
+    A stream reader which hands out the chunks it was given, a little at a
+    time if the buffer offered is small. @c None stands for a wake-up with
+    nothing to read and the end of the list for the end of the stream.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    async def readinto(self, buf):
+        await asyncio.sleep(0)
+        if not self.chunks:
+            return 0
+        data = self.chunks.pop(0)
+        if data is None:
+            return None
+        n = min(len(data), len(buf))
+        buf[:n] = data[:n]
+        if n < len(data):
+            self.chunks.insert(0, data[n:])
+        return n
+
+
+def test_triggered_task_runs_once_per_go():
+    runs = []
+
+    def fun():
+        while True:
+            runs.append(1)
+            yield 0
+
+    task = cotask.Task(fun, name="Trig", priority=1)
+
+    async def poke():
+        for _ in range(3):
+            await asyncio.sleep(0.005)
+            task.go()
+        await asyncio.sleep(0.02)
+        task.enabled = False
+        task.go()
+
+    async def main():
+        await asyncio.gather(aiotask._triggered(task), poke())
+
+    asyncio.run(asyncio.wait_for(main(), 2))
+    assert len(runs) == 3
+
+
+def test_stream_keeps_going_when_buffer_fills():
+    source = aiotask.StreamInput(4)
+    got = []
+
+    def fun(src):
+        # Reads nothing the first time, so the next fill finds the buffer full
+        while True:
+            buf = bytearray(2 if got else 0)
+            n = src.readinto(buf)
+            got.append(bytes(buf[:n]))
+            yield 0
+
+    task = cotask.Task(fun, name="Stream", priority=1, shares=source)
+    reader = FakeReader([b"abcd", None, b"ef", b"gh"])
+    asyncio.run(asyncio.wait_for(aiotask._streamed(task, reader, source), 2))
+    # "gh" is still in the buffer at the end of the stream, so the task is
+    # run again to take it
+    assert got == [b"", b"ab", b"cd", b"ef", b"gh"]
+
+
+def test_stream_end_stops_when_task_reads_nothing():
+    source = aiotask.StreamInput(4)
+    got = []
+
+    def fun(src):
+        while True:
+            got.append(src.any())
+            yield 0
+
+    task = cotask.Task(fun, name="Stream", priority=1, shares=source)
+    reader = FakeReader([b"ab"])
+    asyncio.run(asyncio.wait_for(aiotask._streamed(task, reader, source), 2))
+    assert got == [2, 2]
+
+
+def test_reader_wraps_only_raw_streams(monkeypatch):
+    class Wrapped:
+        def __init__(self, stream):
+            self.stream = stream
+
+    monkeypatch.setattr(aiotask.asyncio, "StreamReader", Wrapped)
+    uart = object()
+    reader = aiotask._reader(uart)
+    assert isinstance(reader, Wrapped) and reader.stream is uart
+    assert aiotask._reader(reader) is reader
+
+
+class FakeWDT:
+    def __init__(self):
+        self.feeds = 0
+
+    def feed(self):
+        self.feeds += 1
+
+
+def _run_critical(budget, spin_us):
+    """!
+    Runs one critical periodic task under the adapter for a short while.
+    @return The number of times the watchdog was fed
+    """
+    def fun():
+        while True:
+            end = utime.ticks_add(utime.ticks_us(), spin_us)
+            while utime.ticks_diff(end, utime.ticks_us()) > 0:
+                pass
+            yield 0
+
+    task_list = cotask.TaskList()
+    task_list.append(cotask.Task(fun, name="Crit", priority=1, period=5,
+                                 budget=budget, critical=True))
+    wdt = FakeWDT()
+    task_list.set_watchdog(wdt)
+    try:
+        asyncio.run(asyncio.wait_for(aiotask._main(task_list, {}), 0.2))
+    except asyncio.TimeoutError:
+        pass
+    return wdt.feeds
+
+
+def test_watchdog_fed_while_critical_tasks_keep_up():
+    assert _run_critical(budget=3, spin_us=100) > 0
+
+
+def test_watchdog_withheld_when_critical_task_overruns():
+    assert _run_critical(budget=1, spin_us=2000) == 0
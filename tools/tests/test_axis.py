@@ -0,0 +1,145 @@
+"""!
+@file tools/tests/test_axis.py
+Drives a simulated motor axis towards its soft limits and checks that the
+envelope in Axis brakes it in time and holds it there.
+"""
+import pytest
+
+import axis
+import settings
+import task_share
+import utime
+
+## Period of the axis task in ms
+DT = 10
+## Acceleration in degrees per second squared for each percent of duty cycle
+GAIN = 20
+## Viscous drag, per second
+DRAG = 2
+
+
+class FakeEncoder:
+    """!
+    An encoder whose position in counts is set by the simulation.
+    """
+
+    def __init__(self, deg):
+        self.pos = deg * settings.deg_fac
+        self.count = int(self.pos)
+        self._delta = 0
+
+    def read(self):
+        count = int(self.pos)
+        self._delta = count - self.count
+        self.count = count
+        return count
+
+    def delta(self):
+        return self._delta
+
+    def zero(self):
+        self.pos = 0.0
+        self.count = 0
+        self._delta = 0
+
+
+class FakeDriver:
+    def __init__(self):
+        self.duty = 0
+
+    def set_duty_cycle(self, duty):
+        self.duty = duty
+
+
+class Rig:
+    """!
+    A yaw axis on a motor with inertia and drag, run on a simulated clock.
+    """
+
+    def __init__(self, monkeypatch, start):
+        self.now = 0
+        monkeypatch.setattr(utime, "ticks_ms", lambda: self.now)
+        self.encoder = FakeEncoder(start)
+        self.driver = FakeDriver()
+        self.mode = task_share.Share('l', name="Mode")
+        self.control = task_share.Share('f', name="Control")
+        self.axis = axis.Axis(
+            "Yaw", self.driver, self.mode, self.control, encoder=self.encoder,
+            scale=settings.deg_fac,
+            gains=(settings.YAW_P, settings.YAW_I, settings.YAW_D),
+            vel_gains=(settings.YAW_V_P, settings.YAW_V_I, settings.YAW_V_D),
+            limits=(settings.YAW_LIMIT_MIN, settings.YAW_LIMIT_MAX),
+            brake=(settings.YAW_DECEL, settings.YAW_BRAKE))
+        self.axis.homed = True
+        self.vel = 0.0
+
+    def step(self):
+        """!
+        Runs the axis for one period and moves the motor.
+        @return The position in degrees and the duty cycle set
+        """
+        self.now += DT
+        self.axis.update()
+        duty = max(-100, min(100, self.driver.duty))
+        self.vel += (GAIN * duty - DRAG * self.vel) * DT / 1000
+        self.encoder.pos += self.vel * DT / 1000 * settings.deg_fac
+        return self.encoder.pos / settings.deg_fac, duty
+
+    def drive(self, mode, value, periods):
+        self.mode.put(mode)
+        self.control.put(value)
+        return [self.step() for _ in range(periods)]
+
+
+def _limits():
+    fparams = settings.fparams
+    return fparams[settings.YAW_LIMIT_MIN], fparams[settings.YAW_LIMIT_MAX]
+
+
+@pytest.mark.parametrize("duty", [20, 50, 100])
+@pytest.mark.parametrize("towards", [1, -1])
+def test_brakes_before_limit(monkeypatch, duty, towards):
+    low, high = _limits()
+    brake = settings.fparams[settings.YAW_BRAKE]
+    rig = Rig(monkeypatch, (low + high) / 2)
+    run = rig.drive(axis.RAW_PWM, towards * duty, 300)
+
+    positions = [pos for pos, _ in run]
+    assert low < min(positions) and max(positions) < high
+    # It brakes while still short of the limit, then comes to rest near it
+    braking = [pos for pos, d in run if d == -towards * brake]
+    assert braking
+    assert all(low < pos < high for pos in braking)
+    rest = positions[-1]
+    assert abs(rest - (high if towards > 0 else low)) < 30
+    assert rig.axis.limited > 0
+
+
+def test_held_until_asked_to_move_away(monkeypatch):
+    low, high = _limits()
+    rig = Rig(monkeypatch, high - 40)
+    rig.drive(axis.RAW_PWM, 50, 200)
+    assert rig.axis._held == 1
+
+    # Still asking to go out, even once it has come to rest, it isn't driven
+    # outwards
+    run = rig.drive(axis.RAW_PWM, 50, 300)
+    assert all(d <= 0 for _, d in run)
+    assert max(pos for pos, _ in run) < high
+    assert rig.axis._held == 1
+
+    # Asked to move away, it is let go at once
+    pos, duty = rig.drive(axis.RAW_PWM, -30, 1)[0]
+    assert duty == -30
+    assert rig.axis._held == 0
+    run = rig.drive(axis.RAW_PWM, -30, 50)
+    assert run[-1][0] < high - 40
+
+
+def test_home_ignores_limits(monkeypatch):
+    low, high = _limits()
+    rig = Rig(monkeypatch, high - 5)
+    run = rig.drive(axis.HOME, 50, 100)
+    assert max(pos for pos, _ in run) > high
+    assert rig.axis.limited == 0
+    assert rig.axis._held == 0
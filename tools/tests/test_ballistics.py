@@ -0,0 +1,68 @@
+"""!
+@file tools/tests/test_ballistics.py
+Checks the table lookups in ballistics.py, inside the tables and off their
+edges.
+"""
+import array
+
+import pytest
+
+import ballistics
+from ballistics import Ballistics, _fraction, _index
+
+AXIS = array.array('f', (1.0, 2.0, 4.0, 8.0))
+
+
+@pytest.mark.parametrize("x,i", [(0.0, 0), (1.0, 0), (1.5, 0), (2.0, 0),
+                                 (2.5, 1), (4.0, 1), (5.0, 2), (8.0, 2),
+                                 (100.0, 2)])
+def test_index(x, i):
+    assert _index(AXIS, x) == i
+
+
+@pytest.mark.parametrize("x,f", [(0.0, 0.0), (1.0, 0.0), (1.25, 0.25),
+                                 (2.0, 1.0), (3.0, 0.5), (6.0, 0.5),
+                                 (8.0, 1.0), (100.0, 1.0)])
+def test_fraction_clamped(x, f):
+    assert _fraction(AXIS, _index(AXIS, x), x) == pytest.approx(f)
+
+
+def _table():
+    return Ballistics((1.0, 3.0), (-4.0, 0.0, 4.0),
+                      ((-0.1, 0.0, 0.1), (0.1, 0.2, 0.3)), (0.1, 0.5))
+
+
+def test_differential_interpolates():
+    table = _table()
+    assert table.differential(1.0, 0.0) == pytest.approx(0.0)
+    assert table.differential(2.0, 0.0) == pytest.approx(0.1)
+    assert table.differential(2.0, 2.0) == pytest.approx(0.15)
+    assert table.differential(3.0, -4.0) == pytest.approx(0.1)
+
+
+def test_differential_clamped_at_edges():
+    table = _table()
+    assert table.differential(0.5, -10.0) == pytest.approx(-0.1)
+    assert table.differential(10.0, 10.0) == pytest.approx(0.3)
+    assert table.differential(10.0, -2.0) == pytest.approx(0.15)
+
+
+def test_time_of_flight():
+    table = _table()
+    assert table.time_of_flight(2.0) == pytest.approx(0.3)
+    assert table.time_of_flight(0.1) == pytest.approx(0.1)
+    assert table.time_of_flight(9.0) == pytest.approx(0.5)
+
+
+def test_defaults_are_neutral(tmp_path):
+    table = ballistics.load(str(tmp_path / "missing.json"))
+    for rng in (0.5, 1.0, 2.5, 3.0, 6.0, 10.0):
+        for error in (-20.0, -3.0, 0.0, 5.0, 20.0):
+            assert table.differential(rng, error) == 0.0
+
+
+def test_bad_tables():
+    with pytest.raises(ValueError):
+        Ballistics((1.0,), (0.0, 1.0), ((0.0, 0.0),), (0.1,))
+    with pytest.raises(ValueError):
+        Ballistics((1.0, 2.0), (0.0, 1.0), ((0.0, 0.0), (0.0,)), (0.1, 0.2))
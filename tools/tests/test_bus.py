@@ -0,0 +1,99 @@
+"""!
+@file tools/tests/test_bus.py
+Feeds the board's BusLink frames built by the host's protocol module, and
+checks that the two ends lay out messages the same way.
+"""
+import math
+import struct
+
+import pyb
+import pytest
+
+import bus
+from bus import BusLink
+from turret_bus import protocol
+
+ADDRESS = 3
+
+
+@pytest.fixture
+def link():
+    return BusLink(pyb.UART(1, 115200), ADDRESS)
+
+
+def _receive_all(link):
+    """!
+    Calls @c receive() until it finds nothing more.
+    @return A list of (kind, payload bytes) pairs
+    """
+    out = []
+    while True:
+        kind = link.receive()
+        if kind is None:
+            return out
+        out.append((kind, bytes(link.payload)))
+
+
+def test_layouts_agree():
+    for name in ("SYNC", "HOST", "BROADCAST", "MAX_PAYLOAD", "OVERHEAD",
+                 "MSG_POLL", "MSG_STATUS", "MSG_ASSIGN", "MSG_SECTOR",
+                 "FMT_STATUS", "FMT_ASSIGN", "FMT_SECTOR"):
+        assert getattr(bus, name) == getattr(protocol, name), name
+    data = bytes(range(40))
+    assert bus.crc8(data, 3, 29) == protocol.crc8(data[3:29])
+
+
+def test_split_frames(link):
+    data = protocol.sector(ADDRESS, -30.0, 45.5) + protocol.poll(ADDRESS)
+    got = []
+    for i in range(len(data)):
+        link.uart.inject(data[i:i + 1])
+        got += _receive_all(link)
+    assert got == [(bus.MSG_SECTOR, struct.pack(bus.FMT_SECTOR, -30.0, 45.5)),
+                   (bus.MSG_POLL, b"")]
+    assert struct.unpack(bus.FMT_SECTOR, got[0][1]) == (-30.0, 45.5)
+    assert link.errors == 0
+
+
+def test_corrupted_frame_is_dropped(link):
+    bad = bytearray(protocol.assign(ADDRESS, True, 12.5))
+    bad[6] ^= 0x10
+    link.uart.inject(b"\x00\x42" + bytes(bad) + protocol.assign(ADDRESS, False))
+    got = _receive_all(link)
+    assert link.errors == 1
+    assert len(got) == 1
+    engage, aim = struct.unpack(bus.FMT_ASSIGN, got[0][1])
+    assert got[0][0] == bus.MSG_ASSIGN and engage == 0 and math.isnan(aim)
+
+
+def test_overlong_length_is_dropped(link):
+    frame = bytearray(protocol.poll(ADDRESS))
+    frame[4] = bus.MAX_PAYLOAD + 1
+    link.uart.inject(bytes(frame[:5]) + protocol.poll(ADDRESS))
+    assert _receive_all(link) == [(bus.MSG_POLL, b"")]
+    assert link.errors == 1
+
+
+def test_other_addresses_are_ignored(link):
+    link.uart.inject(protocol.poll(ADDRESS + 1)
+                     + protocol.assign(ADDRESS - 1, True, 10.0)
+                     + protocol.sector(protocol.BROADCAST, -90.0, 90.0)
+                     + protocol.poll(ADDRESS))
+    got = _receive_all(link)
+    assert [kind for kind, _ in got] == [bus.MSG_SECTOR, bus.MSG_POLL]
+    assert link.errors == 0
+
+
+def test_status_reaches_host(link):
+    link.send(bus.MSG_STATUS, bus.FMT_STATUS, 6, -12.5, 1, 20.25, 7)
+    parser = protocol.Parser()
+    [(dst, src, kind, payload)] = parser.feed(bytes(link.uart.written))
+    assert (dst, src, kind) == (protocol.HOST, ADDRESS, protocol.MSG_STATUS)
+    assert protocol.status(payload) == {"state": 6, "yaw": -12.5, "seen": True,
+                                        "bearing": 20.25, "shots": 7}
+    assert parser.errors == 0
+
+
+def test_bad_address():
+    with pytest.raises(ValueError):
+        BusLink(pyb.UART(1, 115200), bus.BROADCAST)
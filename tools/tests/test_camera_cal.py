@@ -0,0 +1,81 @@
+"""!
+@file tools/tests/test_camera_cal.py
+Fits the camera calibration to a synthetic sweep with a known field of view,
+boresight and lens distortion, and checks that the board's @c CameraCal turns
+the sweep's pixels back into the angles to the target.
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+import camera_cal
+from conftest import ROOT
+
+# The tool has the same module name as the board's camera_cal.py
+_spec = importlib.util.spec_from_file_location(
+    "camera_cal_tool", os.path.join(ROOT, "tools", "camera_cal.py"))
+tool = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tool)
+
+FOV = 55.0
+BORESIGHT = -1.75
+## The room angle of the target, in degrees of yaw
+TARGET = 196.0
+
+
+def _sweep(distortion):
+    """!
+    Works out the turret angles at which a fixed target appears at each
+    pixel position, for a camera with the known calibration.
+    @param distortion A function giving the lens's error in degrees by pixel
+    @return The turret angles and the pixel positions
+    """
+    pixels = np.linspace(-12.0, 12.0, 13)
+    off = (BORESIGHT - pixels) * FOV / camera_cal.IMG_WIDTH + distortion(pixels)
+    return TARGET - off, pixels
+
+
+def _check_inverse(fov, boresight, correction, angles, pixels, tol):
+    cal = camera_cal.CameraCal(list(correction))
+    for a, x in zip(angles, pixels):
+        assert a + cal.angle(x, fov, boresight) == pytest.approx(TARGET, abs=tol)
+
+
+def test_fit_without_distortion():
+    angles, pixels = _sweep(lambda x: 0.0 * x)
+    fov, boresight, correction = tool.fit(angles, pixels, TARGET)
+    assert fov == pytest.approx(FOV)
+    assert boresight == pytest.approx(BORESIGHT)
+    assert np.abs(correction).max() < 1e-9
+    _check_inverse(fov, boresight, correction, angles, pixels, 1e-6)
+
+
+def test_fit_with_distortion():
+    # Barrel distortion, about half a degree at the edges of the sweep, with
+    # no part which a change of field of view or boresight could stand for
+    def distortion(x):
+        return 0.004 * (x ** 2 - 56.0)
+
+    angles, pixels = _sweep(distortion)
+    fov, boresight, correction = tool.fit(angles, pixels, TARGET)
+    assert fov == pytest.approx(FOV)
+    assert boresight == pytest.approx(BORESIGHT)
+    # The table takes up the distortion over the pixels swept
+    table = np.arange(camera_cal.IMG_WIDTH + 1) - camera_cal.IMG_WIDTH // 2
+    inside = np.abs(table) <= 12
+    assert correction[inside] == pytest.approx(distortion(table[inside]), abs=0.01)
+    _check_inverse(fov, boresight, correction, angles, pixels, 0.01)
+
+
+def test_fit_keeps_boresight_without_aim():
+    angles, pixels = _sweep(lambda x: 0.0 * x)
+    fov, boresight, _ = tool.fit(angles, pixels, boresight=3.0)
+    assert boresight == 3.0
+    assert fov == pytest.approx(FOV)
+
+
+def test_fit_needs_three_points():
+    with pytest.raises(ValueError):
+        tool.fit(np.array([1.0, 2.0]), np.array([0.0, 1.0]))
@@ -0,0 +1,68 @@
+"""!
+@file tools/tests/test_camera_task.py
+Runs the camera task on frames injected into a simulated UART and checks that
+pixel tracking keeps within the field of fire set by the coordinator.
+"""
+import pyb
+import pytest
+
+import cotasks
+import settings
+import task_share
+
+
+class FakeEncoder:
+    """!
+    A yaw encoder standing still at a position.
+    """
+
+    def __init__(self, deg):
+        self.count = int(deg * settings.deg_fac)
+
+    def position_at(self, ticks):
+        return self.count
+
+
+@pytest.fixture
+def pixel_tracking():
+    store = settings.store
+    old = store.get("track_mode")
+    store.set("track_mode", cotasks.TRACK_PIXEL)
+    yield
+    store.set("track_mode", old)
+
+
+def _actuation(yaw, x):
+    """!
+    Gives the yaw actuation the camera task asks for with the turret at a
+    yaw angle and the target at a pixel column.
+    """
+    uart = pyb.UART(6, 115200)
+    shares = [uart] + [task_share.Share('f', name=n) for n in (
+        "yaw_control", "yaw_mode", "cam_flag", "errory", "fire", "backlog",
+        "drops", "tof")]
+    shares += [FakeEncoder(yaw), task_share.Share('f', name="pitch"),
+               task_share.Share('f', name="sighting")]
+    shares[3].put(1)
+    task = cotasks.camera(tuple(shares))
+    next(task)
+    uart.inject("{:.1f},0.0\n".format(x).encode())
+    next(task)
+    assert shares[2].get() == cotasks.YAW_RAW_PWM
+    return shares[1].get()
+
+
+@pytest.mark.usefixtures("pixel_tracking")
+def test_pixel_tracking_stays_in_field_of_fire():
+    low = settings.fparams[settings.YAW_MIN]
+    high = settings.fparams[settings.YAW_MAX]
+    # Inside the field of fire a target to either side is followed; positive
+    # actuation turns towards higher yaw angles
+    assert _actuation((low + high) / 2, 20.0) > 0
+    assert _actuation((low + high) / 2, -20.0) < 0
+
+    # At each edge the turret isn't driven further out, only back in
+    assert _actuation(high + 1, 20.0) == 0
+    assert _actuation(high + 1, -20.0) < 0
+    assert _actuation(low - 1, -20.0) == 0
+    assert _actuation(low - 1, 20.0) > 0
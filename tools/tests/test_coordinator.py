@@ -0,0 +1,125 @@
+"""!
+@file tools/tests/test_coordinator.py
+Checks how the bus coordinator carves out fields of fire, places targets from
+the turrets' lines of sight and hands each target to one turret.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from turret_bus.coordinator import Coordinator, Target, Turret, sectors
+
+
+def _status(yaw=0.0, bearing=0.0, seen=True):
+    return {"state": 5, "yaw": yaw, "seen": seen, "bearing": bearing, "shots": 0}
+
+
+def _pair():
+    """!
+    Two turrets 4 m apart: A at the origin with yaw 0 along +x, and B with
+    yaw 0 along +y.
+    """
+    a = Turret(1, "bus", 0.0, 0.0, heading=0.0, yaw_min=0.0, yaw_max=360.0)
+    b = Turret(2, "bus", 4.0, 0.0, heading=90.0, yaw_min=0.0, yaw_max=360.0)
+    return a, b
+
+
+def test_sectors_keep_clear_of_other_turrets():
+    a, b = _pair()
+    # A sees B at yaw 0 and B sees A at yaw 90; each keeps the largest range
+    # of its reach which stays 10 degrees clear of the other
+    assert sectors([a, b]) == {1: (10.0, 350.0), 2: (100.0, 360.0)}
+
+
+def test_sectors_within_reach():
+    a, b = _pair()
+    c = Turret(3, "bus", 2.0, 4.0, heading=270.0, yaw_min=20.0, yaw_max=250.0)
+    out = sectors([a, b, c], margin=15.0)
+    for t in (a, b, c):
+        low, high = out[t.address]
+        assert t.yaw_min <= low < high <= t.yaw_max
+        for u in (a, b, c):
+            if u is t:
+                continue
+            yaw = t.yaw_to((u.x, u.y))
+            for y in (yaw - 360.0, yaw, yaw + 360.0):
+                assert y <= low - 15.0 + 1e-9 or y >= high + 15.0 - 1e-9
+
+def test_one_ray_places_target_at_range():
+    g = Target(0, (0.0, 0.0))
+    d = np.array([math.cos(math.radians(30)), math.sin(math.radians(30))])
+    g.add_ray(1, np.array([1.0, 1.0]), d, 0.0, 3.0)
+    assert g.point == pytest.approx(np.array([1.0, 1.0]) + 3.0 * d)
+
+
+def _sight(coordinator, turret, point, now=0.0):
+    turret.status = _status(bearing=turret.yaw_to(point))
+    coordinator._locate(turret, now)
+
+
+def test_two_rays_cross_at_target():
+    a, b = _pair()
+    c = Coordinator([a, b], {}, target_range=1.0)
+    _sight(c, a, (2.0, 3.0))
+    assert len(c.targets) == 1
+    assert c.targets[0].point == pytest.approx(
+        np.array([2.0, 3.0]) / math.hypot(2.0, 3.0))
+
+    _sight(c, b, (2.0, 3.0))
+    assert len(c.targets) == 1
+    assert sorted(c.targets[0].rays) == [1, 2]
+    assert c.targets[0].point == pytest.approx([2.0, 3.0])
+
+
+def test_rays_which_dont_cross_are_two_targets():
+    a, b = _pair()
+    c = Coordinator([a, b], {})
+    _sight(c, a, (2.0, 3.0))
+    # B looks away, along +x, which passes behind A's line of sight
+    _sight(c, b, (8.0, 0.0))
+    assert len(c.targets) == 2
+
+
+def test_each_target_to_one_turret():
+    a, b = _pair()
+    c = Coordinator([a, b], {})
+    target = Target(0, (2.0, 3.0))
+    c.targets = [target]
+    # A has 6 degrees to turn and B 46, so A gets the target
+    a.status = _status(yaw=a.yaw_to(target.point) - 6.0)
+    b.status = _status(yaw=b.yaw_to(target.point) + 46.0)
+    c.assign()
+    assert a.target is target and b.target is None
+
+    # A second target goes to the turret left without one
+    other = Target(1, (6.0, 3.0))
+    c.targets.append(other)
+    c.assign()
+    assert a.target is target and b.target is other
+
+
+def test_assignment_sticks():
+    a, b = _pair()
+    c = Coordinator([a, b], {}, stick=20.0)
+    target = Target(0, (2.0, 3.0))
+    c.targets = [target]
+    a.status = _status(yaw=a.yaw_to(target.point) - 15.0)
+    b.status = _status(yaw=b.yaw_to(target.point) - 5.0)
+    a.target = target
+    # B would turn less, but not by more than the stickiness
+    c.assign()
+    assert a.target is target and b.target is None
+
+
+def test_target_outside_sector_not_given():
+    a, b = _pair()
+    c = Coordinator([a, b], {})
+    target = Target(0, (2.0, 3.0))
+    c.targets = [target]
+    a.status = _status()
+    b.status = _status()
+    a.sector = (100.0, 200.0)
+    b.sector = (0.0, 10.0)
+    c.assign()
+    assert a.target is None and b.target is None
@@ -0,0 +1,156 @@
+"""!
+@file tools/tests/test_encoder_reader.py
+Runs the EncoderReader against the simulated timer and checks its count
+against a reference kept as an unbounded integer, across the counter's wraps,
+and its history of reads on a simulated clock.
+"""
+import random
+
+import pytest
+
+import encoder_reader
+import resources
+import utime
+from encoder_reader import EncoderReader, ENC_MAX, ENC_MAX_32
+
+## Where @c utime.ticks_us() wraps
+PERIOD = 1 << 30
+
+
+@pytest.fixture(autouse=True)
+def _release():
+    yield
+    resources.release("EncoderReader")
+
+
+def _run(reader, steps):
+    """!
+    Moves the simulated counter by each step, reading after every move, and
+    checks the reader's count against the true position.
+    """
+    true = 0
+    for step in steps:
+        true += step
+        reader.tim.counter(true)
+        assert reader.read() == true
+        assert reader.delta() == step
+
+
+@pytest.mark.parametrize("timer,bits,mask", [(4, 16, ENC_MAX), (2, 32, ENC_MAX_32),
+                                             (5, 32, ENC_MAX_32)])
+@pytest.mark.parametrize("direction", [1, -1])
+def test_wraps_near_half_range(timer, bits, mask, direction):
+    reader = EncoderReader("B6", "B7", timer, bits=bits)
+    half = (mask + 1) // 2
+    # The largest moves which can be told apart, then ones just inside them
+    steps = [direction * (half - 1), direction * (half - 1), direction * (half - 2),
+             direction * (half - 100), 1, -1] * 6
+    _run(reader, steps)
+    assert reader.count == sum(steps)
+
+
+@pytest.mark.parametrize("timer,bits,mask", [(4, 16, ENC_MAX), (2, 32, ENC_MAX_32)])
+def test_random_walk(timer, bits, mask):
+    reader = EncoderReader("B6", "B7", timer, bits=bits)
+    rng = random.Random(bits)
+    limit = (mask + 1) // 2 - 1
+    steps = []
+    for _ in range(2000):
+        # Mostly large moves so the counter wraps often, some small ones
+        if rng.random() < 0.5:
+            steps.append(rng.randint(-limit, limit))
+        else:
+            steps.append(rng.randint(-50, 50))
+    _run(reader, steps)
+
+
+def test_half_range_is_ambiguous():
+    """! A move of exactly half the range reads as the backward move. """
+    assert encoder_reader._extend(0x8000, 0, ENC_MAX) == -0x8000
+    assert encoder_reader._extend(0x7FFF, 0, ENC_MAX) == 0x7FFF
+    assert encoder_reader._extend(0, 0x3FFFFFFF, ENC_MAX_32) == 1
+
+
+def test_start_away_from_zero():
+    # The reader shares a timer which was already counting
+    tim = resources.timer(4, "EncoderReader", prescaler=0, period=ENC_MAX)
+    tim.counter(ENC_MAX - 3)
+    reader = EncoderReader("B6", "B7", 4)
+    assert reader.read() == 0
+    reader.tim.counter(5)
+    assert reader.read() == 9
+
+
+def test_bad_timer_width():
+    with pytest.raises(ValueError):
+        EncoderReader("B6", "B7", 4, bits=32)
+
+
+class Clock:
+    """!
+    Stands in for @c utime.ticks_us(), giving the time it is set to.
+    """
+
+    def __init__(self, monkeypatch, now=0):
+        self.now = now
+        monkeypatch.setattr(utime, "ticks_us", lambda: self.now)
+
+
+def _history(reader, clock, reads):
+    """!
+    Reads the encoder at each (time, position) in turn.
+    """
+    for t, pos in reads:
+        clock.now = t % PERIOD
+        reader.tim.counter(pos)
+        reader.read()
+
+
+def test_position_at_interpolates(monkeypatch):
+    clock = Clock(monkeypatch)
+    reader = EncoderReader("B6", "B7", 4)
+    assert reader.position_at(0) == 0
+    _history(reader, clock, [(1000, 0), (2000, 100), (3000, 300)])
+    assert reader.position_at(1500) == pytest.approx(50)
+    assert reader.position_at(2000) == 100
+    assert reader.position_at(2750) == pytest.approx(250)
+
+
+def test_position_at_clamps_to_history(monkeypatch):
+    clock = Clock(monkeypatch)
+    reader = EncoderReader("B6", "B7", 4)
+    _history(reader, clock, [(1000, 10), (2000, 20)])
+    assert reader.position_at(500) == 10
+    assert reader.position_at(5000) == 20
+
+
+def test_position_at_after_ring_wraps(monkeypatch):
+    clock = Clock(monkeypatch)
+    reader = EncoderReader("B6", "B7", 4, history=4)
+    _history(reader, clock, [(1000 * i, 10 * i) for i in range(1, 11)])
+    # Only the reads at 7000 to 10000 are kept
+    assert reader.position_at(3000) == 70
+    assert reader.position_at(7500) == pytest.approx(75)
+    assert reader.position_at(9250) == pytest.approx(92.5)
+    assert reader.position_at(11000) == 100
+
+
+def test_position_at_across_ticks_wrap(monkeypatch):
+    clock = Clock(monkeypatch)
+    reader = EncoderReader("B6", "B7", 4)
+    start = PERIOD - 1500
+    _history(reader, clock, [(start, 0), (start + 1000, 40), (start + 2000, 80)])
+    assert reader.position_at((start + 1500) % PERIOD) == pytest.approx(60)
+    assert reader.position_at(start + 500) == pytest.approx(20)
+
+
+def test_zero_forgets_history(monkeypatch):
+    clock = Clock(monkeypatch)
+    reader = EncoderReader("B6", "B7", 4)
+    _history(reader, clock, [(1000, 500), (2000, 600)])
+    reader.zero()
+    assert reader.count == 0
+    assert reader.position_at(1500) == 0
+    _history(reader, clock, [(3000, 650), (4000, 700)])
+    assert reader.position_at(1500) == 50
+    assert reader.position_at(3500) == pytest.approx(75)
@@ -0,0 +1,82 @@
+"""!
+@file tools/tests/test_plan_phases.py
+Checks that TaskList.plan_phases() spreads periodic releases apart and that
+align() starts each schedule one period and phase from the given time.
+"""
+import pytest
+
+import cotask
+
+STEP = 250
+
+
+def _idle():
+    while True:
+        yield 0
+
+
+def _task_list(specs):
+    """!
+    Makes a task list from (period ms, budget ms, phase ms or None) tuples.
+    """
+    task_list = cotask.TaskList()
+    for n, (period, budget, phase) in enumerate(specs):
+        task_list.append(cotask.Task(_idle, name="T" + str(n), priority=1,
+                                     period=period, budget=budget, phase=phase))
+    return task_list
+
+
+def _occupancy(phases, hyper):
+    """!
+    Counts the tasks running in each slot of the hyperperiod.
+    @param phases Dictionary of phases in microseconds by task
+    @param hyper The hyperperiod in microseconds
+    """
+    busy = [0] * (hyper // STEP)
+    for task, phase in phases.items():
+        width = -(-task.budget // STEP)
+        for start in range(phase, hyper, task.period):
+            for j in range(width):
+                busy[(start // STEP + j) % len(busy)] += 1
+    return busy
+
+
+@pytest.mark.parametrize("specs", [
+    [(10, 1, None), (10, 1, None), (10, 1, None), (10, 1, None)],
+    [(10, 2, None), (20, 3, None), (20, 3, None), (40, 5, None)],
+    [(5, 1, None), (10, 2, None), (20, 4, None), (20, 1, None)],
+    [(10, 2, 0), (20, 4, None), (20, 1, 5), (40, 3, None)],
+])
+def test_releases_never_share_a_slot(specs):
+    task_list = _task_list(specs)
+    phases = task_list.plan_phases(step=STEP)
+    hyper = max(task.period for task in phases)
+    assert max(_occupancy(phases, hyper)) == 1
+    for task in phases:
+        fixed = specs[int(task.name[1:])][2]
+        if fixed is None:
+            assert 0 <= task.phase < task.period
+        else:
+            assert task.phase == int(fixed * 1000)
+
+def test_fixed_phases_kept():
+    task_list = _task_list([(10, 2, 3), (10, 2, None)])
+    phases = task_list.plan_phases(step=STEP)
+    fixed, planned = sorted(phases, key=lambda t: t.name)
+    assert phases[fixed] == 3000
+    assert phases[planned] not in range(2000, 5000)
+
+
+def test_unplannable_tasks_skipped():
+    task_list = _task_list([(10, 2, None)])
+    task_list.append(cotask.Task(_idle, name="Trig", priority=2))
+    assert [t.name for t in task_list.plan_phases()] == ["T0"]
+
+
+@pytest.mark.parametrize("now", [0, 1000, (1 << 30) - 3000])
+def test_align(now):
+    task_list = _task_list([(10, 1, 0), (20, 2, 2.5), (40, 1, 7)])
+    task_list.align(now)
+    due = sorted(t._next_run for pri in task_list.pri_list for t in pri[2:])
+    expected = sorted((now + d) % (1 << 30) for d in (10000, 22500, 47000))
+    assert due == expected
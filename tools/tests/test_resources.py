@@ -0,0 +1,50 @@
+"""!
+@file tools/tests/test_resources.py
+Checks that shared timers and UARTs stay set up until their last user
+releases them, and that conflicting settings are refused.
+"""
+import pytest
+
+import resources
+
+USERS = ("A", "B")
+
+
+@pytest.fixture(autouse=True)
+def _release():
+    yield
+    for user in USERS:
+        resources.release(user)
+
+
+def test_shared_timer_kept_until_last_release():
+    tim = resources.timer(8, "A", freq=50)
+    assert resources.timer(8, "B", freq=50) is tim
+    resources.release("A")
+    assert 8 in resources._timers
+    resources.release("B")
+    assert 8 not in resources._timers
+
+
+def test_timer_with_other_settings_refused():
+    resources.timer(8, "A", freq=50)
+    with pytest.raises(ValueError):
+        resources.timer(8, "B", freq=200)
+
+
+def test_shared_uart_kept_until_last_release():
+    port = resources.uart(6, "A", 115200)
+    assert resources.uart(6, "B", 115200) is port
+    resources.release("A")
+    assert resources._uarts[6][0] is port
+    assert "B" in resources.report()
+    resources.release("B")
+    assert 6 not in resources._uarts
+
+
+def test_uart_with_other_baud_refused():
+    resources.uart(6, "A", 115200)
+    with pytest.raises(ValueError):
+        resources.uart(6, "B", 9600)
+    resources.release("A")
+    assert 6 not in resources._uarts
@@ -0,0 +1,100 @@
+"""!
+@file tools/tests/test_schedulability.py
+Checks the response time analysis and the priority search against small task
+sets worked out by hand. Times are in milliseconds.
+"""
+import math
+
+import pytest
+
+from schedulability import (Task, audsley, feasible, headroom, rate_monotonic,
+                            response_time)
+
+
+def _ranked(*tasks):
+    """!
+    Gives the tasks priorities in the order passed, highest first.
+    """
+    return {t: len(tasks) - i for i, t in enumerate(tasks)}
+
+
+def test_later_run_is_the_worst():
+    # Davis, Burns, Bril and Lukkien's example. C's first run is held up by
+    # one run each of A and B and ends at 3; but the level busy period lasts
+    # until 7, and C's second run, due at 3.5, waits until 6 behind a second
+    # run of A and B and the first of C itself, ending 3.5 after it fell due
+    a = Task("A", 0, 2.5, 1)
+    b = Task("B", 0, 3.5, 1)
+    c = Task("C", 0, 3.5, 1)
+    tasks = [a, b, c]
+    pri = _ranked(a, b, c)
+    assert response_time(c, tasks, pri) == pytest.approx(3.5)
+    assert feasible(tasks, pri)
+
+
+def test_blocking_counts():
+    # A waits for the whole of B's run, which had just started: 2.5 + 1
+    a = Task("A", 0, 2, 1)
+    b = Task("B", 0, 10, 2.5)
+    assert response_time(a, [a, b], _ranked(a, b)) == pytest.approx(3.5)
+
+
+def test_infeasible():
+    # A can't fit in its period after B's run under either order, even
+    # though the CPU is only 75 % busy
+    a = Task("A", 0, 2, 1)
+    b = Task("B", 0, 10, 2.5)
+    tasks = [a, b]
+    assert not feasible(tasks, rate_monotonic(tasks))
+    assert audsley(tasks) is None
+    assert headroom(tasks, rate_monotonic(tasks)) == 0.0
+
+
+def test_overloaded():
+    # B's busy period never ends, and A waits behind B's run of 3
+    a = Task("A", 0, 5, 3)
+    b = Task("B", 0, 5, 3)
+    pri = _ranked(a, b)
+    assert response_time(b, [a, b], pri) == math.inf
+    assert response_time(a, [a, b], pri) == pytest.approx(6)
+    assert not feasible([a, b], pri)
+
+
+def test_audsley_finds_what_rate_monotonic_misses():
+    # Rate-monotonic order puts C last, where a run of A, B and A again
+    # starts first: it ends at 5.5, after its period of 4. With B last C only
+    # waits for B's run and one of A, ending at 3.5; B ends by 2.5 and A,
+    # blocked by B, at 2
+    a = Task("A", 0, 2, 1)
+    b = Task("B", 0, 3, 1)
+    c = Task("C", 0, 4, 0.5)
+    tasks = [a, b, c]
+    rm = rate_monotonic(tasks)
+    assert (rm[a], rm[b], rm[c]) == (3, 2, 1)
+    assert response_time(c, tasks, rm) == pytest.approx(5.5)
+    assert not feasible(tasks, rm)
+
+    pri = audsley(tasks)
+    assert (pri[a], pri[b], pri[c]) == (3, 1, 2)
+    assert response_time(a, tasks, pri) == pytest.approx(2)
+    assert response_time(b, tasks, pri) == pytest.approx(2.5)
+    assert response_time(c, tasks, pri) == pytest.approx(3.5)
+    assert feasible(tasks, pri)
+
+
+def test_sporadic_task_only_blocks():
+    a = Task("A", 0, 10, 2)
+    cam = Task("Camera", 0, None, 3)
+    pri = rate_monotonic([a, cam])
+    assert pri[cam] == 0
+    assert response_time(a, [a, cam], pri) == pytest.approx(5)
+
+
+def test_headroom():
+    # Alone, a run of 2 in a period of 10 can grow five times
+    a = Task("A", 0, 10, 2)
+    assert headroom([a], {a: 1}) == pytest.approx(5, rel=1e-6)
+
+    # A waits for B's run of 4, so A's 6 can only grow to 10
+    b = Task("B", 0, 20, 4)
+    assert headroom([a, b], _ranked(a, b)) == pytest.approx(10 / 6, rel=1e-6)
@@ -0,0 +1,79 @@
+"""!
+@file tools/tests/test_sim_board.py
+Checks that the simulated board runs the scheduler's idle garbage collection,
+the program's real start-up and the benchmarks.
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import gc
+import micropython  # noqa: F401, puts mem_free() and mem_alloc() on gc
+import utime
+
+import cotask
+from conftest import ROOT
+
+## The size of the simulated heap in @c sim_board/gc.py
+HEAP_SIZE = 96 * 1024
+SIM_PATH = os.pathsep.join((os.path.join(ROOT, "tools", "sim_board"),
+                            os.path.join(ROOT, "src")))
+
+
+def test_gc_counts_allocations():
+    gc.collect()
+    assert gc.mem_alloc() == 0
+    held = [bytearray(64) for _ in range(200)]
+    assert gc.mem_alloc() > 0
+    assert gc.mem_free() < HEAP_SIZE
+    del held
+    gc.collect()
+    assert gc.mem_alloc() == 0
+
+
+def test_idle_collection():
+    def fun():
+        while True:
+            yield 0
+
+    task_list = cotask.TaskList()
+    task_list.append(cotask.Task(fun, name="Slow", priority=1, period=50,
+                                 profile=True))
+    # A threshold above the whole heap means the heap is always getting full
+    task_list.set_gc(HEAP_SIZE + 1, check_ms=0, first_guess_us=100)
+    task = task_list.pri_list[0][2]
+    end = utime.ticks_add(utime.ticks_ms(), 2000)
+    while task._runs < 3 and utime.ticks_diff(end, utime.ticks_ms()) > 0:
+        task_list.pri_sched()
+    assert task_list._gc_runs > 0
+    assert "Idle GC" in str(task_list)
+
+
+def test_main_starts():
+    env = dict(os.environ, PYTHONPATH=SIM_PATH)
+    proc = subprocess.Popen([sys.executable, "-u", os.path.join(ROOT, "src", "main.py")],
+                            cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True)
+    try:
+        for line in proc.stdout:
+            if line.startswith("SETUP COMPLETE"):
+                break
+        utime.sleep_ms(1000)
+        proc.send_signal(signal.SIGINT)
+        out, _ = proc.communicate(timeout=30)
+    finally:
+        proc.kill()
+    assert "Traceback" not in out
+    assert "Idle GC" in out
+    assert "TRACE END" in out
+
+
+def test_benchmarks_run(tmp_path):
+    out = tmp_path / "bench.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, "tools", "bench.py"), "sim",
+                    "-n", "20", "--out", str(out)], cwd=ROOT, check=True,
+                   capture_output=True, timeout=300)
+    results = json.loads(out.read_text())["results"]
+    assert results and not [name for name, r in results.items() if "error" in r]
@@ -0,0 +1,116 @@
+"""!
+@file tools/tests/test_tracebuf.py
+Checks the trace ring buffer, and that its dump becomes a Chrome Trace with
+@c tools/trace_export.py.
+"""
+import pytest
+
+import trace_export
+import tracebuf
+import utime
+from tracebuf import EV_END, EV_SHARE, EV_START, SRC_SHARE, TraceBuffer
+
+## Where @c utime.ticks_us() wraps
+PERIOD = 1 << 30
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """!
+    Makes @c utime.ticks_us() give the time in the returned list.
+    """
+    now = [0]
+    monkeypatch.setattr(utime, "ticks_us", lambda: now[0])
+    return now
+
+
+def test_size_rounded_up():
+    assert TraceBuffer(5)._mask == 7
+    assert TraceBuffer(8)._mask == 7
+
+
+def test_wrap_counts_lost(clock):
+    buf = TraceBuffer(8)
+    src = buf.register("Task")
+    for i in range(13):
+        clock[0] = 100 * i
+        buf.record(EV_START, src, i)
+    assert buf.lost == 5
+    # The oldest events are the ones overwritten
+    events = list(buf.events())
+    assert [e[0] for e in events] == [100 * i for i in range(5, 13)]
+    assert [e[3] for e in events] == [float(i) for i in range(5, 13)]
+
+
+def test_events_before_wrap(clock):
+    buf = TraceBuffer(8)
+    src = buf.register("Task")
+    for i in range(3):
+        clock[0] = i
+        buf.record(EV_START, src)
+    assert [e[0] for e in buf.events()] == [0, 1, 2]
+    assert buf.lost == 0
+    buf.clear()
+    assert list(buf.events()) == []
+
+
+def test_disabled_records_nothing(clock):
+    buf = TraceBuffer(8)
+    src = buf.register("Task")
+    buf.enabled = False
+    buf.record(EV_START, src)
+    assert list(buf.events()) == []
+
+
+def test_too_many_sources():
+    buf = TraceBuffer(8)
+    for i in range(256):
+        buf.register(str(i))
+    with pytest.raises(ValueError):
+        buf.register("one more")
+
+
+def test_dump_to_chrome_trace(clock):
+    buf = TraceBuffer(16)
+    task = buf.register("Yaw")
+    share = buf.register("Setpoint", SRC_SHARE)
+    # Runs of 300 and 200 us, the second across the ticks wrap
+    for t, kind, src, value in ((PERIOD - 1000, EV_START, task, 0),
+                                (PERIOD - 700, EV_END, task, 2),
+                                (PERIOD - 600, EV_SHARE, share, 1.5),
+                                (PERIOD - 100, EV_START, task, 0),
+                                (100, EV_END, task, 3)):
+        clock[0] = t
+        buf.record(kind, src, value)
+
+    lines = []
+    buf.dump(lines.append)
+    assert lines[-1] == "TRACE END 5 0"
+    sources, events = trace_export.parse(["noise"] + lines)
+    assert sources == {0: (tracebuf.SRC_TASK, "Yaw"), 1: (SRC_SHARE, "Setpoint")}
+
+    events = trace_export.unwrap(events)
+    assert [e[0] for e in events] == [0, 300, 400, 900, 1100]
+
+    trace = trace_export.chrome_trace(sources, events)["traceEvents"]
+    runs = [e for e in trace if e["ph"] == "X"]
+    assert [(r["ts"], r["dur"], r["args"]["state"]) for r in runs] == \
+        [(0, 300, 2), (900, 200, 3)]
+    assert all(r["name"] == "Yaw" and r["tid"] == task for r in runs)
+    counters = [e for e in trace if e["ph"] == "C"]
+    assert counters == [{"ph": "C", "name": "Setpoint", "pid": 1, "ts": 400,
+                         "args": {"value": 1.5}}]
+
+
+def test_run_with_lost_start_left_out(clock):
+    buf = TraceBuffer(2)
+    task = buf.register("Yaw")
+    for t, kind in ((0, EV_START), (10, EV_END), (20, EV_START), (30, EV_END),
+                    (40, EV_END)):
+        clock[0] = t
+        buf.record(kind, task)
+    lines = []
+    buf.dump(lines.append)
+    sources, events = trace_export.parse(lines)
+    trace = trace_export.chrome_trace(sources, trace_export.unwrap(events))
+    assert [e for e in trace["traceEvents"] if e["ph"] == "X"] == []
@@ -0,0 +1,185 @@
+"""!
+@file tools/trace_export.py
+Converts the board's trace buffer dump into a Chrome Trace file, which
+@c chrome://tracing and https://ui.perfetto.dev open as a timeline.
+
+Stop the board's program with Ctrl-C and save what it prints, which ends with
+the @c TRACE lines written by @c tracebuf.TraceBuffer.dump(); any other lines
+are ignored and, if the log holds several dumps, the last one is used. Each
+traced task gets a row of its runs, with its state changes marked on it, and
+each traced share a counter of the values written into it. The tasks' run
+times and the longest gaps between their starts are printed as well, which
+shows which task held up another.
+
+Usage, from the repository root:
+@code
+    mpremote connect /dev/ttyACM0 run src/main.py | tee run.log
+    python tools/trace_export.py run.log -o trace.json
+@endcode
+Set the @c trace_all parameter to 1 and save to trace every task; otherwise
+only the mission task is traced.
+"""
+import argparse
+import json
+import sys
+
+## Stamps from @c utime.ticks_us() wrap at this value
+TICKS_PERIOD = 1 << 30
+
+## Source types and event kinds, as in @c src/tracebuf.py
+SRC_TASK = 0
+SRC_SHARE = 1
+EV_START = 0
+EV_END = 1
+EV_STATE = 2
+EV_SHARE = 3
+
+
+def parse(lines):
+    """!
+    Reads the last trace dump from lines of a log.
+    @param lines The lines of text
+    @return A dictionary of source number to (type, name), and a list of
+            (ticks_us, kind, source, value) tuples oldest first
+    """
+    sources = {}
+    events = []
+    for line in lines:
+        fields = line.strip().split(" ", 5)
+        if len(fields) < 3 or fields[0] != "TRACE":
+            continue
+        if fields[1] == "SRC" and len(fields) >= 4:
+            num, kind = int(fields[2]), int(fields[3])
+            if num == 0:
+                # The start of a new dump
+                sources = {}
+                events = []
+            sources[num] = (kind, " ".join(fields[4:]))
+        elif fields[1] == "EV" and len(fields) >= 6:
+            events.append((int(fields[2]), int(fields[3]), int(fields[4]),
+                           float(fields[5])))
+    if not sources:
+        raise ValueError("No trace dump found")
+    return sources, events
+
+
+def unwrap(events):
+    """!
+    Turns wrapping tick stamps into microseconds since the first event.
+    Events recorded from an interrupt may be a little out of order, so each
+    step between stamps is taken as signed, as @c utime.ticks_diff() does.
+    @param events (ticks_us, kind, source, value) tuples oldest first
+    @return (time_us, kind, source, value) tuples sorted by time
+    """
+    out = []
+    now = 0
+    prev = None
+    for t, kind, source, value in events:
+        if prev is not None:
+            step = (t - prev) % TICKS_PERIOD
+            if step >= TICKS_PERIOD // 2:
+                step -= TICKS_PERIOD
+            now += step
+        prev = t
+        out.append((now, kind, source, value))
+    out.sort(key=lambda e: e[0])
+    return out
+
+
+def chrome_trace(sources, events):
+    """!
+    Builds the Chrome Trace events.
+    @param sources Source number to (type, name), from @c parse()
+    @param events Unwrapped events from @c unwrap()
+    @return The trace as a dictionary ready for @c json.dump()
+    """
+    out = [{"ph": "M", "name": "process_name", "pid": 1, "tid": 0,
+            "args": {"name": "Turret"}}]
+    for num, (kind, name) in sorted(sources.items()):
+        if kind == SRC_TASK:
+            out.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": num,
+                        "args": {"name": name}})
+            out.append({"ph": "M", "name": "thread_sort_index", "pid": 1,
+                        "tid": num, "args": {"sort_index": num}})
+
+    started = {}
+    for t, kind, source, value in events:
+        name = sources.get(source, (SRC_TASK, "Source {}".format(source)))[1]
+        if kind == EV_START:
+            started[source] = t
+        elif kind == EV_END:
+            # A run whose start was overwritten is left out
+            start = started.pop(source, None)
+            if start is not None:
+                out.append({"ph": "X", "name": name, "pid": 1, "tid": source,
+                            "ts": start, "dur": t - start,
+                            "args": {"state": int(value)}})
+        elif kind == EV_STATE:
+            out.append({"ph": "i", "s": "t", "name": "state {}".format(int(value)),
+                        "pid": 1, "tid": source, "ts": t})
+            out.append({"ph": "C", "name": name + " state", "pid": 1, "ts": t,
+                        "args": {"state": int(value)}})
+        elif kind == EV_SHARE:
+            out.append({"ph": "C", "name": name, "pid": 1, "ts": t,
+                        "args": {"value": value}})
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+
+def summary(sources, events):
+    """!
+    Works out each traced task's run times and the gaps between its starts.
+    @param sources Source number to (type, name), from @c parse()
+    @param events Unwrapped events from @c unwrap()
+    @return Lines of text, one per task
+    """
+    runs = {}
+    starts = {}
+    started = {}
+    for t, kind, source, _ in events:
+        if kind == EV_START:
+            started[source] = t
+            starts.setdefault(source, []).append(t)
+        elif kind == EV_END and source in started:
+            runs.setdefault(source, []).append(t - started.pop(source))
+
+    lines = ["{:24s} {:>6s} {:>9s} {:>9s} {:>9s}".format(
+        "task", "runs", "avg us", "max us", "max gap")]
+    for num, (kind, name) in sorted(sources.items()):
+        if kind != SRC_TASK or num not in runs:
+            continue
+        times = runs[num]
+        t = starts[num]
+        gap = max((b - a for a, b in zip(t, t[1:])), default=0)
+        lines.append("{:24s} {:6d} {:9.0f} {:9d} {:9d}".format(
+            name[:24], len(times), sum(times) / len(times), max(times), gap))
+    return lines
+
+
+def main(argv=None):
+    """!
+    Parses the command line and converts a trace dump.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert a trace dump to a Chrome Trace file")
+    parser.add_argument("log", nargs="?", default="-",
+                        help="log holding the dump, - for standard input")
+    parser.add_argument("-o", "--out", default="trace.json",
+                        help="Chrome Trace file to write")
+    args = parser.parse_args(argv)
+
+    if args.log == "-":
+        sources, events = parse(sys.stdin)
+    else:
+        with open(args.log, errors="replace") as f:
+            sources, events = parse(f)
+    events = unwrap(events)
+
+    with open(args.out, "w") as f:
+        json.dump(chrome_trace(sources, events), f)
+    print("\n".join(summary(sources, events)))
+    print("Wrote {} events to {}".format(len(events), args.out))
+
+
+if __name__ == "__main__":
+    main()
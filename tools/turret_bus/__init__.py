@@ -0,0 +1,12 @@
+"""!
+@file tools/turret_bus/__init__.py
+Host-side coordination of several turrets on one serial bus.
+
+The coordinator polls each turret with short addressed messages (see
+@c protocol.py and @c src/bus.py), places the targets they see in the room,
+gives each target to one turret and keeps each turret's field of fire clear
+of the others. @c sim.py provides turrets simulated on pseudo-terminals.
+"""
+from .protocol import BAUD, Parser, assign, poll, sector, status
+from .coordinator import STATUS_DTYPE, Coordinator, Target, Turret, load_layout, sectors
+from .sim import SimBus, SimTurret
@@ -0,0 +1,138 @@
+"""!
+@file tools/turret_bus/__main__.py
+Command line interface, run from the @c tools directory as
+@code
+    python -m turret_bus run layout.json --log statuses.npy
+    python -m turret_bus sim layout.json --seconds 20 --shared --centre 2 3
+@endcode
+@c run coordinates the turrets in the layout on their serial ports; @c sim
+runs the same coordinator against simulated turrets standing where the layout
+puts them, with a target walking a circle around the room's centre.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from turret_telemetry.source import SerialSource
+
+from .coordinator import Coordinator, load_layout
+from .sim import SimBus, SimTurret
+
+
+def _coordinate(turrets, links, args):
+    """!
+    Runs the coordinator, printing a summary each second.
+    @param turrets The @c Turret objects
+    @param links The open links by port name
+    @param args The parsed command line
+    @return The @c Coordinator
+    """
+    coord = Coordinator(turrets, links, target_range=args.range,
+                        margin=args.margin)
+    end = time.monotonic() + args.seconds if args.seconds else None
+    last = 0.0
+    try:
+        while end is None or time.monotonic() < end:
+            started = time.monotonic()
+            coord.step()
+            time.sleep(max(0.0, args.period - (time.monotonic() - started)))
+            if time.monotonic() - last >= 1.0:
+                last = time.monotonic()
+                print(coord.summary() + "\n")
+    except KeyboardInterrupt:
+        pass
+    if args.log:
+        np.save(args.log, coord.records())
+        print("Wrote", args.log)
+    return coord
+
+
+def _run(args):
+    turrets, baud = load_layout(args.layout)
+    links = {}
+    try:
+        for t in turrets:
+            if t.port not in links:
+                links[t.port] = SerialSource(t.port, baud)
+        _coordinate(turrets, links, args)
+    finally:
+        for link in links.values():
+            link.close()
+
+
+def _sim(args):
+    turrets, baud = load_layout(args.layout)
+    if args.centre:
+        cx, cy = args.centre
+    else:
+        cx = sum(t.x for t in turrets) / len(turrets)
+        cy = sum(t.y for t in turrets) / len(turrets)
+
+    def target(t):
+        a = 2 * math.pi * t / args.lap
+        return cx + args.radius * math.cos(a), cy + args.radius * math.sin(a)
+
+    # One pseudo-terminal for every turret, or one shared by all of them
+    sims = [SimTurret(t.address, t.x, t.y, t.heading, t.yaw_min, t.yaw_max)
+            for t in turrets]
+    groups = [sims] if args.shared else [[s] for s in sims]
+    buses = [SimBus(g, target).start() for g in groups]
+    links = {}
+    try:
+        for t in turrets:
+            bus = buses[0] if args.shared else buses[[s.address for s in sims]
+                                                      .index(t.address)]
+            t.port = bus.port
+            if t.port not in links:
+                links[t.port] = SerialSource(t.port, baud)
+        coord = _coordinate(turrets, links, args)
+        print("Shots:", {s.address: s.shots for s in sims})
+        return coord
+    finally:
+        for link in links.values():
+            link.close()
+        for bus in buses:
+            bus.close()
+
+
+def main(argv=None):
+    """!
+    Parses the command line and runs the chosen command.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(prog="turret_bus",
+                                     description="Coordinate several turrets")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, text in (("run", _run, "coordinate turrets on serial ports"),
+                             ("sim", _sim, "coordinate simulated turrets")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("layout", help="JSON file of turret positions and ports")
+        p.add_argument("--seconds", type=float, default=None)
+        p.add_argument("--range", type=float, default=3.0,
+                       help="metres to a target seen by one turret")
+        p.add_argument("--margin", type=float, default=10.0,
+                       help="degrees kept clear either side of another turret")
+        p.add_argument("--log", help="save the statuses to this .npy file")
+        p.add_argument("--period", type=float, default=0.02,
+                       help="seconds between polls of all the turrets")
+        p.set_defaults(func=func)
+        if name == "sim":
+            p.add_argument("--shared", action="store_true",
+                           help="put every turret on one bus")
+            p.add_argument("--radius", type=float, default=1.5,
+                           help="radius of the target's circle in metres")
+            p.add_argument("--lap", type=float, default=20.0,
+                           help="seconds for the target to go round once")
+            p.add_argument("--centre", type=float, nargs=2, default=None,
+                           help="centre of the target's circle, by default "
+                                "the middle of the turrets")
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
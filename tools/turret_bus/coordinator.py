@@ -0,0 +1,454 @@
+"""!
+@file tools/turret_bus/coordinator.py
+The host coordinator, which polls every turret on the bus, works out where
+the targets they see are in the room, gives each target to one turret and
+keeps each turret's field of fire clear of the others.
+
+Positions are in metres on the room's floor and angles in degrees,
+anticlockwise. A turret's @c heading is the room angle at which its yaw
+encoder reads zero, so a yaw angle @c a points along @c heading + @c a.
+
+A turret's camera gives the direction of a target but not how far away it is.
+The first turret to see a target places it at @c target_range along its line
+of sight; once a second turret sees it too, the target is put where their
+lines of sight cross.
+"""
+import math
+import json
+import time
+
+import numpy as np
+
+from .protocol import (BAUD, MSG_STATUS, Parser, assign, poll, sector, status)
+
+## The worst conditioning of the lines of sight which are crossed to place a
+#  target; 25 is about 20 degrees between two lines of sight
+MAX_COND = 25.0
+## A turret's new line of sight within this many degrees of its last one is
+#  taken to see the same target
+SAME_TARGET_DEG = 5.0
+
+## NumPy layout of one logged status, the coordinator's aggregated telemetry
+STATUS_DTYPE = np.dtype([("time", "<f8"), ("address", "u1"), ("state", "u1"),
+                         ("yaw", "<f4"), ("seen", "?"), ("bearing", "<f4"),
+                         ("shots", "<u2"), ("engage", "?"), ("target", "<i4")])
+
+
+def _wrap(angle):
+    """!
+    Wraps an angle into 0 to 360 degrees.
+    """
+    return angle % 360.0
+
+
+class Turret:
+    """!
+    Where a turret stands, what it last reported and what it was last told.
+    """
+
+    def __init__(self, address, port, x=0.0, y=0.0, heading=0.0, yaw_min=20.0,
+                 yaw_max=250.0):
+        """!
+        Describes a turret.
+        @param address The turret's bus address, its @c bus_addr parameter
+        @param port The serial port of the bus the turret is on
+        @param x The turret's position across the room in metres
+        @param y The turret's position along the room in metres
+        @param heading The room angle in degrees at which its yaw reads zero
+        @param yaw_min The lowest yaw angle it can reach, in degrees
+        @param yaw_max The highest yaw angle it can reach, in degrees
+        """
+        self.address = address
+        self.port = port
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.yaw_min = yaw_min
+        self.yaw_max = yaw_max
+
+        ## The latest status as a dictionary, @c None until one arrives
+        self.status = None
+        ## When the latest status arrived, from @c time.monotonic()
+        self.last_heard = None
+        ## The (low, high) yaw range given to the turret
+        self.sector = (yaw_min, yaw_max)
+        ## The @c Target the turret is engaging, or @c None
+        self.target = None
+        ## The (engage, aim) last sent, and when
+        self.sent = None
+        self.sent_at = 0.0
+
+    def yaw_to(self, point):
+        """!
+        Works out the yaw angle at which the turret points at a place.
+        @param point The (x, y) position in metres
+        @return The yaw angle in degrees, from 0 to 360
+        """
+        angle = math.degrees(math.atan2(point[1] - self.y, point[0] - self.x))
+        return _wrap(angle - self.heading)
+
+    def ray(self, yaw):
+        """!
+        Gives the turret's line of sight at a yaw angle.
+        @param yaw The yaw angle in degrees
+        @return The turret's position and the unit direction, as arrays
+        """
+        a = math.radians(self.heading + yaw)
+        return np.array([self.x, self.y]), np.array([math.cos(a), math.sin(a)])
+
+    def can_aim(self, yaw):
+        """!
+        Tells whether a yaw angle is inside the turret's sector.
+        """
+        low, high = self.sector
+        return low <= yaw <= high
+
+    def __repr__(self):
+        return "Turret {:d} at ({:.2f}, {:.2f})".format(self.address, self.x,
+                                                       self.y)
+
+
+class Target:
+    """!
+    A target seen by one or more turrets.
+    """
+
+    def __init__(self, number, point):
+        """!
+        Creates a target.
+        @param number A number identifying the target in logs
+        @param point Its estimated (x, y) position in metres
+        """
+        self.number = number
+        self.point = np.asarray(point, dtype=float)
+        ## Lines of sight by turret address: (origin, direction, time)
+        self.rays = {}
+        self.last_seen = 0.0
+
+    def distance(self, origin, direction):
+        """!
+        Works out how far the target is from a line of sight.
+        @param origin The turret's position
+        @param direction The unit direction of its line of sight
+        @return The distance in metres, or infinity if the target is behind
+        """
+        rel = self.point - origin
+        along = rel @ direction
+        if along <= 0:
+            return math.inf
+        return float(np.linalg.norm(rel - along * direction))
+
+    def add_ray(self, address, origin, direction, now, target_range):
+        """!
+        Adds a turret's line of sight and moves the target to where the lines
+        of sight cross, or along the only one if there is just one.
+        @param address The turret's address
+        @param origin The turret's position
+        @param direction The unit direction of its line of sight
+        @param now The time of the sighting
+        @param target_range The distance assumed with one line of sight
+        """
+        self.rays[address] = (origin, direction, now)
+        self.last_seen = now
+        if len(self.rays) == 1:
+            self.point = origin + target_range * direction
+            return
+
+        # The point closest to every line of sight, in the least squares sense
+        a = np.zeros((2, 2))
+        b = np.zeros(2)
+        for o, d, _ in self.rays.values():
+            p = np.eye(2) - np.outer(d, d)
+            a += p
+            b += p @ o
+        if np.linalg.cond(a) < MAX_COND:
+            self.point = np.linalg.solve(a, b)
+        else:
+            # Lines of sight too near parallel to cross cleanly; keep the
+            # distance and move onto the newest one
+            along = max((self.point - origin) @ direction, 0.1)
+            self.point = origin + along * direction
+
+    def expire(self, now, forget):
+        """!
+        Drops lines of sight which haven't been renewed.
+        @param now The current time
+        @param forget How long a line of sight is kept, in seconds
+        """
+        for address in [a for a, (_, _, t) in self.rays.items()
+                        if now - t > forget]:
+            del self.rays[address]
+
+    def __repr__(self):
+        return "Target {:d} at ({:.2f}, {:.2f})".format(self.number,
+                                                       *self.point)
+
+
+def _crossing(o1, d1, o2, d2, max_range):
+    """!
+    Tells whether two lines of sight cross in front of both turrets.
+    @return @c True if they cross within @c max_range of both
+    """
+    det = d1[0] * -d2[1] - d1[1] * -d2[0]
+    if abs(det) < 1e-6:
+        return False
+    rel = o2 - o1
+    s = (rel[0] * -d2[1] - rel[1] * -d2[0]) / det
+    t = (d1[0] * rel[1] - d1[1] * rel[0]) / det
+    return 0 < s < max_range and 0 < t < max_range
+
+
+def sectors(turrets, margin=10.0):
+    """!
+    Works out a field of fire for each turret which keeps it from aiming at
+    any of the others: the largest range of yaw angles within its reach that
+    doesn't come within @c margin degrees of another turret.
+    @param turrets The @c Turret objects
+    @param margin The clearance in degrees either side of another turret
+    @return A dictionary of (low, high) yaw ranges by turret address
+    """
+    out = {}
+    for t in turrets:
+        blocked = []
+        for u in turrets:
+            if u is t:
+                continue
+            yaw = t.yaw_to((u.x, u.y))
+            for y in (yaw - 360.0, yaw, yaw + 360.0):
+                blocked.append((y - margin, y + margin))
+        blocked.sort()
+
+        best = (t.yaw_min, t.yaw_min)
+        low = t.yaw_min
+        for start, end in blocked:
+            if end < low:
+                continue
+            if start > t.yaw_max:
+                break
+            if start - low > best[1] - best[0]:
+                best = (low, start)
+            low = max(low, end)
+        if t.yaw_max - low > best[1] - best[0]:
+            best = (low, t.yaw_max)
+        out[t.address] = best
+    return out
+
+
+class Coordinator:
+    """!
+    Polls the turrets, tracks the targets and hands them out.
+    """
+
+    def __init__(self, turrets, links, target_range=3.0, merge=0.5,
+                 max_range=15.0, margin=10.0, forget=1.0, timeout=0.05,
+                 stick=20.0, refresh=1.0):
+        """!
+        Creates the coordinator.
+        @param turrets The @c Turret objects
+        @param links A dictionary of open links by port name, each with
+               @c read() and @c write() methods such as a @c SerialSource
+        @param target_range The distance in metres assumed for a target seen by
+               one turret
+        @param merge How close in metres a line of sight must pass to a target
+               to be counted as seeing it
+        @param max_range The farthest in metres at which lines of sight from two
+               turrets are taken to meet at one target
+        @param margin The clearance in degrees kept from other turrets
+        @param forget How long in seconds a target is kept after it was last seen
+        @param timeout How long in seconds to wait for a turret's answer
+        @param stick How many degrees of extra slew a turret keeps its target
+               for, so targets don't swap back and forth
+        @param refresh How often in seconds assignments are sent again
+        """
+        self.turrets = list(turrets)
+        self.links = links
+        self.target_range = target_range
+        self.merge = merge
+        self.max_range = max_range
+        self.forget = forget
+        self.timeout = timeout
+        self.stick = stick
+        self.refresh = refresh
+
+        self._parsers = {port: Parser() for port in links}
+        self._sectors = sectors(self.turrets, margin)
+        ## The targets being tracked
+        self.targets = []
+        self._next_number = 0
+        self._log = []
+
+    def _send(self, turret, data):
+        """!
+        Sends bytes to a turret's bus.
+        """
+        self.links[turret.port].write(data)
+
+    def poll(self, turret):
+        """!
+        Asks a turret for its status and waits for the answer.
+        @param turret The @c Turret
+        @return The status dictionary, or @c None if the turret didn't answer
+        """
+        self._send(turret, poll(turret.address))
+        link = self.links[turret.port]
+        parser = self._parsers[turret.port]
+        end = time.monotonic() + self.timeout
+        while time.monotonic() < end:
+            for dst, src, kind, payload in parser.feed(link.read()):
+                if kind != MSG_STATUS or src != turret.address:
+                    continue
+                try:
+                    s = status(payload)
+                except ValueError:
+                    continue
+                now = time.monotonic()
+                if turret.last_heard is None \
+                        or now - turret.last_heard > self.forget:
+                    # New or back after a silence: give it its sector
+                    turret.sector = self._sectors[turret.address]
+                    self._send(turret, sector(turret.address, *turret.sector))
+                    turret.sent = None
+                turret.status = s
+                turret.last_heard = now
+                return s
+        return None
+
+    def _locate(self, turret, now):
+        """!
+        Matches a turret's sighting to a target, or starts a new target.
+        @param turret The @c Turret which saw a target
+        @param now The time of the sighting
+        """
+        origin, direction = turret.ray(turret.status["bearing"])
+        best, best_dist = None, self.merge
+        for target in self.targets:
+            others = [a for a in target.rays if a != turret.address]
+            if turret.address in target.rays:
+                # Still following the target it saw last time
+                d = target.rays[turret.address][1]
+                turn = math.degrees(math.acos(min(1.0, float(d @ direction))))
+                if turn < SAME_TARGET_DEG:
+                    dist = 0.0
+                else:
+                    dist = target.distance(origin, direction)
+            elif len(target.rays) == 1 and others:
+                # One other turret's line of sight: see if the two cross
+                o, d, _ = target.rays[others[0]]
+                if _crossing(o, d, origin, direction, self.max_range):
+                    dist = 0.0
+                else:
+                    continue
+            else:
+                dist = target.distance(origin, direction)
+            if dist <= best_dist:
+                best, best_dist = target, dist
+        if best is None:
+            best = Target(self._next_number, origin)
+            self._next_number += 1
+            self.targets.append(best)
+        best.add_ray(turret.address, origin, direction, now, self.target_range)
+
+    def assign(self):
+        """!
+        Gives each target to at most one turret and each turret at most one
+        target, preferring the turret which has least far to turn.
+        """
+        live = [t for t in self.turrets if t.status is not None]
+        pairs = []
+        for target in self.targets:
+            for t in live:
+                yaw = t.yaw_to(target.point)
+                if not t.can_aim(yaw):
+                    continue
+                cost = abs(yaw - t.status["yaw"])
+                if t.target is target:
+                    cost -= self.stick
+                pairs.append((cost, t.address, target.number, t, target))
+        pairs.sort(key=lambda p: p[:3])
+
+        for t in self.turrets:
+            t.target = None
+        taken = set()
+        for _, _, _, t, target in pairs:
+            if t.target is None and target.number not in taken:
+                t.target = target
+                taken.add(target.number)
+
+    def step(self):
+        """!
+        Polls every turret once, updates the targets, hands them out and sends
+        the turrets any changed assignments.
+        """
+        for t in self.turrets:
+            s = self.poll(t)
+            now = time.monotonic()
+            if s is not None and s["seen"]:
+                self._locate(t, now)
+
+        now = time.monotonic()
+        for target in self.targets:
+            target.expire(now, self.forget)
+        self.targets = [g for g in self.targets if g.rays]
+        self.assign()
+
+        for t in self.turrets:
+            if t.status is None:
+                continue
+            if t.target is None:
+                msg = (False, float("nan"))
+            else:
+                msg = (True, t.yaw_to(t.target.point))
+            changed = t.sent is None or msg[0] != t.sent[0]
+            if changed or now - t.sent_at > self.refresh:
+                self._send(t, assign(t.address, *msg))
+                t.sent = msg
+                t.sent_at = now
+            s = t.status
+            self._log.append((now, t.address, s["state"], s["yaw"], s["seen"],
+                              s["bearing"], s["shots"], msg[0],
+                              -1 if t.target is None else t.target.number))
+
+    def records(self):
+        """!
+        Returns every status collected so far, with what each turret was told.
+        @return A structured array with @c STATUS_DTYPE
+        """
+        return np.array(self._log, dtype=STATUS_DTYPE)
+
+    def summary(self):
+        """!
+        Describes the turrets and targets in a few lines of text.
+        """
+        from .protocol import STATES
+        lines = []
+        for t in self.turrets:
+            if t.status is None:
+                lines.append("{:3d}  no answer".format(t.address))
+                continue
+            s = t.status
+            lines.append("{:3d}  {:10s} yaw {:6.1f}  sector {:5.1f} to {:5.1f}  "
+                         "shots {:3d}  {}".format(
+                             t.address, STATES.get(s["state"], "?"), s["yaw"],
+                             t.sector[0], t.sector[1], s["shots"],
+                             t.target if t.target else "holding"))
+        for g in self.targets:
+            lines.append("     {} seen by {}".format(g, sorted(g.rays)))
+        return "\n".join(lines)
+
+
+def load_layout(path):
+    """!
+    Reads the room layout. The file holds a JSON object with a @c turrets
+    list, each entry giving the @c address and @c port of a turret and
+    optionally its @c x, @c y, @c heading, @c yaw_min and @c yaw_max, and
+    optionally a @c baud for the bus.
+    @param path The layout file
+    @return A list of @c Turret objects and the baud rate
+    """
+    with open(path) as f:
+        layout = json.load(f)
+    turrets = [Turret(**entry) for entry in layout["turrets"]]
+    addresses = [t.address for t in turrets]
+    if len(set(addresses)) != len(addresses):
+        raise ValueError("Each turret needs its own address")
+    return turrets, layout.get("baud", BAUD)
@@ -0,0 +1,158 @@
+"""!
+@file tools/turret_bus/protocol.py
+The multi-turret bus message layout and numbering, mirroring @c src/bus.py.
+Keep the two files in step when messages are added or changed.
+"""
+import struct
+
+## First byte of every message
+SYNC = 0xB5
+## The coordinator's address
+HOST = 0
+## Destination address which every turret accepts
+BROADCAST = 0xFF
+## The largest payload in bytes
+MAX_PAYLOAD = 32
+## Bytes in a message besides its payload
+OVERHEAD = 6
+## Baud rate of the bus, UART 1 on the board
+BAUD = 115200
+
+MSG_POLL = 1
+MSG_STATUS = 2
+MSG_ASSIGN = 3
+MSG_SECTOR = 4
+
+MESSAGES = {MSG_POLL: "poll", MSG_STATUS: "status", MSG_ASSIGN: "assign",
+            MSG_SECTOR: "sector"}
+
+## Payload layouts, as @c FMT_ constants on the board
+FMT_STATUS = "<BfBfH"
+FMT_ASSIGN = "<Bf"
+FMT_SECTOR = "<ff"
+
+## Mission state names, from @c src/mission.py
+STATES = {0: "WAIT HOME", 1: "HOMING", 2: "HOME MOVE", 3: "IDLE",
+          4: "PRE-ACTIVE", 5: "ACTIVE", 6: "TRACKING", 7: "FIRE", 8: "RETURN"}
+
+
+def crc8(data):
+    """!
+    Works out the CRC-8 with polynomial 0x07 used to check messages.
+    @param data The bytes covered, from the destination to the payload's end
+    @return The CRC, from 0 to 255
+    """
+    crc = 0
+    for c in data:
+        crc ^= c
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def message(dst, src, kind, fmt=None, *values):
+    """!
+    Frames a message.
+    @param dst The destination address
+    @param src The source address
+    @param kind The kind of message, one of the @c MSG_ constants
+    @param fmt The payload's struct format, or @c None for no payload
+    @param values The values packed into the payload
+    @return The framed message
+    """
+    payload = struct.pack(fmt, *values) if fmt else b""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("Payload of {} bytes is too long".format(len(payload)))
+    body = bytes((dst, src, kind, len(payload))) + payload
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def poll(address):
+    """!
+    Frames a poll of one turret.
+    @param address The turret's address
+    @return The framed message
+    """
+    return message(address, HOST, MSG_POLL)
+
+
+def assign(address, engage, aim=float("nan")):
+    """!
+    Frames an assignment.
+    @param address The turret's address
+    @param engage @c True to let the turret track and fire, @c False to hold
+    @param aim The yaw angle in degrees at which to wait, NaN to keep its own
+    @return The framed message
+    """
+    return message(address, HOST, MSG_ASSIGN, FMT_ASSIGN, int(bool(engage)), aim)
+
+
+def sector(address, low, high):
+    """!
+    Frames a field of fire.
+    @param address The turret's address
+    @param low The lowest yaw angle in degrees
+    @param high The highest yaw angle in degrees
+    @return The framed message
+    """
+    return message(address, HOST, MSG_SECTOR, FMT_SECTOR, low, high)
+
+
+def status(payload):
+    """!
+    Unpacks a turret's status.
+    @param payload The payload of a @c MSG_STATUS message
+    @return A dictionary of the mission @c state, @c yaw in degrees, whether
+            a target was @c seen, the target's @c bearing in degrees as a yaw
+            angle and the number of @c shots fired
+    """
+    state, yaw, seen, bearing, shots = struct.unpack(FMT_STATUS, payload)
+    return {"state": state, "yaw": yaw, "seen": bool(seen),
+            "bearing": bearing, "shots": shots}
+
+
+class Parser:
+    """!
+    Finds framed messages in a stream of bytes, skipping damaged ones.
+    """
+
+    def __init__(self):
+        """!
+        Creates a parser with nothing buffered.
+        """
+        self._buf = bytearray()
+        ## The number of frames thrown away for a bad length or CRC
+        self.errors = 0
+
+    def feed(self, data):
+        """!
+        Adds received bytes and returns the messages completed by them.
+        @param data The bytes received
+        @return A list of (destination, source, kind, payload) tuples
+        """
+        buf = self._buf
+        buf += data
+        out = []
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                del buf[:]
+                break
+            del buf[:start]
+            if len(buf) < OVERHEAD:
+                break
+            n = buf[4]
+            if n > MAX_PAYLOAD:
+                self.errors += 1
+                del buf[:1]
+                continue
+            if len(buf) < OVERHEAD + n:
+                break
+            if crc8(buf[1:5 + n]) != buf[5 + n]:
+                # Look for the next sync byte inside the damaged frame
+                self.errors += 1
+                del buf[:1]
+                continue
+            out.append((buf[1], buf[2], buf[3], bytes(buf[5:5 + n])))
+            del buf[:OVERHEAD + n]
+        return out
@@ -0,0 +1,215 @@
+"""!
+@file tools/turret_bus/sim.py
+Simulated turrets which answer the coordinator over pseudo-terminals, so the
+coordinator can be run and tested without any boards.
+
+Each @c SimBus opens a pseudo-terminal and runs one or more @c SimTurret
+objects on it in a thread, as turrets sharing one RS-485 bus would. The
+coordinator opens the bus's @c port like any serial port. A simulated turret
+follows the parts of the mission which matter to the coordinator: it waits in
+ACTIVE at its assigned angle, tracks a target it sees while allowed to engage,
+fires once it has held the target for a moment and then goes back to waiting
+rather than home. Pseudo-terminals need Linux or macOS.
+"""
+import math
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from .protocol import (BROADCAST, FMT_ASSIGN, FMT_SECTOR, FMT_STATUS, HOST,
+                       MSG_ASSIGN, MSG_POLL, MSG_SECTOR, MSG_STATUS, Parser,
+                       message)
+
+## Mission states used by the simulation, as in @c src/mission.py
+ACTIVE = 5
+TRACKING = 6
+FIRE = 7
+
+
+class SimTurret:
+    """!
+    A turret with a camera, moved by simple physics.
+    """
+
+    def __init__(self, address, x=0.0, y=0.0, heading=0.0, yaw_min=20.0,
+                 yaw_max=250.0, fov=55.0, slew=180.0, noise=0.2, lock=0.3,
+                 **_):
+        """!
+        Creates a turret at rest in the middle of its reach. Extra keywords,
+        such as a layout's @c port, are ignored.
+        @param address The turret's bus address
+        @param x The turret's position across the room in metres
+        @param y The turret's position along the room in metres
+        @param heading The room angle in degrees at which its yaw reads zero
+        @param yaw_min The lowest yaw angle it can reach, in degrees
+        @param yaw_max The highest yaw angle it can reach, in degrees
+        @param fov The camera's field of view in degrees
+        @param slew The yaw speed in degrees per second
+        @param noise The standard deviation of sighted angles in degrees
+        @param lock How long in seconds a target must be held before firing
+        """
+        self.address = address
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.sector = (yaw_min, yaw_max)
+        self.fov = fov
+        self.slew = slew
+        self.noise = noise
+        self.lock = lock
+
+        self.state = ACTIVE
+        self.yaw = (yaw_min + yaw_max) / 2
+        self.engage = False
+        self.aim = self.yaw
+        self.shots = 0
+        self.seen = False
+        self.bearing = float("nan")
+        self._held = 0.0
+        self._fired_at = 0.0
+
+    def yaw_to(self, point):
+        """!
+        Works out the yaw angle at which the turret points at a place.
+        """
+        angle = math.degrees(math.atan2(point[1] - self.y, point[0] - self.x))
+        return (angle - self.heading) % 360.0
+
+    def handle(self, kind, payload):
+        """!
+        Acts on a message for this turret.
+        @param kind The kind of message
+        @param payload Its payload
+        @return The reply to send, or @c None
+        """
+        if kind == MSG_POLL:
+            reply = message(HOST, self.address, MSG_STATUS, FMT_STATUS,
+                            self.state, self.yaw, int(self.seen), self.bearing,
+                            self.shots & 0xFFFF)
+            self.seen = False
+            return reply
+        if kind == MSG_ASSIGN:
+            engage, aim = struct.unpack(FMT_ASSIGN, payload)
+            self.engage = bool(engage)
+            if aim == aim:
+                self.aim = aim
+        elif kind == MSG_SECTOR:
+            self.sector = struct.unpack(FMT_SECTOR, payload)
+        return None
+
+    def update(self, dt, target, now):
+        """!
+        Moves the turret on by a time step.
+        @param dt The time step in seconds
+        @param target The target's (x, y) position, or @c None if there is none
+        @param now The current time in seconds
+        """
+        in_view = False
+        if target is not None:
+            yaw = self.yaw_to(target)
+            in_view = abs(yaw - self.yaw) < self.fov / 2
+            if in_view:
+                self.seen = True
+                self.bearing = yaw + random.gauss(0.0, self.noise)
+
+        low, high = self.sector
+        if self.state == ACTIVE:
+            goal = self.aim
+            if self.engage and in_view:
+                self.state = TRACKING
+                self._held = 0.0
+        elif self.state == TRACKING:
+            goal = yaw if in_view else self.yaw
+            if not self.engage or not in_view:
+                self.state = ACTIVE
+            elif abs(yaw - self.yaw) < 1.0 and low <= yaw <= high:
+                self._held += dt
+                if self._held >= self.lock:
+                    self.state = FIRE
+                    self.shots += 1
+                    self._fired_at = now
+        else:
+            goal = self.yaw
+            if now - self._fired_at > 0.5:
+                self.state = ACTIVE
+
+        goal = min(max(goal, low), high)
+        step = self.slew * dt
+        self.yaw += min(max(goal - self.yaw, -step), step)
+
+
+class SimBus:
+    """!
+    A pseudo-terminal carrying one or more simulated turrets.
+    """
+
+    def __init__(self, turrets, target=None, step=0.005):
+        """!
+        Opens the pseudo-terminal.
+        @param turrets The @c SimTurret objects on this bus
+        @param target A function of the time in seconds since @c start()
+               returning the target's (x, y) position, or @c None for none
+        @param step The simulation's time step in seconds
+        """
+        self.turrets = {t.address: t for t in turrets}
+        self.target = target
+        self.step = step
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        ## The device name to open in place of a serial port
+        self.port = os.ttyname(self._slave)
+        self._parser = Parser()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """!
+        Starts the simulation thread.
+        @return This object
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        """!
+        Answers messages and moves the turrets until stopped.
+        """
+        start = last = time.monotonic()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], self.step)
+            if ready:
+                for dst, src, kind, payload in self._parser.feed(
+                        os.read(self._master, 4096)):
+                    for t in self.turrets.values():
+                        if dst == t.address or dst == BROADCAST:
+                            reply = t.handle(kind, payload)
+                            if reply:
+                                os.write(self._master, reply)
+
+            now = time.monotonic()
+            if now - last >= self.step:
+                target = self.target(now - start) if self.target else None
+                for t in self.turrets.values():
+                    t.update(now - last, target, now)
+                last = now
+
+    def close(self):
+        """!
+        Stops the simulation and closes the pseudo-terminal.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,11 @@
+"""!
+@file tools/turret_telemetry/__init__.py
+Host-side tools for the telemetry stream sent by the Nucleo's host link task.
+
+The stream is a sequence of fixed 12-byte records (see @c src/telemetry.py);
+this package reads it from a serial port or a recording, decodes it into NumPy
+structured arrays, plots it live and exports it to CSV or Parquet.
+"""
+from .protocol import RECORD_DTYPE, CHANNELS, channel_number
+from .decode import Decoder, decode, unwrap_ticks
+from .source import SerialSource, FileSource, open_source
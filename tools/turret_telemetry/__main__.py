@@ -0,0 +1,100 @@
+"""!
+@file tools/turret_telemetry/__main__.py
+Command line interface, run from the @c tools directory as
+@code
+    python -m turret_telemetry record /dev/ttyACM0 run1.bin
+    python -m turret_telemetry plot run1.bin yaw_error yaw_actuation --tasks 0 1
+    python -m turret_telemetry export run1.bin run1.parquet --step 0.001
+    python -m turret_telemetry cmd /dev/ttyACM0 "set yaw_p 0.9" save
+@endcode
+"""
+import argparse
+import sys
+import time
+
+from .export import read_table, to_csv, to_parquet
+from .plot import LivePlot
+from .protocol import channel_number
+from .source import DEFAULT_BAUD, SerialSource, open_source
+
+
+def _record(args):
+    with SerialSource(args.port, args.baud, record_to=args.out) as src:
+        total = 0
+        start = time.time()
+        try:
+            while args.seconds is None or time.time() - start < args.seconds:
+                total += len(src.read())
+        except KeyboardInterrupt:
+            pass
+    print("Recorded {} bytes to {}".format(total, args.out))
+
+
+def _plot(args):
+    with open_source(args.source, args.baud, args.record) as src:
+        channels = [channel_number(c) for c in args.channels]
+        LivePlot(src, channels, args.tasks, window=args.window).show()
+
+
+def _export(args):
+    with open_source(args.source) as src:
+        table = read_table(src)
+    if args.out.endswith(".parquet"):
+        to_parquet(table, args.out, args.step)
+    else:
+        to_csv(table, args.out, args.long, args.step)
+    print("Wrote {} records to {}".format(len(table), args.out))
+
+
+def _cmd(args):
+    with SerialSource(args.port, args.baud) as src:
+        for line in args.commands:
+            src.command(line)
+
+
+def main(argv=None):
+    """!
+    Parses the command line and runs the chosen command.
+    @param argv Arguments, by default those given to the program
+    """
+    parser = argparse.ArgumentParser(prog="turret_telemetry",
+                                     description="Turret telemetry tools")
+    parser.add_argument("--baud", type=int, default=DEFAULT_BAUD)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="record raw telemetry to a file")
+    p.add_argument("port")
+    p.add_argument("out")
+    p.add_argument("--seconds", type=float, default=None)
+    p.set_defaults(func=_record)
+
+    p = sub.add_parser("plot", help="plot channels live from a port or file")
+    p.add_argument("source", help="serial port or recording")
+    p.add_argument("channels", nargs="*", default=["yaw_error",
+                                                   "yaw_actuation"])
+    p.add_argument("--tasks", type=int, nargs="*", default=[])
+    p.add_argument("--window", type=float, default=10.0)
+    p.add_argument("--record", default=None,
+                   help="also record a serial session to this file")
+    p.set_defaults(func=_plot)
+
+    p = sub.add_parser("export", help="export a recording to CSV or Parquet")
+    p.add_argument("source")
+    p.add_argument("out", help="output file, .csv or .parquet")
+    p.add_argument("--step", type=float, default=None,
+                   help="resample channels every STEP seconds")
+    p.add_argument("--long", action="store_true",
+                   help="CSV with one row per record")
+    p.set_defaults(func=_export)
+
+    p = sub.add_parser("cmd", help="send command lines to the board")
+    p.add_argument("port")
+    p.add_argument("commands", nargs="+")
+    p.set_defaults(func=_cmd)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
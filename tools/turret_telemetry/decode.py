@@ -0,0 +1,157 @@
+"""!
+@file tools/turret_telemetry/decode.py
+Vectorized decoding of the telemetry byte stream into NumPy record arrays.
+
+When the stream is aligned, which is the normal case, a whole chunk of bytes
+is reinterpreted as records without copying or looping in Python. Only when a
+chunk contains garbage (after a dropped byte, say) are record starts searched
+for, and even then the search is done with array operations.
+"""
+import numpy as np
+
+from .protocol import RECORD_DTYPE, RECORD_SIZE, SYNC, KIND_MAX, TICKS_PERIOD
+
+
+def _record_starts(buf, final):
+    """!
+    Finds the offsets of the records in a chunk which isn't aligned.
+
+    An offset is taken as a record start if it holds the sync byte followed by
+    a valid kind, and the record after it starts with a sync byte too. Overlap
+    between candidates is resolved by keeping the earliest.
+    @param buf The chunk, as a @c uint8 array
+    @param final If @c True the chunk ends the stream, so a record reaching
+           the end of the chunk is accepted without a sync byte after it
+    @return A tuple of an array of record start offsets and the offset of a
+            complete record which couldn't be checked yet, or @c None
+    """
+    n = len(buf) - RECORD_SIZE + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.intp), None
+
+    ok = (buf[:n] == SYNC) & (buf[1:n + 1] <= KIND_MAX)
+    starts = np.flatnonzero(ok)
+
+    # A real record is followed by another sync byte unless it is the last one
+    follow = starts + RECORD_SIZE
+    inside = follow < len(buf)
+    chained = np.zeros(len(starts), dtype=bool)
+    chained[inside] = buf[follow[inside]] == SYNC
+    chained[~inside] = final
+    pending = None if final or inside.all() else int(starts[~inside][0])
+    starts = starts[chained]
+
+    # Drop candidates which overlap the previous accepted record
+    keep = []
+    next_free = 0
+    for s in starts.tolist():
+        if s >= next_free:
+            keep.append(s)
+            next_free = s + RECORD_SIZE
+    if pending is not None and pending < next_free:
+        pending = None
+    return np.asarray(keep, dtype=np.intp), pending
+
+
+def decode(data, final=True):
+    """!
+    Decodes a chunk of the telemetry stream.
+    @param data A bytes-like chunk of the stream
+    @param final @c False if more of the stream will follow this chunk, in
+           which case a record at the very end of an unaligned chunk is held
+           back until the next chunk shows whether it is genuine
+    @return A tuple of the decoded records, as an array of @c RECORD_DTYPE,
+            and the bytes at the end of the chunk which may be the start of a
+            record completed by the next chunk
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    whole = len(buf) - len(buf) % RECORD_SIZE
+
+    # Fast path: the chunk is a run of aligned records. Unless the stream
+    # ends here, the last record only counts if a sync byte follows it
+    if whole and (buf[0:whole:RECORD_SIZE] == SYNC).all() \
+            and (buf[1:whole:RECORD_SIZE] <= KIND_MAX).all():
+        if final or (len(buf) > whole and buf[whole] == SYNC):
+            return buf[:whole].view(RECORD_DTYPE), bytes(buf[whole:])
+        if len(buf) == whole:
+            keep = whole - RECORD_SIZE
+            return buf[:keep].view(RECORD_DTYPE), bytes(buf[keep:])
+
+    starts, pending = _record_starts(buf, final)
+    rest = max(0, len(buf) - RECORD_SIZE + 1)
+    if len(starts):
+        rest = max(rest, int(starts[-1]) + RECORD_SIZE)
+    if pending is not None:
+        rest = min(rest, pending)
+
+    if len(starts) == 0:
+        return np.empty(0, dtype=RECORD_DTYPE), bytes(buf[rest:])
+
+    # Gather the records with one fancy index, then view them as records
+    idx = starts[:, None] + np.arange(RECORD_SIZE)
+    records = buf[idx].reshape(-1).view(RECORD_DTYPE)
+    return records, bytes(buf[rest:])
+
+
+def unwrap_ticks(ticks_us, start=None):
+    """!
+    Turns the board's wrapping microsecond tick stamps into seconds.
+    @param ticks_us Array of @c ticks_us values in the order received
+    @param start The tick value taken as time zero, by default the first one
+    @return Array of float64 times in seconds
+    """
+    ticks = np.asarray(ticks_us, dtype=np.int64)
+    if len(ticks) == 0:
+        return np.empty(0)
+    if start is None:
+        start = ticks[0]
+    steps = np.diff(ticks, prepend=start) % TICKS_PERIOD
+    return np.cumsum(steps) / 1e6
+
+
+class Decoder:
+    """!
+    Decodes a stream fed in chunks of any size, keeping partial records and
+    the running time base between chunks.
+    """
+
+    def __init__(self):
+        """!
+        Creates a decoder with no pending bytes.
+        """
+        self._rest = b""
+        self._last_tick = None
+        self._t = 0.0
+
+    def feed(self, data):
+        """!
+        Decodes the next chunk of the stream.
+        @param data A bytes-like chunk of the stream
+        @return A tuple of the records decoded from this chunk and an array of
+                their times in seconds since the first record of the stream
+        """
+        records, self._rest = decode(self._rest + bytes(data), final=False)
+        return self._stamp(records)
+
+    def flush(self):
+        """!
+        Decodes whatever was held back at the end of the stream.
+        @return A tuple of records and times, as from @c feed()
+        """
+        records, _ = decode(self._rest)
+        self._rest = b""
+        return self._stamp(records)
+
+    def _stamp(self, records):
+        """!
+        Works out the times of records, continuing from earlier chunks.
+        """
+        if len(records) == 0:
+            return records, np.empty(0)
+
+        if self._last_tick is None:
+            self._last_tick = int(records["ticks_us"][0])
+        times = self._t + unwrap_ticks(records["ticks_us"], self._last_tick)
+        self._last_tick = int(records["ticks_us"][-1])
+        self._t = float(times[-1])
+        return records, times
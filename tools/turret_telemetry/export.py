@@ -0,0 +1,127 @@
+"""!
+@file tools/turret_telemetry/export.py
+Reading whole recordings into tables and writing them to CSV or Parquet.
+"""
+import numpy as np
+
+from .decode import Decoder
+from .protocol import KIND_CHANNEL, KIND_TASK, record_name
+
+## Layout of a decoded table: one row per record, with its time in seconds
+TABLE_DTYPE = np.dtype([("time_s", "<f8"), ("kind", "u1"),
+                        ("number", "<u2"), ("value", "<f4")])
+
+
+def read_table(source):
+    """!
+    Decodes everything a source gives until it runs out.
+    @param source A @c FileSource, or any object whose @c read() returns
+           bytes and an empty result at the end
+    @return An array of @c TABLE_DTYPE holding every record
+    """
+    decoder = Decoder()
+    parts = []
+    while True:
+        data = source.read()
+        if data:
+            records, times = decoder.feed(data)
+        else:
+            records, times = decoder.flush()
+        if len(records):
+            part = np.empty(len(records), dtype=TABLE_DTYPE)
+            part["time_s"] = times
+            part["kind"] = records["kind"]
+            part["number"] = records["number"]
+            part["value"] = records["value"]
+            parts.append(part)
+        if not data:
+            break
+
+    if not parts:
+        return np.empty(0, dtype=TABLE_DTYPE)
+    return np.concatenate(parts)
+
+
+def channel(table, number, kind=KIND_CHANNEL):
+    """!
+    Picks the samples of one channel, or the timing reports of one task.
+    @param table A table from @c read_table()
+    @param number The channel or task number
+    @param kind @c KIND_CHANNEL for a channel or @c KIND_TASK for a task
+    @return A tuple of arrays of times and values
+    """
+    sel = (table["kind"] == kind) & (table["number"] == number)
+    return table["time_s"][sel], table["value"][sel]
+
+
+def wide(table, step=None):
+    """!
+    Lays the channels out side by side, one column per channel, holding each
+    channel's last value between its samples. Task timing reports are added
+    as @c taskN columns.
+    @param table A table from @c read_table()
+    @param step If given, resample on a regular grid with this spacing in
+           seconds; otherwise use the time of every channel sample
+    @return A tuple of the column names and a 2D float array whose first
+            column is time
+    """
+    streams = table[(table["kind"] == KIND_CHANNEL)
+                    | (table["kind"] == KIND_TASK)]
+    keys = sorted(set(zip(streams["kind"].tolist(),
+                          streams["number"].tolist())))
+
+    if step:
+        t = np.arange(streams["time_s"][0], streams["time_s"][-1], step) \
+            if len(streams) else np.empty(0)
+    else:
+        t = np.unique(streams["time_s"])
+
+    cols = [t]
+    names = ["time_s"]
+    for kind, number in keys:
+        ts, vs = channel(table, number, kind)
+        idx = np.searchsorted(ts, t, side="right") - 1
+        col = np.where(idx >= 0, vs[np.clip(idx, 0, None)], np.nan)
+        cols.append(col)
+        names.append(record_name(kind, number))
+    return names, np.column_stack(cols) if len(t) else np.empty((0, len(names)))
+
+
+def to_csv(table, path, long=False, step=None):
+    """!
+    Writes a table to a CSV file.
+    @param table A table from @c read_table()
+    @param path The CSV file to write
+    @param long If @c True write one row per record (time, name, value);
+           otherwise write one column per channel as in @c wide()
+    @param step Resampling step in seconds for the wide layout
+    """
+    if long:
+        names = np.array([record_name(k, n) for k, n in
+                          zip(table["kind"].tolist(), table["number"].tolist())])
+        with open(path, "w") as f:
+            f.write("time_s,name,value\n")
+            for t, name, v in zip(table["time_s"], names, table["value"]):
+                f.write("{:.6f},{},{}\n".format(t, name, v))
+        return
+
+    names, data = wide(table, step)
+    np.savetxt(path, data, delimiter=",", header=",".join(names),
+               comments="", fmt="%.6g")
+
+
+def to_parquet(table, path, step=None):
+    """!
+    Writes a table to a Parquet file with one column per channel. This needs
+    pandas and pyarrow to be installed.
+    @param table A table from @c read_table()
+    @param path The Parquet file to write
+    @param step Resampling step in seconds, as for @c wide()
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("Parquet export needs pandas and pyarrow installed")
+
+    names, data = wide(table, step)
+    pd.DataFrame(data, columns=names).to_parquet(path, index=False)
@@ -0,0 +1,136 @@
+"""!
+@file tools/turret_telemetry/plot.py
+Live, scrolling plots of telemetry channels with matplotlib.
+
+Bytes are read and decoded on a background thread into fixed-size ring
+buffers, one per channel, so the plot redraws at its own pace however fast
+records arrive.
+"""
+import threading
+
+import numpy as np
+
+from .decode import Decoder
+from .protocol import KIND_CHANNEL, KIND_TASK, record_name
+
+
+class _Ring:
+    """!
+    A fixed-size ring of (time, value) samples for one plotted line.
+    """
+
+    def __init__(self, size):
+        self.t = np.full(size, np.nan)
+        self.v = np.full(size, np.nan)
+        self.idx = 0
+
+    def extend(self, t, v):
+        """!
+        Adds samples, overwriting the oldest ones when full.
+        """
+        size = len(self.t)
+        if len(t) >= size:
+            t, v = t[-size:], v[-size:]
+        pos = (self.idx + np.arange(len(t))) % size
+        self.t[pos] = t
+        self.v[pos] = v
+        self.idx = (self.idx + len(t)) % size
+
+    def ordered(self):
+        """!
+        Returns the samples oldest first.
+        """
+        return np.roll(self.t, -self.idx), np.roll(self.v, -self.idx)
+
+
+class LivePlot:
+    """!
+    Plots chosen channels and task run times from a telemetry source.
+    """
+
+    def __init__(self, source, channels, tasks=(), window=10.0, size=20000):
+        """!
+        Sets up the plot; call @c show() to start it.
+        @param source A @c SerialSource or @c FileSource
+        @param channels Channel numbers to plot, one subplot each
+        @param tasks Task numbers whose average run time is plotted together
+               in one more subplot
+        @param window Width of the time window shown, in seconds
+        @param size The most samples kept per line
+        """
+        self._source = source
+        self._window = window
+        self._keys = [(KIND_CHANNEL, c) for c in channels] + \
+                     [(KIND_TASK, t) for t in tasks]
+        self._rings = {key: _Ring(size) for key in self._keys}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._now = 0.0
+
+    def _reader(self):
+        """!
+        Reads and decodes the source until stopped or the source runs out.
+        """
+        decoder = Decoder()
+        while not self._stop.is_set():
+            data = self._source.read()
+            if not data:
+                if hasattr(self._source, "size"):
+                    break
+                continue
+            records, times = decoder.feed(data)
+            if not len(records):
+                continue
+            with self._lock:
+                for kind, number in self._keys:
+                    sel = (records["kind"] == kind) \
+                        & (records["number"] == number)
+                    if sel.any():
+                        self._rings[(kind, number)].extend(
+                            times[sel], records["value"][sel])
+                self._now = float(times[-1])
+
+    def show(self, interval=50):
+        """!
+        Opens the plot window and updates it until the window is closed.
+        @param interval Milliseconds between redraws
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        chans = [k for k in self._keys if k[0] == KIND_CHANNEL]
+        tasks = [k for k in self._keys if k[0] == KIND_TASK]
+        rows = len(chans) + (1 if tasks else 0)
+        fig, axes = plt.subplots(rows, 1, sharex=True, squeeze=False)
+        axes = axes[:, 0]
+
+        lines = {}
+        for ax, key in zip(axes, chans):
+            lines[key], = ax.plot([], [])
+            ax.set_ylabel(record_name(*key))
+        if tasks:
+            for key in tasks:
+                lines[key], = axes[-1].plot([], [], label=record_name(*key))
+            axes[-1].set_ylabel("run time (us)")
+            axes[-1].legend(loc="upper left")
+        axes[-1].set_xlabel("time (s)")
+
+        def update(_):
+            with self._lock:
+                now = self._now
+                for key, line in lines.items():
+                    line.set_data(*self._rings[key].ordered())
+            for ax in axes:
+                ax.set_xlim(max(0.0, now - self._window), max(now, 1e-3))
+                ax.relim()
+                ax.autoscale_view(scalex=False)
+            return list(lines.values())
+
+        reader = threading.Thread(target=self._reader, daemon=True)
+        reader.start()
+        anim = FuncAnimation(fig, update, interval=interval,
+                             cache_frame_data=False)
+        plt.show()
+        self._stop.set()
+        reader.join(timeout=1.0)
+        return anim
@@ -0,0 +1,76 @@
+"""!
+@file tools/turret_telemetry/protocol.py
+The telemetry record layout and numbering, mirroring @c src/telemetry.py.
+Keep the two files in step when channels, events or status codes are added.
+"""
+import numpy as np
+
+## First byte of every record
+SYNC = 0xA5
+## The number of bytes in one record
+RECORD_SIZE = 12
+## The board's @c utime.ticks_us() counter wraps at this value
+TICKS_PERIOD = 1 << 30
+
+## NumPy layout of one record, matching @c RECORD_FORMAT "<BBHIf" on the board
+RECORD_DTYPE = np.dtype([("sync", "u1"), ("kind", "u1"), ("number", "<u2"),
+                         ("ticks_us", "<u4"), ("value", "<f4")])
+
+KIND_CHANNEL = 0
+KIND_TASK = 1
+KIND_EVENT = 2
+KIND_PARAM = 3
+KIND_STATUS = 4
+## The highest record kind; bytes after a sync byte above this aren't records
+KIND_MAX = KIND_STATUS
+
+KINDS = {KIND_CHANNEL: "channel", KIND_TASK: "task", KIND_EVENT: "event",
+         KIND_PARAM: "param", KIND_STATUS: "status"}
+
+## Channel numbers and names
+CHANNELS = {0: "yaw_setpoint", 1: "yaw_position", 2: "yaw_error",
+            3: "yaw_actuation", 4: "home_delta", 5: "cam_x", 6: "cam_y",
+            7: "cam_error", 8: "cam_error_dot", 9: "cam_actuation",
+            10: "flywheel_speed", 11: "fire", 12: "cam_backlog",
+            13: "cam_drops", 14: "flywheel_diff", 15: "cam_lead",
+            16: "cam_motion", 17: "pitch_position", 18: "pitch_error",
+            19: "pitch_actuation", 20: "pitch_home_delta"}
+
+## Event codes and names
+EVENTS = {0: "state", 1: "home_done", 2: "fire", 3: "overrun"}
+
+## Status codes and names
+STATUS = {0: "ok", 1: "bad_command", 2: "bad_argument", 3: "dropped",
+          4: "save_failed"}
+
+
+def channel_number(name_or_number):
+    """!
+    Looks up a channel by name or number.
+    @param name_or_number A channel name such as @c "yaw_error", or a number
+    @return The channel number
+    """
+    if isinstance(name_or_number, int) or str(name_or_number).isdigit():
+        return int(name_or_number)
+    for number, name in CHANNELS.items():
+        if name == name_or_number:
+            return number
+    raise KeyError("Unknown channel " + str(name_or_number))
+
+
+def record_name(kind, number):
+    """!
+    Gives a readable name for what a record describes.
+    @param kind The record's kind
+    @param number The record's number
+    @return A name such as @c "yaw_error", @c "task3" or @c "event:state"
+    """
+    if kind == KIND_CHANNEL:
+        return CHANNELS.get(number, "ch" + str(number))
+    if kind == KIND_TASK:
+        return "task" + str(number)
+    if kind == KIND_EVENT:
+        return "event:" + EVENTS.get(number, str(number))
+    if kind == KIND_STATUS:
+        return "status:" + STATUS.get(number, str(number))
+    return "param" + str(number)
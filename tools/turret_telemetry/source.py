@@ -0,0 +1,131 @@
+"""!
+@file tools/turret_telemetry/source.py
+Sources of telemetry bytes: a live serial port or a recording file.
+
+Both sources return raw chunks from @c read(); decoding is left to
+@c Decoder so that a recording holds exactly the bytes which came off the
+board and can be decoded again later.
+"""
+import os
+
+## Baud rate of the board's host link, @c telemetry.BAUD on the board
+DEFAULT_BAUD = 460800
+
+
+class SerialSource:
+    """!
+    Reads telemetry from the board's serial port and sends it commands.
+    """
+
+    def __init__(self, port, baud=DEFAULT_BAUD, record_to=None,
+                 release_reset=False):
+        """!
+        Opens the serial port.
+        @param port The serial port, such as @c /dev/ttyACM0 or @c COM3
+        @param baud The baud rate of the host link
+        @param record_to If given, a file path to which every byte read is
+               also written, so the session can be replayed with @c FileSource
+        @param release_reset Set to @c True for ESP32 boards, whose DTR and
+               RTS lines drive reset and boot mode; both are cleared after
+               opening so the board runs
+        """
+        import serial
+
+        self._port = serial.Serial(port, baud, timeout=0.05)
+        if release_reset:
+            self._port.dtr = False
+            self._port.rts = False
+        self._record = open(record_to, "wb") if record_to else None
+
+    def read(self, size=65536):
+        """!
+        Reads whatever bytes have arrived, waiting briefly if there are none.
+        @param size The most bytes to read
+        @return The bytes read, possibly empty
+        """
+        data = self._port.read(max(1, min(size, self._port.in_waiting)))
+        if data and self._record:
+            self._record.write(data)
+        return data
+
+    def command(self, line):
+        """!
+        Sends one command line to the board, such as @c "set yaw_p 0.9".
+        @param line The command, without a line ending
+        """
+        self.write(line.encode("ascii") + b"\n")
+
+    def write(self, data):
+        """!
+        Sends raw bytes to the board.
+        @param data The bytes to send
+        """
+        self._port.write(data)
+
+    def close(self):
+        """!
+        Closes the port and any recording.
+        """
+        self._port.close()
+        if self._record:
+            self._record.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileSource:
+    """!
+    Reads telemetry from a file recorded by @c SerialSource.
+    """
+
+    def __init__(self, path):
+        """!
+        Opens the recording.
+        @param path The recording's file path
+        """
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+
+    def read(self, size=1 << 20):
+        """!
+        Reads the next chunk of the recording.
+        @param size The most bytes to read
+        @return The bytes read, empty at the end of the recording
+        """
+        return self._file.read(size)
+
+    def command(self, line):
+        """!
+        Recordings can't take commands.
+        """
+        raise OSError("Can't send commands to a recording")
+
+    def close(self):
+        """!
+        Closes the recording.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_source(name, baud=DEFAULT_BAUD, record_to=None, release_reset=False):
+    """!
+    Opens a file if @c name is an existing file, or else a serial port.
+    @param name A recording's path or a serial port name
+    @param baud The baud rate, if a serial port is opened
+    @param record_to For serial ports, a file in which to record the session
+    @param release_reset For serial ports, whether to clear DTR and RTS
+    @return A @c FileSource or @c SerialSource
+    """
+    if os.path.isfile(name):
+        return FileSource(name)
+    return SerialSource(name, baud, record_to, release_reset)